@@ -3,7 +3,7 @@
 
 {
     'name': 'Xero Connector (OAuth 2.0)',
-    'version': '1.0.1',
+    'version': '1.0.2',
     'category': 'Accounting',
     'license': 'OPL-1',
     'summary': """Tool to integrate XERO with ODOO (OAuth 2.0).
@@ -1,12 +1,51 @@
 from __future__ import unicode_literals
 
+import logging
+
+from .cache import ResponseCache
 from .filesmanager import FilesManager
 from .manager import Manager
 from .payrollmanager import PayrollManager
 from .projectmanager import ProjectManager
-
-
-class Xero(object):
+from .ratelimit import default_rate_limiter
+from .retry import RetryPolicy
+from .session import (
+    DEFAULT_KEEP_ALIVE,
+    DEFAULT_POOL_SIZE,
+    DEFAULT_TIMEOUT,
+    get_session,
+    release_session,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class LazyManagers(object):
+    """Create the manager of an object on first access.
+
+    Building a manager decorates every one of its methods, so a client only
+    builds the managers it actually uses instead of all of them up front.
+    """
+
+    OBJECT_LIST = ()
+    # The manager of an object is MANAGER_CLASS(name, *self._manager_args,
+    # **self._manager_kwargs), both set by __init__
+    MANAGER_CLASS = Manager
+
+    def __getattr__(self, attr):
+        # Only called for attributes that are not set yet
+        if not attr.startswith("_"):
+            for name in self.OBJECT_LIST:
+                if name.lower() == attr:
+                    manager = self.MANAGER_CLASS(name, *self._manager_args, **self._manager_kwargs)
+                    setattr(self, attr, manager)
+                    return manager
+        raise AttributeError(
+            "%r object has no attribute %r" % (type(self).__name__, attr)
+        )
+
+
+class Xero(LazyManagers):
     """An ORM-like interface to the Xero API"""
 
     OBJECT_LIST = (
@@ -40,24 +79,94 @@ class Xero(object):
         "Quotes",
     )
 
-    def __init__(self, credentials, unit_price_4dps=False, user_agent=None):
-        # Iterate through the list of objects we support, for
-        # each of them create an attribute on our self that is
-        # the lowercase name of the object and attach it to an
-        # instance of a Manager object to operate on it
-        for name in self.OBJECT_LIST:
-            setattr(
-                self,
-                name.lower(),
-                Manager(name, credentials, unit_price_4dps, user_agent),
+    def __init__(
+        self,
+        credentials,
+        unit_price_4dps=False,
+        user_agent=None,
+        session=None,
+        pool_size=DEFAULT_POOL_SIZE,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+        timeout=DEFAULT_TIMEOUT,
+        rate_limiter=None,
+        retry_policy=None,
+        body_format=None,
+        cache=None,
+    ):
+        # All the managers share one pooled HTTP session per tenant, so
+        # connections are kept alive between calls of the same sync run.
+        # A session passed in belongs to the caller, close() leaves it open.
+        self.session_key = getattr(credentials, "tenant_id", None)
+        self._owns_session = session is None
+        if session is None:
+            session = get_session(
+                self.session_key,
+                pool_size=pool_size,
+                keep_alive=keep_alive,
+                timeout=timeout,
             )
-
-        setattr(self, "filesAPI", Files(credentials))
-        setattr(self, "payrollAPI", Payroll(credentials, unit_price_4dps, user_agent))
-        setattr(self, "projectsAPI", Project(credentials))
-
-
-class Files(object):
+        self.session = session
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.credentials = credentials
+        self.unit_price_4dps = unit_price_4dps
+        self.user_agent = user_agent
+        self.body_format = body_format
+        # cache=True caches the settings endpoints for the life of this
+        # client, a ResponseCache passed in can be shared between clients
+        if cache is True:
+            cache = ResponseCache()
+        self.cache = cache or None
+        self._manager_args = (credentials, unit_price_4dps, user_agent)
+        self._manager_kwargs = dict(self._shared, body_format=body_format, cache=self.cache)
+
+    @property
+    def _shared(self):
+        return {
+            "session": self.session,
+            "rate_limiter": self.rate_limiter,
+            "retry_policy": self.retry_policy,
+        }
+
+    @property
+    def filesAPI(self):
+        if "_files_api" not in self.__dict__:
+            self._files_api = Files(self.credentials, **self._shared)
+        return self._files_api
+
+    @property
+    def payrollAPI(self):
+        if "_payroll_api" not in self.__dict__:
+            self._payroll_api = Payroll(
+                self.credentials, self.unit_price_4dps, self.user_agent, **self._shared
+            )
+        return self._payroll_api
+
+    @property
+    def projectsAPI(self):
+        if "_projects_api" not in self.__dict__:
+            self._projects_api = Project(self.credentials, **self._shared)
+        return self._projects_api
+
+    def close(self):
+        """Release the pooled HTTP session once a sync run is over.
+
+        The session of a tenant is shared with the other clients of that
+        tenant in the process, it is only closed once the last of them
+        releases it.
+        """
+        if self.retry_policy.retries:
+            _logger.info("Xero sync run needed %s retries", self.retry_policy.retries)
+        if not self._owns_session:
+            return
+        self._owns_session = False
+        if self.session_key is not None:
+            release_session(self.session_key)
+        else:
+            self.session.close()
+
+
+class Files(LazyManagers):
     """An ORM-like interface to the Xero Files API"""
 
     OBJECT_LIST = (
@@ -67,16 +176,18 @@ class Files(object):
         "Inbox",
     )
 
-    def __init__(self, credentials):
-        # Iterate through the list of objects we support, for
-        # each of them create an attribute on our self that is
-        # the lowercase name of the object and attach it to an
-        # instance of a Manager object to operate on it
-        for name in self.OBJECT_LIST:
-            setattr(self, name.lower(), FilesManager(name, credentials))
+    MANAGER_CLASS = FilesManager
+
+    def __init__(self, credentials, session=None, rate_limiter=None, retry_policy=None):
+        self._manager_args = (credentials,)
+        self._manager_kwargs = {
+            "session": session,
+            "rate_limiter": rate_limiter,
+            "retry_policy": retry_policy,
+        }
 
 
-class Payroll(object):
+class Payroll(LazyManagers):
     """An ORM-like interface to the Xero Payroll API"""
 
     OBJECT_LIST = (
@@ -90,16 +201,26 @@ class Payroll(object):
         "LeaveApplications",
     )
 
-    def __init__(self, credentials, unit_price_4dps=False, user_agent=None):
-        for name in self.OBJECT_LIST:
-            setattr(
-                self,
-                name.lower(),
-                PayrollManager(name, credentials, unit_price_4dps, user_agent),
-            )
-
-
-class Project(object):
+    MANAGER_CLASS = PayrollManager
+
+    def __init__(
+        self,
+        credentials,
+        unit_price_4dps=False,
+        user_agent=None,
+        session=None,
+        rate_limiter=None,
+        retry_policy=None,
+    ):
+        self._manager_args = (credentials, unit_price_4dps, user_agent)
+        self._manager_kwargs = {
+            "session": session,
+            "rate_limiter": rate_limiter,
+            "retry_policy": retry_policy,
+        }
+
+
+class Project(LazyManagers):
     """An ORM-like interface to the Xero Projects API"""
 
     OBJECT_LIST = (
@@ -109,10 +230,12 @@ class Project(object):
         "Time",
     )
 
-    def __init__(self, credentials):
-        # Iterate through the list of objects we support, for
-        # each of them create an attribute on our self that is
-        # the lowercase name of the object and attach it to an
-        # instance of a Manager object to operate on it
-        for name in self.OBJECT_LIST:
-            setattr(self, name.lower(), ProjectManager(name, credentials))
+    MANAGER_CLASS = ProjectManager
+
+    def __init__(self, credentials, session=None, rate_limiter=None, retry_policy=None):
+        self._manager_args = (credentials,)
+        self._manager_kwargs = {
+            "session": session,
+            "rate_limiter": rate_limiter,
+            "retry_policy": retry_policy,
+        }
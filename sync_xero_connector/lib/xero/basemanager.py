@@ -1,9 +1,9 @@
 from __future__ import unicode_literals
 
 import json
-import requests
 import six
-from datetime import datetime
+import uuid
+from datetime import date, datetime
 from six.moves.urllib.parse import parse_qs
 from xml.etree.ElementTree import Element, SubElement, tostring
 from xml.parsers.expat import ExpatError
@@ -23,7 +23,8 @@ from .exceptions import (
     XeroTenantIdNotSet,
     XeroUnauthorized,
 )
-from .utils import isplural, json_load_object_hook, singular
+from .retry import IDEMPOTENCY_HEADER, is_idempotent
+from .utils import date_fields_object_hook, isplural, json_loads, singular
 
 
 class BaseManager(object):
@@ -102,6 +103,14 @@ class BaseManager(object):
         "FinancialYearEndDay",
         "FinancialYearEndMonth",
     )
+    # String values that are turned into date/datetime objects when reading
+    # a response. Only these keys are looked at.
+    DECODED_DATE_FIELDS = DATETIME_FIELDS + DATE_FIELDS + (
+        "DateString",
+        "DueDateString",
+        "ExpectedPaymentDate",
+        "PlannedPaymentDate",
+    )
     NO_SEND_FIELDS = (
         "UpdatedDateUTC",
         "HasValidationErrors",
@@ -110,6 +119,12 @@ class BaseManager(object):
         "HasErrors",
         "DueDateString",
     )
+    # Parse responses with orjson/ujson when installed
+    USE_FAST_JSON = True
+    # Format of the save/put request bodies, "xml" or "json"
+    BODY_FORMAT = "xml"
+    # Cache of the settings endpoints, see cache.ResponseCache
+    cache = None
     OPERATOR_MAPPINGS = {
         "gt": ">",
         "lt": "<",
@@ -121,6 +136,13 @@ class BaseManager(object):
     def __init__(self):
         pass
 
+    @property
+    def object_hook(self):
+        hook = self.__dict__.get("_object_hook")
+        if hook is None:
+            hook = self._object_hook = date_fields_object_hook(self.DECODED_DATE_FIELDS)
+        return hook
+
     def dict_to_xml(self, root_elm, data):
         for key in data.keys():
             # Xero will complain if we send back these fields.
@@ -174,8 +196,41 @@ class BaseManager(object):
         # In python3 this seems to return a bytestring
         return six.u(tostring(root_elm))
 
+    def dict_to_json(self, data):
+        result = {}
+        for key, value in data.items():
+            # Xero will complain if we send back these fields.
+            if key in self.NO_SEND_FIELDS:
+                continue
+
+            if isinstance(value, dict):
+                value = self.dict_to_json(value)
+            elif isinstance(value, list) or isinstance(value, tuple):
+                value = [
+                    self.dict_to_json(d) if isinstance(d, dict) else d for d in value
+                ]
+            elif key in self.BOOLEAN_FIELDS:
+                value = bool(value)
+            elif key in self.DATE_FIELDS and hasattr(value, "strftime"):
+                value = value.strftime("%Y-%m-%dT%H:%M:%S")
+            elif isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            elif value is None or value is False:
+                # Unset Odoo values, the XML body sends them as "False"/"None"
+                # which Xero takes for literal text.
+                continue
+            result[key] = value
+        return result
+
+    def _prepare_data_for_json(self, data):
+        if isinstance(data, list) or isinstance(data, tuple):
+            items = [self.dict_to_json(d) for d in data]
+        else:
+            items = [self.dict_to_json(data)]
+        return json.dumps({self.name: items}, default=six.text_type)
+
     def _parse_api_response(self, response, resource_name):
-        data = json.loads(response.text, object_hook=json_load_object_hook)
+        data = json_loads(response.text, self.object_hook, self.USE_FAST_JSON)
         assert data["Status"] == "OK", (
             "Expected the API to say OK but received %s" % data["Status"]
         )
@@ -214,21 +269,71 @@ class BaseManager(object):
             # or individual user/partner
             headers["User-Agent"] = self.user_agent
 
-            response = getattr(requests, method)(
-                uri,
-                data=body,
-                headers=headers,
-                auth=self.credentials.oauth,
-                params=params,
-                timeout=timeout,
+            # One key per write, sent again as is by the retries of this call
+            # so Xero doesn't save the batch twice after a 500/503
+            if method in ("put", "post"):
+                headers.setdefault(IDEMPOTENCY_HEADER, str(uuid.uuid4()))
+
+            tenant_id = getattr(self.credentials, "tenant_id", None)
+
+            # Settings endpoints are served from the cache while it is fresh
+            # and revalidated with If-Modified-Since afterwards. A request
+            # that filters on its own If-Modified-Since isn't cached.
+            cache_key = None
+            cache_owner = tenant_id or getattr(self.credentials, "consumer_key", None)
+            if self.cache is not None and "If-Modified-Since" not in headers:
+                if method == "get":
+                    cache_key = self.cache.key(cache_owner, self.name, uri, params)
+                if cache_key is not None:
+                    data, fetched_at = self.cache.lookup(cache_key)
+                    if data is not None:
+                        return data
+                    if fetched_at is not None:
+                        headers.update(self.prepare_filtering_date(fetched_at))
+            requested_at = datetime.utcnow().replace(microsecond=0)
+
+            def send():
+                self.rate_limiter.acquire(tenant_id)
+                try:
+                    response = self.session.request(
+                        method,
+                        uri,
+                        data=body,
+                        headers=headers,
+                        auth=self.credentials.oauth,
+                        params=params,
+                        timeout=timeout,
+                    )
+                finally:
+                    self.rate_limiter.release(tenant_id)
+                self.rate_limiter.update(tenant_id, response.headers)
+                return response
+
+            response = self.retry_policy.call(
+                send, "%s %s" % (method.upper(), uri), is_idempotent(method, headers)
             )
+            if self.cache is not None and method != "get":
+                self.cache.invalidate(cache_owner, self.name)
+
+            if response.status_code == 304 and cache_key is not None:
+                data = self.cache.not_modified(cache_key, requested_at)
+                if data is not None:
+                    return data
+                # Dropped by a write in the meantime, fetch it in full once
+                headers.pop("If-Modified-Since", None)
+                requested_at = datetime.utcnow().replace(microsecond=0)
+                response = self.retry_policy.call(send, "%s %s" % (method.upper(), uri))
+
             if response.status_code == 200:
                 # If we haven't got XML or JSON, assume we're being returned a
                 # binary file
                 if not response.headers["content-type"].startswith("application/json"):
                     return response.content
 
-                return self._parse_api_response(response, self.name)
+                data = self._parse_api_response(response, self.name)
+                if cache_key is not None:
+                    return self.cache.store(cache_key, data, requested_at)
+                return data
 
             elif response.status_code == 204:
                 return response.content
@@ -254,6 +359,9 @@ class BaseManager(object):
                 raise ValidationError(_('%s') % XeroNotFound(response))
                 # raise XeroNotFound(response)
 
+            elif response.status_code == 429:
+                raise ValidationError(_('%s') % XeroRateLimitExceeded(response, parse_qs(response.text)))
+
             elif response.status_code == 500:
                 raise ValidationError(_('%s') % XeroInternalError(response))
                 # raise XeroInternalError(response)
@@ -269,7 +377,7 @@ class BaseManager(object):
                 # encoded, it must be a not-available error.
                 payload = parse_qs(response.text)
                 if payload:
-                    raise ValidationError(_('%s') % XeroRateLimitExceeded(response))
+                    raise ValidationError(_('%s') % XeroRateLimitExceeded(response, payload))
                     # raise XeroRateLimitExceeded(response, payload)
                 else:
                     raise ValidationError(_('%s') % XeroNotAvailable(response))
@@ -322,14 +430,18 @@ class BaseManager(object):
 
     def save_or_put(self, data, method="post", headers=None, summarize_errors=True):
         uri = "/".join([self.base_url, self.name])
-        body = {"xml": self._prepare_data_for_save(data)}
+        if getattr(self, "body_format", self.BODY_FORMAT) == "json":
+            body = self._prepare_data_for_json(data)
+            headers = dict(headers or {}, **{"Content-Type": "application/json"})
+        else:
+            body = {"xml": self._prepare_data_for_save(data)}
         params = self.extra_params.copy()
         if not summarize_errors:
             params["summarizeErrors"] = "false"
         return uri, params, method, body, headers, False
 
-    def _save(self, data):
-        return self.save_or_put(data, method="post")
+    def _save(self, data, summarize_errors=True):
+        return self.save_or_put(data, method="post", summarize_errors=summarize_errors)
 
     def _put(self, data, summarize_errors=False):
         return self.save_or_put(data, method="put", summarize_errors=summarize_errors)
@@ -422,11 +534,15 @@ class BaseManager(object):
                 return fmt % (field, get_filter_params(key, value))
 
             # Move any known parameter names to the query string
-            KNOWN_PARAMETERS = ["order", "offset", "page", "includeArchived"]
+            KNOWN_PARAMETERS = ["order", "offset", "page", "includeArchived", "IDs", "summaryOnly"]
             for param in KNOWN_PARAMETERS:
                 if param in kwargs:
                     params[param] = kwargs.pop(param)
 
+            # IDs takes a comma separated list of GUIDs
+            if isinstance(params.get("IDs"), (list, tuple, set)):
+                params["IDs"] = ",".join(params["IDs"])
+
             filter_params = []
 
             if "raw" in kwargs:
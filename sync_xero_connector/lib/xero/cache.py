@@ -0,0 +1,130 @@
+from __future__ import unicode_literals
+
+import copy
+import threading
+import time
+
+# Settings endpoints that change rarely and are read over and over during a
+# sync run, with the key identifying each of their records.
+CACHED_ENDPOINTS = {
+    "Accounts": "AccountID",
+    "BrandingThemes": "BrandingThemeID",
+    "ContactGroups": "ContactGroupID",
+    "Currencies": "Code",
+    "Organisations": "OrganisationID",
+    "TaxRates": "TaxType",
+    "TrackingCategories": "TrackingCategoryID",
+}
+
+DEFAULT_TTL = 300
+# Age after which an entry is fetched again in full: merging changes only
+# never drops the records deleted in Xero, and other workers write to Xero
+# without invalidating this process' cache.
+DEFAULT_MAX_AGE = 3600
+# Query parameters of a filtered request. A record changed so that it no
+# longer matches the filter would stay in a merged entry.
+FILTER_PARAMS = ("where", "IDs")
+
+
+class CacheEntry(object):
+    __slots__ = ("data", "fetched_at", "checked_at", "loaded_at")
+
+    def __init__(self, data, fetched_at, checked_at, loaded_at):
+        self.data = data
+        # UTC time the request was sent, sent back as If-Modified-Since
+        self.fetched_at = fetched_at
+        self.checked_at = checked_at
+        # Time of the last full fetch, merges don't change it
+        self.loaded_at = loaded_at
+
+
+class ResponseCache(object):
+    """Cache of the GET responses of the settings endpoints, per tenant.
+
+    A client only caches when it is given one (``Xero(cache=True)``), the
+    cache then lives as long as the client, one sync run. Settings created
+    by other workers show up in the next run.
+
+    An entry is served as is for ``ttl`` seconds. After that the request is
+    sent again with If-Modified-Since: a 304 or an empty list keeps the
+    cached records, changed records are merged into them by their id. Any
+    write to an endpoint drops the cached responses of that endpoint.
+
+    Filtered requests are never merged, they are fetched again in full once
+    ``ttl`` is over. Other entries are fetched again in full ``max_age``
+    seconds after their last full fetch.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL, endpoints=None, max_age=DEFAULT_MAX_AGE):
+        self.ttl = ttl
+        self.max_age = max_age
+        self.endpoints = CACHED_ENDPOINTS if endpoints is None else endpoints
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def key(self, owner, endpoint, uri, params):
+        if owner is None or endpoint not in self.endpoints:
+            return None
+        return (owner, endpoint, uri, tuple(sorted((params or {}).items())))
+
+    def lookup(self, key):
+        """Return (data, fetched_at) for a fresh entry, (None, fetched_at)
+        for an entry to revalidate, (None, None) when nothing is cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None, None
+        now = time.time()
+        if now - entry.checked_at < self.ttl:
+            return copy.deepcopy(entry.data), entry.fetched_at
+        if self._filtered(key) or now - entry.loaded_at >= self.max_age:
+            with self._lock:
+                if self._entries.get(key) is entry:
+                    del self._entries[key]
+            return None, None
+        return None, entry.fetched_at
+
+    def store(self, key, data, fetched_at):
+        id_field = self.endpoints[key[1]]
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            loaded_at = now
+            if entry is not None and isinstance(data, list) and not self._filtered(key):
+                data = self._merge(entry.data, data, id_field)
+                loaded_at = entry.loaded_at
+            self._entries[key] = CacheEntry(data, fetched_at, now, loaded_at)
+        return copy.deepcopy(data)
+
+    def not_modified(self, key, fetched_at):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.fetched_at = fetched_at
+            entry.checked_at = time.time()
+            return copy.deepcopy(entry.data)
+
+    def invalidate(self, owner, endpoint):
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == owner and k[1] == endpoint]:
+                del self._entries[key]
+
+    @staticmethod
+    def _filtered(key):
+        return any(name in FILTER_PARAMS for name, value in key[3])
+
+    @staticmethod
+    def _merge(cached, changed, id_field):
+        if not changed:
+            return cached
+        if not isinstance(cached, list) or any(
+            not isinstance(record, dict) or id_field not in record
+            for record in cached + changed
+        ):
+            return changed
+        merged = dict((record[id_field], record) for record in cached)
+        for record in changed:
+            merged[record[id_field]] = record
+        return list(merged.values())
+
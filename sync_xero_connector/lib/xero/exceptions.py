@@ -28,6 +28,11 @@ class XeroTenantIdNotSet(Exception):
     pass
 
 
+class XeroDailyLimitReached(Exception):
+    # The daily call limit of the tenant is used up
+    pass
+
+
 class XeroBadRequest(XeroException):
     # HTTP 400: Bad Request
     def __init__(self, response):
@@ -1,15 +1,70 @@
 from __future__ import unicode_literals
 
+import threading
+from collections import namedtuple
+
+from six.moves import queue
+
 from .basemanager import BaseManager
 from .constants import XERO_API_URL
+from .ratelimit import default_rate_limiter
+from .retry import RetryPolicy
+from .session import get_session
 from .utils import resolve_user_agent, singular
 
+# Elements per request of a batch write, the Xero recommended maximum
+BATCH_SIZE = 50
+
+
+def validation_errors(element):
+    """Messages of the ValidationErrors Xero returned for one element of a batch"""
+    if not isinstance(element, dict):
+        return ["Xero returned no result for this element"]
+    messages = [
+        error.get("Message")
+        for error in element.get("ValidationErrors") or []
+        if error.get("Message")
+    ]
+    if not messages and (
+        element.get("HasErrors") or element.get("StatusAttributeString") == "ERROR"
+    ):
+        messages = ["Rejected by Xero"]
+    return messages
+
+
+class BatchResult(namedtuple("BatchResult", ["data", "result", "errors"])):
+    """Outcome of one element of ``Manager.write_batch``: the element sent,
+    what Xero returned for it and its validation error messages."""
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        return not self.errors
+
 
 class Manager(BaseManager):
-    def __init__(self, name, credentials, unit_price_4dps=False, user_agent=None):
+    def __init__(
+        self,
+        name,
+        credentials,
+        unit_price_4dps=False,
+        user_agent=None,
+        session=None,
+        rate_limiter=None,
+        retry_policy=None,
+        body_format=None,
+        cache=None,
+    ):
         from . import __version__ as VERSION  # noqa
 
         self.credentials = credentials
+        self.session = session or get_session()
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.body_format = body_format or self.BODY_FORMAT
+        # Settings responses are only cached with a cache.ResponseCache
+        self.cache = cache or None
         self.name = name
         self.base_url = credentials.base_url + XERO_API_URL
         self.extra_params = {"unitdp": 4} if unit_price_4dps else {}
@@ -27,3 +82,102 @@ class Manager(BaseManager):
             for method_name in object_decorated_methods:
                 method = getattr(self, "_%s" % method_name)
                 setattr(self, method_name, self._get_data(method))
+
+    def iter_pages(self, since=None, prefetch=2, **kwargs):
+        """Yield the pages of ``filter(**kwargs)`` until the first empty page.
+
+        The next ``prefetch`` pages are downloaded on a background thread
+        while the caller processes the current one, so network time and
+        database time overlap. With ``prefetch=0`` pages are fetched inline.
+        """
+        if since:
+            kwargs["since"] = since
+
+        if prefetch < 1:
+            page = 0
+            while True:
+                page += 1
+                result = self.filter(page=page, **kwargs)
+                if not result:
+                    return
+                yield result
+
+        pages = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+
+        def put(item):
+            # Give up when the caller stopped iterating, so an abandoned
+            # generator never leaves the thread blocked on a full queue.
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def fetch():
+            page = 0
+            try:
+                while not stop.is_set():
+                    page += 1
+                    result = self.filter(page=page, **kwargs)
+                    put(result)
+                    if not result:
+                        return
+            except Exception as e:
+                put(e)
+
+        worker = threading.Thread(
+            target=fetch, name="xero-%s-pages" % self.name.lower()
+        )
+        worker.daemon = True
+        worker.start()
+        try:
+            while True:
+                result = pages.get()
+                if isinstance(result, Exception):
+                    raise result
+                if not result:
+                    return
+                yield result
+        finally:
+            stop.set()
+
+    def write_batch(self, data, method="put", fix=None, max_attempts=2, batch_size=BATCH_SIZE):
+        """Create (``put``) or update (``save``) ``data`` by batches, element by element.
+
+        The batches are sent with summarizeErrors=false, so an element Xero
+        rejects doesn't fail the rest of its batch. Returns one BatchResult
+        per element of ``data``, in the same order.
+
+        ``fix(element, errors)`` is called for each rejected element and
+        returns the element to send again, or None to leave it rejected. The
+        fixed elements are sent again, up to ``max_attempts`` writes of an
+        element in total.
+        """
+        write = self.put if method == "put" else self.save
+        results = [None] * len(data)
+        pending = list(enumerate(data))
+        attempt = 0
+        while pending:
+            attempt += 1
+            rejected = []
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                returned = write([element for index, element in batch], summarize_errors=False)
+                if not isinstance(returned, list):
+                    returned = [returned]
+                for position, (index, element) in enumerate(batch):
+                    result = returned[position] if position < len(returned) else None
+                    results[index] = BatchResult(element, result, validation_errors(result))
+                    if results[index].errors:
+                        rejected.append((index, element, results[index].errors))
+
+            pending = []
+            if fix is None or attempt >= max_attempts:
+                break
+            for index, element, errors in rejected:
+                fixed = fix(element, errors)
+                if fixed is not None:
+                    pending.append((index, fixed))
+        return results
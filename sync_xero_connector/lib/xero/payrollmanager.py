@@ -4,14 +4,29 @@ import requests
 
 from .basemanager import BaseManager
 from .constants import XERO_PAYROLL_URL
+from .ratelimit import default_rate_limiter
+from .retry import RetryPolicy
+from .session import get_session
 from .utils import singular
 
 
 class PayrollManager(BaseManager):
-    def __init__(self, name, credentials, unit_price_4dps=False, user_agent=None):
+    def __init__(
+        self,
+        name,
+        credentials,
+        unit_price_4dps=False,
+        user_agent=None,
+        session=None,
+        rate_limiter=None,
+        retry_policy=None,
+    ):
         from . import __version__ as VERSION
 
         self.credentials = credentials
+        self.session = session or get_session()
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
         self.name = name
         self.base_url = credentials.base_url + XERO_PAYROLL_URL
         self.extra_params = {"unitdp": 4} if unit_price_4dps else {}
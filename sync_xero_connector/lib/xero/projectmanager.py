@@ -1,7 +1,6 @@
 from __future__ import unicode_literals
 
 import os
-import requests
 from six.moves.urllib.parse import parse_qs
 
 from .constants import XERO_PROJECTS_URL
@@ -17,6 +16,9 @@ from .exceptions import (
     XeroUnauthorized,
     XeroUnsupportedMediaType,
 )
+from .ratelimit import default_rate_limiter
+from .retry import RetryPolicy, is_idempotent
+from .session import get_session
 
 
 class ProjectManager(object):
@@ -30,8 +32,13 @@ class ProjectManager(object):
         "set_status",
     )
 
-    def __init__(self, name, credentials):
+    def __init__(
+        self, name, credentials, session=None, rate_limiter=None, retry_policy=None
+    ):
         self.credentials = credentials
+        self.session = session or get_session()
+        self.rate_limiter = rate_limiter or default_rate_limiter
+        self.retry_policy = retry_policy or RetryPolicy()
         self.name = name
         self.base_url = credentials.base_url + XERO_PROJECTS_URL
 
@@ -65,13 +72,30 @@ class ProjectManager(object):
                 *args, **kwargs
             )
 
-            response = getattr(requests, method)(
-                uri,
-                data=body,
-                headers=headers,
-                auth=self.credentials.oauth,
-                params=params,
-                files=files,
+            tenant_id = getattr(self.credentials, "tenant_id", None)
+
+            def send():
+                # Uploads are sent again from the start of the file on retry
+                for upload in (files or {}).values():
+                    upload.seek(0)
+                self.rate_limiter.acquire(tenant_id)
+                try:
+                    response = self.session.request(
+                        method,
+                        uri,
+                        data=body,
+                        headers=headers,
+                        auth=self.credentials.oauth,
+                        params=params,
+                        files=files,
+                    )
+                finally:
+                    self.rate_limiter.release(tenant_id)
+                self.rate_limiter.update(tenant_id, response.headers)
+                return response
+
+            response = self.retry_policy.call(
+                send, "%s %s" % (method.upper(), uri), is_idempotent(method, headers)
             )
 
             if response.status_code == 200 or response.status_code == 201:
@@ -100,6 +124,9 @@ class ProjectManager(object):
             elif response.status_code == 415:
                 raise XeroUnsupportedMediaType(response)
 
+            elif response.status_code == 429:
+                raise XeroRateLimitExceeded(response, parse_qs(response.text))
+
             elif response.status_code == 500:
                 raise XeroInternalError(response)
 
@@ -0,0 +1,248 @@
+from __future__ import unicode_literals
+
+import logging
+import threading
+import time
+
+from .exceptions import XeroDailyLimitReached
+
+_logger = logging.getLogger(__name__)
+
+# Xero allows 60 calls per minute, 5 concurrent calls and 5000 calls per day
+# for each tenant connected to an app.
+CALLS_PER_MINUTE = 60
+CONCURRENT_CALLS = 5
+
+# Once Xero reports the daily quota is used up, wait this long before
+# probing again with a real call.
+DAY_LIMIT_RECHECK = 15 * 60
+
+MINUTE_REMAINING_HEADER = "X-MinLimit-Remaining"
+DAY_REMAINING_HEADER = "X-DayLimit-Remaining"
+
+
+def refill(tokens, refilled_at, rate, capacity, now):
+    """Return the bucket content after refilling it at ``rate`` tokens per second"""
+    if tokens is None or refilled_at is None:
+        return float(capacity)
+    return min(float(capacity), tokens + max(0.0, now - refilled_at) * rate)
+
+
+def take_token(tokens, rate):
+    """Take one token from the bucket.
+
+    Returns the remaining tokens and the number of seconds to wait before a
+    token is available (0 when one was taken).
+    """
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+def day_exhausted(day_remaining, day_seen_at, now):
+    return (
+        day_remaining is not None
+        and day_remaining <= 0
+        and day_seen_at is not None
+        and now - day_seen_at < DAY_LIMIT_RECHECK
+    )
+
+
+def observe_remaining(state, minute_remaining, day_remaining, now):
+    """Return the bucket state once the remaining calls Xero reported are applied"""
+    tokens, refilled_at, old_day_remaining, day_seen_at = state
+    if minute_remaining is not None and (tokens is None or minute_remaining < tokens):
+        tokens, refilled_at = float(minute_remaining), now
+    if day_remaining is not None:
+        old_day_remaining, day_seen_at = day_remaining, now
+    return tokens, refilled_at, old_day_remaining, day_seen_at
+
+
+def parse_remaining(headers, name):
+    try:
+        return int(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+class MemoryBucketStore(object):
+    """Bucket state kept in memory, shared by the threads of one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, rate, capacity, now):
+        with self._lock:
+            tokens, refilled_at, day_remaining, day_seen_at = self._buckets.get(
+                key, (None, None, None, None)
+            )
+            if day_exhausted(day_remaining, day_seen_at, now):
+                raise XeroDailyLimitReached(key)
+            tokens, wait = take_token(
+                refill(tokens, refilled_at, rate, capacity, now), rate
+            )
+            self._buckets[key] = (tokens, now, day_remaining, day_seen_at)
+            return wait
+
+    def observe(self, key, minute_remaining, day_remaining, now):
+        with self._lock:
+            self._buckets[key] = observe_remaining(
+                self._buckets.get(key, (None, None, None, None)),
+                minute_remaining,
+                day_remaining,
+                now,
+            )
+
+
+class PostgresBucketStore(object):
+    """Bucket state kept in a table, shared by every worker of a database.
+
+    ``cursor_factory`` must return a new cursor (an Odoo
+    ``registry.cursor()``). The store opens one and keeps it for all its
+    calls, each ``take`` is a small transaction on it, serialized per tenant
+    with a transaction-level advisory lock that is released on commit.
+    The remaining calls reported by a response are kept in memory and
+    written by the next ``take`` of the tenant, so a call costs one
+    bookkeeping transaction and no new connection.
+    """
+
+    def __init__(self, cursor_factory, table="xero_rate_limit"):
+        self.cursor_factory = cursor_factory
+        self.table = table
+        self._lock = threading.Lock()
+        self._cr = None
+        self._observed = {}
+
+    def _cursor(self):
+        if self._cr is None or self._cr.closed:
+            self._cr = self.cursor_factory()
+        return self._cr
+
+    def _discard(self):
+        # The transaction failed, start again from a clean connection
+        try:
+            self._cr.rollback()
+        except Exception:
+            self._cr.close()
+            self._cr = None
+
+    def _lock_row(self, cr, key):
+        cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (self.table + ":" + key,))
+        cr.execute(
+            "SELECT tokens, refilled_at, day_remaining, day_seen_at FROM {} "
+            "WHERE tenant_id = %s".format(self.table),
+            (key,),
+        )
+        row = cr.fetchone()
+        if row is None:
+            cr.execute(
+                "INSERT INTO {} (tenant_id) VALUES (%s)".format(self.table), (key,)
+            )
+            row = (None, None, None, None)
+        return row
+
+    def _write_row(self, cr, key, tokens, refilled_at, day_remaining, day_seen_at):
+        cr.execute(
+            "UPDATE {} SET tokens = %s, refilled_at = %s, day_remaining = %s, "
+            "day_seen_at = %s WHERE tenant_id = %s".format(self.table),
+            (tokens, refilled_at, day_remaining, day_seen_at, key),
+        )
+
+    def take(self, key, rate, capacity, now):
+        with self._lock:
+            cr = self._cursor()
+            try:
+                state = self._lock_row(cr, key)
+                for observed in self._observed.pop(key, ()):
+                    state = observe_remaining(state, *observed)
+                tokens, refilled_at, day_remaining, day_seen_at = state
+                exhausted = day_exhausted(day_remaining, day_seen_at, now)
+                wait = 0.0
+                if not exhausted:
+                    tokens, wait = take_token(
+                        refill(tokens, refilled_at, rate, capacity, now), rate
+                    )
+                    refilled_at = now
+                self._write_row(cr, key, tokens, refilled_at, day_remaining, day_seen_at)
+                cr.commit()
+            except Exception:
+                self._discard()
+                raise
+        if exhausted:
+            raise XeroDailyLimitReached(key)
+        return wait
+
+    def observe(self, key, minute_remaining, day_remaining, now):
+        if minute_remaining is None and day_remaining is None:
+            return
+        with self._lock:
+            self._observed.setdefault(key, []).append(
+                (minute_remaining, day_remaining, now)
+            )
+
+    def close(self):
+        with self._lock:
+            if self._cr is not None:
+                self._cr.close()
+                self._cr = None
+
+
+class RateLimiter(object):
+    """A token bucket per tenant, in front of every call to the Xero API.
+
+    The bucket refills at ``per_minute`` calls per minute and holds at most
+    ``concurrency`` tokens, so bursts never exceed the number of calls Xero
+    accepts at once. The remaining-call headers of every response shrink the
+    bucket when Xero has counted more calls than we did (other workers or
+    other apps on the same tenant). The concurrency semaphore is per process,
+    the bucket itself is shared through ``store``.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        per_minute=CALLS_PER_MINUTE,
+        concurrency=CONCURRENT_CALLS,
+    ):
+        self.store = store or MemoryBucketStore()
+        self.rate = per_minute / 60.0
+        self.capacity = concurrency
+        self.concurrency = concurrency
+        self._semaphores = {}
+        self._semaphores_lock = threading.Lock()
+
+    def _semaphore(self, key):
+        with self._semaphores_lock:
+            semaphore = self._semaphores.get(key)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.concurrency)
+                self._semaphores[key] = semaphore
+            return semaphore
+
+    def acquire(self, key):
+        key = key or "default"
+        waited = 0.0
+        while True:
+            wait = self.store.take(key, self.rate, self.capacity, time.time())
+            if not wait:
+                break
+            waited += wait
+            time.sleep(wait)
+        if waited:
+            _logger.debug("Xero rate limit: waited %.2fs for tenant %s", waited, key)
+        self._semaphore(key).acquire()
+
+    def release(self, key):
+        self._semaphore(key or "default").release()
+
+    def update(self, key, headers):
+        self.store.observe(
+            key or "default",
+            parse_remaining(headers, MINUTE_REMAINING_HEADER),
+            parse_remaining(headers, DAY_REMAINING_HEADER),
+            time.time(),
+        )
+
+
+default_rate_limiter = RateLimiter()
@@ -0,0 +1,125 @@
+from __future__ import unicode_literals
+
+import logging
+import random
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+_logger = logging.getLogger(__name__)
+
+# 429 is the rate limit, 503 the rate limit of the old API or an outage and
+# 500 an occasional hiccup of the Xero API.
+RETRY_STATUSES = (429, 500, 503)
+# A 500 or 503 may come after Xero saved a write, only the rate limit
+# rejects a request before it is processed.
+WRITE_RETRY_STATUSES = (429,)
+
+# Xero answers a write sent again with the same key with the first result
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_RUN_BUDGET = 100
+DEFAULT_BACKOFF = 1.0
+DEFAULT_MAX_BACKOFF = 60.0
+
+
+def parse_retry_after(value, now=None):
+    """Return the delay in seconds asked by a Retry-After header, or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parsed = parsedate_tz(value)
+    if parsed is None:
+        return None
+    return max(0.0, mktime_tz(parsed) - (now or time.time()))
+
+
+def is_idempotent(method, headers):
+    """Whether a request can be sent again after a 500 or 503"""
+    return method.lower() == "get" or IDEMPOTENCY_HEADER in (headers or {})
+
+
+class RetryPolicy(object):
+    """Retry transient Xero errors with a jittered exponential backoff.
+
+    A call is retried at most ``max_retries`` times, and all the calls made
+    with the same policy (one sync run) share ``run_budget`` retries, so a
+    tenant that stays unavailable fails fast instead of sleeping for hours.
+    When the budget is spent the last response is handed back and mapped to
+    an error as usual.
+    """
+
+    def __init__(
+        self,
+        max_retries=DEFAULT_MAX_RETRIES,
+        run_budget=DEFAULT_RUN_BUDGET,
+        backoff=DEFAULT_BACKOFF,
+        max_backoff=DEFAULT_MAX_BACKOFF,
+    ):
+        self.max_retries = max_retries
+        self.run_budget = run_budget
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+        self._lock = threading.Lock()
+
+    def delay(self, attempt, response):
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        # "Full jitter": spread the retries of concurrent workers over the
+        # whole backoff window instead of retrying in lockstep.
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def _take(self):
+        with self._lock:
+            if self.retries >= self.run_budget:
+                return False
+            self.retries += 1
+            return True
+
+    def call(self, send, description="", idempotent=True):
+        """Call ``send()`` until it returns a response that needn't be retried.
+
+        A request that isn't ``idempotent`` is only sent again when it was
+        rate limited, see ``is_idempotent``.
+        """
+        statuses = RETRY_STATUSES if idempotent else WRITE_RETRY_STATUSES
+        attempt = 0
+        while True:
+            response = send()
+            if response.status_code not in statuses:
+                return response
+            # The daily limit asks to wait for hours, holding the cursor of
+            # the cron meanwhile: give up and let the caller raise the error.
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > self.max_backoff:
+                _logger.warning(
+                    "Xero %s returned %s with Retry-After %.0fs, over the %.0fs cap, not retrying",
+                    description, response.status_code, retry_after, self.max_backoff,
+                )
+                return response
+            if attempt >= self.max_retries:
+                _logger.warning(
+                    "Xero %s returned %s, giving up after %s retries",
+                    description, response.status_code, attempt,
+                )
+                return response
+            if not self._take():
+                _logger.warning(
+                    "Xero %s returned %s, retry budget of %s for this run is spent",
+                    description, response.status_code, self.run_budget,
+                )
+                return response
+            wait = self.delay(attempt, response)
+            attempt += 1
+            _logger.info(
+                "Xero %s returned %s, retry %s/%s in %.1fs (%s retries this run)",
+                description, response.status_code, attempt, self.max_retries,
+                wait, self.retries,
+            )
+            time.sleep(wait)
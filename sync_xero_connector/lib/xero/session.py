@@ -0,0 +1,101 @@
+from __future__ import unicode_literals
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_KEEP_ALIVE = True
+# (connect, read) timeout in seconds, used when a call doesn't pass its own
+DEFAULT_TIMEOUT = (10, 120)
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class XeroSession(object):
+    """A pooled, keep-alive HTTP session shared by the managers of a client.
+
+    Every manager of a ``Xero`` instance sends its requests through the same
+    ``requests.Session`` so TCP/TLS connections to api.xero.com are reused
+    across calls instead of being opened for each one.
+    """
+
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        keep_alive=DEFAULT_KEEP_ALIVE,
+        timeout=DEFAULT_TIMEOUT,
+    ):
+        self.pool_size = pool_size
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.session = self._build_session()
+
+    def _build_session(self):
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size, pool_maxsize=self.pool_size
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.keep_alive:
+            session.headers["Connection"] = "close"
+        return session
+
+    def request(self, method, uri, timeout=None, **kwargs):
+        # A closed session is reopened on demand so a manager that outlives
+        # its sync run keeps working, it just starts with a cold pool.
+        if self.session is None:
+            self.session = self._build_session()
+        if timeout is None:
+            timeout = self.timeout
+        return self.session.request(method.upper(), uri, timeout=timeout, **kwargs)
+
+    @property
+    def closed(self):
+        return self.session is None
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def get_session(key=None, **options):
+    """Return the shared session for ``key`` (usually the tenant id).
+
+    Sessions without a key are private to the caller. A keyed session is
+    reference counted: every call takes a reference that the caller hands
+    back with ``release_session`` once it is done with the session. A
+    session that was closed is replaced by a fresh one on the next lookup.
+    """
+    if key is None:
+        return XeroSession(**options)
+
+    with _sessions_lock:
+        session, refs = _sessions.get(key, (None, 0))
+        if session is None or session.closed:
+            session = XeroSession(**options)
+        _sessions[key] = (session, refs + 1)
+        return session
+
+
+def release_session(key):
+    """Hand back a reference taken with ``get_session``, the pooled session
+    of ``key`` is closed when its last reference is released."""
+    with _sessions_lock:
+        session, refs = _sessions.get(key, (None, 0))
+        if refs > 1:
+            _sessions[key] = (session, refs - 1)
+            return
+        _sessions.pop(key, None)
+    if session is not None:
+        session.close()
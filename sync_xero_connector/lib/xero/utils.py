@@ -1,10 +1,21 @@
 from __future__ import unicode_literals
 
 import datetime
+import json
 import re
 import requests
 import six
 
+# Use a faster JSON parser when one is installed. Neither supports
+# object_hook, dates are converted by walking the result instead.
+try:
+    import orjson as fast_json
+except ImportError:
+    try:
+        import ujson as fast_json
+    except ImportError:
+        fast_json = None
+
 DATE = re.compile(
     r"^(\/Date\((?P<timestamp>-?\d+)((?P<offset_h>[-+]\d\d)(?P<offset_m>\d\d))?\)\/)"
     r"|"
@@ -85,22 +96,23 @@ def parse_date(string, force_datetime=False):
     if not matches:
         return None
 
-    values = dict(
-        [
-            (k, v if v[0] in "+-" else int(v))
-            for k, v in matches.groupdict().items()
-            if v and int(v)
-        ]
-    )
-
-    if "timestamp" in values:
+    # Zero components are dropped, as they were never part of the values
+    # (a YYYY-MM-DDT00:00:00 string is taken for a date, see below).
+    timestamp = matches.group("timestamp")
+    if timestamp and int(timestamp):
         value = datetime.datetime.utcfromtimestamp(0) + datetime.timedelta(
-            hours=int(values.get("offset_h", 0)),
-            minutes=int(values.get("offset_m", 0)),
-            seconds=int(values["timestamp"]) / 1000.0,
+            hours=int(matches.group("offset_h") or 0),
+            minutes=int(matches.group("offset_m") or 0),
+            seconds=int(timestamp) / 1000.0,
         )
         return value
 
+    values = {}
+    for key in ("year", "month", "day", "hour", "minute", "second"):
+        v = matches.group(key)
+        if v and int(v):
+            values[key] = int(v)
+
     # I've made an assumption here, that a DateTime value will not
     # ever be YYYY-MM-DDT00:00:00, which is probably bad. I'm not
     # really sure how to handle this, other than to hard-code the
@@ -128,6 +140,49 @@ def json_load_object_hook(dct):
     return dct
 
 
+def date_fields_object_hook(date_fields):
+    """Build a json object_hook that only parses the values of ``date_fields``.
+
+    Names, descriptions, addresses... are never run through the DATE regex.
+    """
+    date_fields = frozenset(date_fields)
+
+    def object_hook(dct):
+        for key in date_fields.intersection(dct):
+            value = dct[key]
+            if isinstance(value, six.string_types):
+                value = parse_date(value)
+                if value:
+                    dct[key] = value
+        return dct
+
+    return object_hook
+
+
+def _apply_object_hook(data, object_hook):
+    # Iterative walk over the parsed document, the JSON libraries only
+    # produce plain dicts and lists.
+    stack = [data]
+    while stack:
+        item = stack.pop()
+        if type(item) is dict:
+            object_hook(item)
+            values = item.values()
+        else:
+            values = item
+        for value in values:
+            if type(value) is dict or type(value) is list:
+                stack.append(value)
+    return data
+
+
+def json_loads(text, object_hook, use_fast_json=True):
+    """Parse a Xero JSON response, with the fast backend when available"""
+    if use_fast_json and fast_json is not None:
+        return _apply_object_hook(fast_json.loads(text), object_hook)
+    return json.loads(text, object_hook=object_hook)
+
+
 def resolve_user_agent(user_agent, default_override=None):
     from . import __version__ as VERSION
 
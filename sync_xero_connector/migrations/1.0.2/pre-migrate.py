@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+        Earlier exports wrote the first ContactID of a batch on every partner
+        they could not link, so a ContactID can be linked several times in a
+        company. Keep the oldest link of each ContactID and clear the others
+        before unique(company_id, xero_contact_id) is added.
+    """
+    if not version:
+        return
+    cr.execute("""UPDATE contact_xero_company AS c SET xero_contact_id = NULL
+                  FROM (SELECT id, row_number() OVER (PARTITION BY company_id, xero_contact_id ORDER BY id) AS position
+                          FROM contact_xero_company WHERE xero_contact_id IS NOT NULL) AS d
+                  WHERE c.id = d.id AND d.position > 1""")
+    if cr.rowcount:
+        _logger.warning("Cleared %s duplicate Xero ContactIDs of contact_xero_company, their partners are exported again", cr.rowcount)
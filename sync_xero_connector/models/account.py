@@ -2,10 +2,10 @@
 # Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
 
 import math
-import time
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 from odoo.tools.safe_eval import safe_eval
+from odoo.addons.sync_xero_connector.models.import_lookup import get_import_lookup
 from datetime import datetime
 
 
@@ -485,6 +485,7 @@ class BankAccount(models.Model):
         """
         partner_pool = self.env['res.partner']
         currency_pool = self.env['res.currency']
+        lookup = get_import_lookup(self.env, xero)
         for bank_account in bank_account_list:
             if bank_account.get('Status') == 'ACTIVE':
                 partner = partner_pool.search([('name', '=', bank_account.get('Name'))])
@@ -493,7 +494,7 @@ class BankAccount(models.Model):
                 else:
                     partner = partner[0]
 
-                currency = currency_pool.search([('name', '=', bank_account.get('CurrencyCode'))])
+                currency = currency_pool.browse(lookup.currency_id(bank_account.get('CurrencyCode')))
                 bank_account_rec = self.search([('acc_id', '=', bank_account.get('AccountID'))])
                 available_acc_ids = self.search([('acc_number', '=', bank_account.get('BankAccountNumber'))])
                 if bank_account_rec and import_option in ['update', 'both']:
@@ -700,8 +701,6 @@ class AccountAccount(models.Model):
             for save_account in self.browse(list(set(final_account_list).difference(set(same_accounts)))):
                 if save_account.code not in account_code_list and save_account.name not in account_name_list:
                     if account_mapping.get(save_account.user_type_id.id):
-                        if len(account_ids) >= 30:
-                            time.sleep(1)
                         account = account_mapping[save_account.user_type_id.id]
                         if save_account.use_as_inventory_in_xero:
                             account = 'INVENTORY'
@@ -3,9 +3,9 @@
 
 import datetime
 import logging
-import time
 from odoo import api, fields, models, _
 from odoo.exceptions import Warning, UserError
+from odoo.addons.sync_xero_connector.models.import_lookup import get_import_lookup
 
 _logger = logging.getLogger(__name__)
 
@@ -15,7 +15,7 @@ class AccountMoveLineXeroLog(models.Model):
     _description = 'Account Move Line'
 
     name = fields.Char('Name of Payment Line')
-    xero_payment = fields.Char('Xero Payment ID', copy=False)
+    xero_payment = fields.Char('Xero Payment ID', copy=False, index=True)
 
 
 class account_payment(models.Model):
@@ -25,7 +25,11 @@ class account_payment(models.Model):
 
 
 class AccountMove(models.Model):
-    _inherit = 'account.move'
+    _name = 'account.move'
+    _inherit = ['account.move', 'xero.sync.mixin']
+    _xero_export_fields = ('name', 'type', 'state', 'partner_id', 'invoice_date', 'invoice_date_due', 'currency_id',
+                           'line_amount_type', 'invoice_line_ids', 'line_ids', 'able_to_xero_export', 'company_id')
+    _xero_export_children = ('invoice_line_ids',)
 
     xero_invoice_id = fields.Char('Xero Invoice ID', readonly=True, copy=False)
     xero_invoice_number = fields.Char('Xero Invoice Number', readonly=True, copy=False)
@@ -38,6 +42,67 @@ class AccountMove(models.Model):
     xero_manual_journal_id = fields.Char('Xero Manual Journal ID', readonly=True, copy=False)
     is_manual_journal = fields.Boolean(string='Is Manual Journal')
     able_to_xero_export = fields.Boolean(string="Able to Xero Export", default='True')
+    xero_updated_date = fields.Datetime('Xero Updated Date', readonly=True, copy=False)
+    xero_fingerprint = fields.Char('Xero Fingerprint', readonly=True, copy=False)
+
+    def _xero_sync_records(self):
+        return self.filtered(lambda l: l.is_invoice())
+
+    @api.model
+    def _get_contact_partner_ids(self, xero_account, xero, contact_ids, company):
+        """
+            Map the ContactIDs of an import page to their partners. The
+            contacts that are not imported yet are fetched by id and imported
+            first, instead of syncing every contact again.
+        """
+        partner_pool = self.env['res.partner']
+        partner_ids = partner_pool._get_partner_ids_by_xero_contact(contact_ids, company)
+        missing = set(filter(None, contact_ids)) - set(partner_ids)
+        if missing:
+            xero_account._import_contacts_by_id(xero, missing)
+            partner_ids.update(partner_pool._get_partner_ids_by_xero_contact(missing, company))
+        return partner_ids
+
+    def _link_exported_invoices(self, results, company):
+        """
+            Write the ids Xero returned for a batch write of the invoices of
+            ``self`` (see Manager.write_batch, one result per invoice in the
+            same order), and commit it.
+
+            The LineItemIDs of the whole batch are written in one query. An
+            invoice Xero rejected is logged in mismatch.log with its
+            validation errors, the others are kept.
+        """
+        self.env['mismatch.log'].log_rejected(self._name, results, self)
+        line_rows = []
+        exported = self.browse()
+        exported_list = []
+        for invoice_id, result in zip(self, results):
+            if not result.ok:
+                continue
+            inv = result.result
+            if not invoice_id.xero_invoice_id:
+                invoice_id.write({'xero_invoice_id': inv.get('InvoiceID'), 'xero_invoice_number': inv.get('InvoiceNumber')})
+            for line_id, line in zip(invoice_id.invoice_line_ids, inv.get('LineItems') or []):
+                if line.get('LineItemID'):
+                    line_rows.append((line_id.id, line.get('LineItemID')))
+            exported |= invoice_id
+            exported_list.append(inv)
+        if line_rows:
+            line_pool = self.env['account.move.line']
+            line_pool.flush(['xero_invoice_line_id'])
+            self._cr.execute("""UPDATE account_move_line AS l SET xero_invoice_line_id = v.xero_invoice_line_id
+                                FROM (VALUES %s) AS v (id, xero_invoice_line_id) WHERE l.id = v.id""" % ', '.join(['(%s, %s)'] * len(line_rows)),
+                             [value for row in line_rows for value in row])
+            line_pool.invalidate_cache(['xero_invoice_line_id'], [row[0] for row in line_rows])
+        if exported:
+            exported._mark_xero_invoices_synced(exported_list, company)
+        self._cr.commit()
+
+    def _mark_xero_invoices_synced(self, invoice_list, company):
+        """Mark the invoices of ``self`` as synced with the Xero invoices of ``invoice_list``."""
+        updated_dates = dict((invoice.get('InvoiceID'), invoice.get('UpdatedDateUTC')) for invoice in invoice_list)
+        self._mark_xero_synced(company, dict((invoice_id.id, updated_dates.get(invoice_id.xero_invoice_id)) for invoice_id in self))
 
     def tax_calculation(self):
         self.invoice_line_ids.with_context({'check_move_validity': False,'line_amount_type': self.line_amount_type})._onchange_product_id()
@@ -82,28 +147,50 @@ class AccountMove(models.Model):
             if len(lines) != 0:
                 invoice_id.with_context({'allocation_amount': payment['Amount']}).js_assign_outstanding_line(lines.id)
 
-    def pay_invoice(self, xero_account_id, xero, partner, xero_invoice, odoo_invoice, type, company=False):
+    @api.model
+    def _get_xero_payments(self, documents, xero_account=None, xero=None):
+        """
+            Map the PaymentIDs of the payments of ``documents`` (Xero invoices
+            or credit notes) that are not imported yet to their account. With
+            ``xero``, the accounts of these payments only are fetched by chunks
+            (see xero.account._get_payment_accounts). The account is None for
+            the payments not fetched, pay_invoice fetches them.
+        """
+        payment_ids = set(payment.get('PaymentID') for document in documents
+                          for payment in document.get('Payments') or [] if payment.get('PaymentID'))
+        if payment_ids:
+            payment_ids -= set(self.env['account.move.line.xero.log'].search([('xero_payment', 'in', list(payment_ids))]).mapped('xero_payment'))
+        payment_accounts = {}
+        if payment_ids and xero is not None:
+            payment_accounts = (xero_account or self.env['xero.account'])._get_payment_accounts(xero, payment_ids)
+        return dict((payment_id, payment_accounts.get(payment_id)) for payment_id in payment_ids)
+
+    def pay_invoice(self, xero_account_id, xero, partner, xero_invoice, odoo_invoice, type, company=False, payments=None):
         partner_pool = self.env['res.partner']
         currency_pool = self.env['res.currency']
         account_pool = self.env['account.account']
         xero_pool = self.env['xero.account']
         company_pool = self.env['res.company']
         move_line_pool = self.env['account.move.line.xero.log']
+        lookup = get_import_lookup(self.env, xero)
         if partner and xero_invoice and odoo_invoice:
             invoice = odoo_invoice
             partner_id = partner_pool._find_accounting_partner(partner).id
             if xero_invoice.get('Payments'):
+                if payments is None:
+                    payments = self._get_xero_payments([xero_invoice])
                 for payment in xero_invoice.get('Payments'):
-                    payment_line = move_line_pool.search([('xero_payment', '=', payment.get('PaymentID'))])
-                    currency_id = currency_pool.search([('name', '=', xero_invoice.get('CurrencyCode'))], limit=1)
+                    # Payments already imported are not in ``payments``
+                    if payment.get('PaymentID') not in payments:
+                        continue
+                    currency_id = currency_pool.browse(lookup.currency_id(xero_invoice.get('CurrencyCode')))
                     if not currency_id:
                         currency_list = xero.currencies.all()
                         currency_pool.import_currency(currency_list, xero)
-                        currency_id = currency_pool.search([('name', '=', xero_invoice.get('CurrencyCode'))], limit=1)
+                        currency_id = currency_pool.browse(lookup.currency_id(xero_invoice.get('CurrencyCode')))
 
                     if payment.get('PaymentID'):
-                        xero_payment_id = xero.payments.get(payment.get('PaymentID'))
-                        payment_account = xero_payment_id[0].get('Account')
+                        payment_account = payments.pop(payment.get('PaymentID')) or xero.payments.get(payment.get('PaymentID'))[0].get('Account')
                         account = account_pool.search([('code', '=', payment_account.get('Code')), ('acc_id', '=', payment_account.get('AccountID'))],limit=1)
                         if not account:
                             account_list = xero.accounts.all()
@@ -121,34 +208,33 @@ class AccountMove(models.Model):
                             company_id = company_pool.browse(company)
                             raise UserError(_("Please Create or Add 'Payment Journal' for account \'%s %s\' of company \'%s\'.")% (account.code, account.name, company_id.name))
 
-                    if not payment_line:
-                        date = payment.get('Date')
-                        account_payment_vals = {
-                                            'invoice_ids': [(6, 0, odoo_invoice.ids)],
-                                            'amount': payment.get('Amount'),
-                                            'currency_id': currency_id and currency_id.id or False,
-                                            'partner_id': partner_id,
-                                            'company_id': company,
-                                            'journal_id': payment_journal and payment_journal.id or False,
-                                            'payment_date': date or fields.Date.today(),
-                                            'partner_type': odoo_invoice.type in ('out_invoice', 'out_refund') and 'customer' or 'supplier',
-                                            'xero_payment_id': payment.get('PaymentID') or False,
-                                            }
-                        if type in ['out_invoice', 'in_refund']:
-                            account_payment_vals.update({'payment_type':invoice.type in ('out_invoice', 'in_refund') and 'inbound' or 'outbound',
-                                        'payment_method_id': self.env.ref('account.account_payment_method_manual_in').id})
-                        elif type in ['in_invoice', 'out_refund']:
-                            account_payment_vals.update({'payment_type':invoice.type in ('in_invoice', 'out_refund') and 'outbound' or 'inbound',
-                                        'payment_method_id': self.env.ref('account.account_payment_method_manual_out').id})
-                        account_payment = invoice.env['account.payment'].create([account_payment_vals])
-                        move_line_pool.create({'name': partner.name, 'xero_payment': payment.get('PaymentID')})
-                        account_payment.invoice_ids.state = 'posted'
-                        if account_payment.invoice_ids.state == 'posted':
-                            if xero_invoice.get('CurrencyRate'):
-                                account_payment.with_context({'CurrencyRate': payment.get('CurrencyRate')}).post()
-                            else:
-                                account_payment.post()
-                            self._cr.commit()
+                    date = payment.get('Date')
+                    account_payment_vals = {
+                                        'invoice_ids': [(6, 0, odoo_invoice.ids)],
+                                        'amount': payment.get('Amount'),
+                                        'currency_id': currency_id and currency_id.id or False,
+                                        'partner_id': partner_id,
+                                        'company_id': company,
+                                        'journal_id': payment_journal and payment_journal.id or False,
+                                        'payment_date': date or fields.Date.today(),
+                                        'partner_type': odoo_invoice.type in ('out_invoice', 'out_refund') and 'customer' or 'supplier',
+                                        'xero_payment_id': payment.get('PaymentID') or False,
+                                        }
+                    if type in ['out_invoice', 'in_refund']:
+                        account_payment_vals.update({'payment_type':invoice.type in ('out_invoice', 'in_refund') and 'inbound' or 'outbound',
+                                    'payment_method_id': self.env.ref('account.account_payment_method_manual_in').id})
+                    elif type in ['in_invoice', 'out_refund']:
+                        account_payment_vals.update({'payment_type':invoice.type in ('in_invoice', 'out_refund') and 'outbound' or 'inbound',
+                                    'payment_method_id': self.env.ref('account.account_payment_method_manual_out').id})
+                    account_payment = invoice.env['account.payment'].create([account_payment_vals])
+                    move_line_pool.create({'name': partner.name, 'xero_payment': payment.get('PaymentID')})
+                    account_payment.invoice_ids.state = 'posted'
+                    if account_payment.invoice_ids.state == 'posted':
+                        if xero_invoice.get('CurrencyRate'):
+                            account_payment.with_context({'CurrencyRate': payment.get('CurrencyRate')}).post()
+                        else:
+                            account_payment.post()
+                        self._cr.commit()
 
     def import_invoice(self, xero_account_id, invoice_list, xero, company=False, without_product=False, import_option=None, customer_inv_journal_id=False, vendor_bill_journal_id=False):
         inv_line_pool = self.env['account.move.line']
@@ -158,12 +244,41 @@ class AccountMove(models.Model):
         product_pool = self.env['product.product']
         partner_pool = self.env['res.partner']
         currency_pool = self.env['res.currency']
+        lookup = get_import_lookup(self.env, xero)
         # xero_account = self.env['xero.account'].search([('company_id', '=', company)], limit=1)
         xero_account = self.env['xero.account'].browse(xero_account_id)
+        xero_invoice_ids = [invoice.get('InvoiceID') for invoice in invoice_list if invoice.get('Total') != 0.0]
+        existing_invoices = self.search([('xero_invoice_id', 'in', xero_invoice_ids)])
+        # Invoices changed in Odoo since their last sync keep their fingerprint, their changes are still exported
+        changed_invoices = existing_invoices._xero_sync_state(company)[1]
+        # Invoices created, or updated while in sync, by this page
+        imported = self.browse()
+
+        # The invoices, lines and products of the page are read with one query each,
+        # taxes, accounts and default accounts come from the lookup of the sync run
+        invoices_by_xero_id = {}
+        for invoice_id in existing_invoices:
+            invoices_by_xero_id[invoice_id.xero_invoice_id] = invoices_by_xero_id.get(invoice_id.xero_invoice_id, self.browse()) | invoice_id
+        page_lines = [line for invoice in invoice_list if invoice.get('Total') != 0.0 for line in invoice.get('LineItems') or []]
+        lines_by_xero_id = {}
+        for line_id in inv_line_pool.search([('xero_invoice_line_id', 'in', [line.get('LineItemID') for line in page_lines if line.get('LineItemID')]),
+                                             ('company_id', '=', company)]):
+            lines_by_xero_id[line_id.xero_invoice_line_id] = lines_by_xero_id.get(line_id.xero_invoice_line_id, inv_line_pool) | line_id
+        products_by_code = {}
+        for product_id in product_pool.search([('default_code', 'in', list(set(line.get('ItemCode') for line in page_lines if line.get('ItemCode'))))]):
+            products_by_code[product_id.default_code] = products_by_code.get(product_id.default_code, product_pool) | product_id
+
+        partner_ids = self._get_contact_partner_ids(xero_account, xero, [
+            (invoice.get('Contact') or {}).get('ContactID') for invoice in invoice_list
+            if invoice.get('Total') != 0.0 and (invoice.get('InvoiceID') in invoices_by_xero_id or import_option in ['create', 'both'])], company)
+        payments = self._get_xero_payments([invoice for invoice in invoice_list if invoice.get('Total') != 0.0], xero_account, xero)
+
         for invoice in invoice_list:
             if invoice.get('Total') != 0.0:
-                invoice_res = self.search([('xero_invoice_id', '=', invoice.get('InvoiceID'))])
+                invoice_res = invoices_by_xero_id.get(invoice.get('InvoiceID'), self.browse())
                 if invoice_res and import_option in ['update', 'both']:
+                    if invoice_res[0] not in changed_invoices:
+                        imported |= invoice_res[0]
                     if invoice.get('Status') == 'VOIDED' and invoice_res[0].state == 'posted':
                         invoice_res[0].button_draft()
                     if invoice.get('Status') in ['DELETED', 'VOIDED'] and invoice_res[0].state == 'draft':
@@ -180,7 +295,7 @@ class AccountMove(models.Model):
                                 line_items = []
                                 for lines in invoice.get('LineItems'):
                                     available_lines.append(lines.get('LineItemID'))
-                                    line = inv_line_pool.search([('xero_invoice_line_id', '=', lines.get('LineItemID')),('company_id', '=', company)])
+                                    line = lines_by_xero_id.get(lines.get('LineItemID'), inv_line_pool)
                                     if flag == 1:
                                         line_amount = lines.get('LineAmount') - lines.get('TaxAmount')
                                         unit_amount = line_amount / lines.get('Quantity')
@@ -189,15 +304,15 @@ class AccountMove(models.Model):
                                         unit_amount = lines.get('UnitAmount')
 
                                     if lines.get('TaxType'):
-                                        tax_id = tax_pool.search([('xero_tax_type', '=', lines.get('TaxType')),('company_id', '=', company)])
+                                        tax_id = tax_pool.browse(lookup.tax_id(lines.get('TaxType'), company))
                                     else:
                                         tax_id = False
 
-                                    acc = account_pool.search([('code', '=', lines.get('AccountCode')),('company_id', '=', company)])
+                                    acc = account_pool.browse(lookup.account_id(lines.get('AccountCode'), company))
                                     if not acc and invoice.get('Type') == 'ACCREC':
-                                        acc = self.env['ir.property'].get('property_account_income_categ_id', 'product.category')
+                                        acc = account_pool.browse(lookup.default_account_id('property_account_income_categ_id'))
                                     elif not acc and invoice.get('Type') == 'ACCPAY':
-                                        acc = self.env['ir.property'].get('property_account_expense_categ_id', 'product.category')
+                                        acc = account_pool.browse(lookup.default_account_id('property_account_expense_categ_id'))
                                     if line:
                                         if lines.get('ItemCode'):
                                             if without_product:
@@ -216,7 +331,7 @@ class AccountMove(models.Model):
                                                     line.with_context({'check_move_validity': False, 'line_amount_type': invoice.get('LineAmountTypes')})._onchange_mark_recompute_taxes()
 
                                             elif not without_product:
-                                                product = product_pool.search([('default_code', '=', lines.get('ItemCode'))])
+                                                product = products_by_code.get(lines.get('ItemCode'), product_pool)
                                                 if not product:
                                                     raise Warning("Please First Import Product.")
                                                 for product_id in product:
@@ -267,7 +382,7 @@ class AccountMove(models.Model):
                                                     vals.update({'account_id': acc and acc.id})
                                                     line_items.append(vals)
                                             elif not without_product:
-                                                product = product_pool.search([('default_code', '=', lines.get('ItemCode'))])
+                                                product = products_by_code.get(lines.get('ItemCode'), product_pool)
                                                 if not product:
                                                     raise Warning("Please First Import Product.")
                                                 for product_id in product:
@@ -306,12 +421,9 @@ class AccountMove(models.Model):
                                 else:
                                     xero_type = 'in_invoice'
 
-                                partner = partner_pool.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda partner: partner.contact_xero_company_ids.filtered(lambda contact: contact.xero_contact_id == invoice.get('Contact').get('ContactID') and contact.company_id.id == company))
-                                if not partner:
-                                    xero_account.import_contact_overwrite() if xero_account.contact_overwrite else xero_account.import_contact()
-                                    partner = partner_pool.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda partner: partner.contact_xero_company_ids.filtered(lambda contact: contact.xero_contact_id == invoice.get('Contact').get('ContactID') and contact.company_id.id == company))
+                                partner = partner_pool.browse(partner_ids.get(invoice.get('Contact').get('ContactID'), []))
 
-                                currency_id = currency_pool.search([('name', '=', invoice.get('CurrencyCode'))])
+                                currency_id = currency_pool.browse(lookup.currency_id(invoice.get('CurrencyCode')))
 
                                 vals = {
                                     'partner_id': partner and partner[0].id or False,
@@ -345,24 +457,21 @@ class AccountMove(models.Model):
                                 invoice_res[0].with_context({'CurrencyRate': invoice.get('CurrencyRate')}).action_post()
                             if invoice.get('AmountPaid') != 0.0 or invoice.get('Total') !=  invoice.get('AmountDue'):
                                 if invoice_res[0].type in ('out_invoice', 'out_refund') and invoice.get('Type') == 'ACCREC':
-                                    self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company)
+                                    self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company, payments=payments)
                                 else:
-                                    self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company)
+                                    self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company, payments=payments)
                         if invoice.get('Status') == 'PAID' and invoice_res[0].state in ['draft', 'posted'] and invoice_res[0].invoice_line_ids:
                             if invoice_res[0].state == 'draft':
                                 invoice_res[0].with_context({'CurrencyRate': invoice.get('CurrencyRate')}).action_post()
                             if invoice_res[0].type in ('out_invoice', 'out_refund') and invoice.get('Type') == 'ACCREC':
-                                self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company)
+                                self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company, payments=payments)
                             else:
-                                self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company)
+                                self.pay_invoice(xero_account_id, xero, invoice_res[0].partner_id, invoice, invoice_res[0], type='out_invoice', company=company, payments=payments)
 
                 elif not invoice_res and import_option in ['create', 'both']:
                     flag = 0
                     if invoice and invoice.get('Status') not in ['DELETED', 'VOIDED']:
-                        partner = partner_pool.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda partner: partner.contact_xero_company_ids.filtered(lambda contact: contact.xero_contact_id == invoice.get('Contact').get('ContactID') and contact.company_id.id == company))
-                        if not partner:
-                            xero_account.import_contact_overwrite() if xero_account.contact_overwrite else xero_account.import_contact()
-                            partner = partner_pool.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda partner: partner.contact_xero_company_ids.filtered(lambda contact: contact.xero_contact_id == invoice.get('Contact').get('ContactID') and contact.company_id.id == company))
+                        partner = partner_pool.browse(partner_ids.get(invoice.get('Contact').get('ContactID'), []))
 
                         invoice_lines = []
                         sub_tax = invoice.get('SubTotal') + invoice.get('TotalTax')
@@ -370,11 +479,11 @@ class AccountMove(models.Model):
                             flag = 1
 
                         for lines in invoice.get('LineItems'):
-                            acc = account_pool.search([('code', '=', lines.get('AccountCode')),('company_id', '=', company)])
+                            acc = account_pool.browse(lookup.account_id(lines.get('AccountCode'), company))
                             if not acc and invoice.get('Type') == 'ACCREC':
-                                acc = self.env['ir.property'].get('property_account_income_categ_id', 'product.category')
+                                acc = account_pool.browse(lookup.default_account_id('property_account_income_categ_id'))
                             elif not acc and invoice.get('Type') == 'ACCPAY':
-                                acc = self.env['ir.property'].get('property_account_expense_categ_id', 'product.category')
+                                acc = account_pool.browse(lookup.default_account_id('property_account_expense_categ_id'))
 
                             if flag == 1:
                                 line_amount = lines.get('LineAmount') - lines.get('TaxAmount')
@@ -384,7 +493,7 @@ class AccountMove(models.Model):
                                 unit_amount = lines.get('UnitAmount')
 
                             if lines.get('TaxType'):
-                                tax_id = tax_pool.search([('xero_tax_type', '=', lines.get('TaxType')),('company_id', '=', company)])
+                                tax_id = tax_pool.browse(lookup.tax_id(lines.get('TaxType'), company))
                             else:
                                 tax_id = False
 
@@ -404,7 +513,7 @@ class AccountMove(models.Model):
                                         invoice_lines.append((0, 0, vals))
 
                                 elif not without_product:
-                                    product = product_pool.search([('default_code', '=', lines.get('ItemCode'))])
+                                    product = products_by_code.get(lines.get('ItemCode'), product_pool)
                                     if not product:
                                         raise Warning("Please First Import Product.")
                                     for product_id in product:
@@ -439,7 +548,7 @@ class AccountMove(models.Model):
                         else:
                             xero_type = 'in_invoice'
 
-                        currency_id = currency_pool.search([('name', '=', invoice.get('CurrencyCode'))])
+                        currency_id = currency_pool.browse(lookup.currency_id(invoice.get('CurrencyCode')))
                         if invoice.get('Type') == 'ACCREC':
                             journal_id = customer_inv_journal_id
                         elif invoice.get('Type') == 'ACCPAY':
@@ -462,6 +571,7 @@ class AccountMove(models.Model):
                             inv_default.update({'invoice_line_ids': invoice_lines})
 
                         inv_id = inv_pool.with_context(invoice_type).create(inv_default)
+                        imported |= inv_id
                         inv_id._compute_amount()
                         inv_id._onchange_invoice_line_ids()
                         inv_id._onchange_currency()
@@ -473,14 +583,17 @@ class AccountMove(models.Model):
                             if inv_id and invoice.get('Status') == 'AUTHORISED':
                                 if invoice.get('AmountPaid') != 0.0 or invoice.get('Total') !=  invoice.get('AmountDue'):
                                     if inv_id.type in ['out_invoice', 'out_refund']:
-                                        self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company)
+                                        self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company, payments=payments)
                                     else:
-                                        self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company)
+                                        self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company, payments=payments)
                             if inv_id and invoice.get('Status') == 'PAID':
                                 if inv_id.type in ['out_invoice', 'out_refund']:
-                                    self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company)
+                                    self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company, payments=payments)
                                 else:
-                                    self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company)
+                                    self.pay_invoice(xero_account_id, xero, inv_id.partner_id, invoice, inv_id, type='out_invoice', company=company, payments=payments)
+        if imported:
+            imported._mark_xero_invoices_synced(invoice_list, company)
+            self._cr.commit()
 
     def import_credit_notes(self, xero_account_id,credit_notes_list, xero, company=False, without_product=False, import_option=None, customer_inv_journal_id=False, vendor_bill_journal_id=False):
         partner_pool = self.env['res.partner']
@@ -488,9 +601,13 @@ class AccountMove(models.Model):
         account_pool = self.env['account.account']
         product_pool = self.env['product.product']
         ir_property_pool = self.env['ir.property']
+        lookup = get_import_lookup(self.env, xero)
         tax_pool = self.env['account.tax']
         # xero_account = self.env['xero.account'].search([('company_id', '=', company)], limit=1)
         xero_account = self.env['xero.account'].browse(xero_account_id)
+        partner_ids = self._get_contact_partner_ids(xero_account, xero, [
+            (credit_note.get('Contact') or {}).get('ContactID') for credit_note in credit_notes_list if credit_note.get('Total') != 0.0], company)
+        payments = self._get_xero_payments([credit_note for credit_note in credit_notes_list if credit_note.get('Total') != 0.0], xero_account, xero)
         for credit_note in credit_notes_list:
             InvoiceData = {}
             if credit_note.get('Total') != 0.0:
@@ -500,16 +617,13 @@ class AccountMove(models.Model):
                     current_credit_note.invoice_line_ids.with_context({'check_move_validity': False}).unlink()
                 invoice_type = 'out_refund' if credit_note['Type'] == 'ACCRECCREDIT' else 'in_refund'
                 if current_credit_note.state == 'draft' or not current_credit_note:
-                    customer = partner_pool.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda partner: partner.contact_xero_company_ids.filtered(lambda contact: contact.xero_contact_id == credit_note.get('Contact').get('ContactID') and contact.company_id.id == company))
-                    if not customer:
-                        xero_account.import_contact_overwrite() if xero_account.contact_overwrite else xero_account.import_contact()
-                        customer = partner_pool.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda partner: partner.contact_xero_company_ids.filtered(lambda contact: contact.xero_contact_id == credit_note.get('Contact').get('ContactID') and contact.company_id.id == company))
+                    customer = partner_pool.browse(partner_ids.get(credit_note.get('Contact').get('ContactID'), []))
 
                     if credit_note.get('Type') == 'ACCRECCREDIT':
                         journal_id = customer_inv_journal_id
                     elif credit_note.get('Type') == 'ACCPAYCREDIT':
                         journal_id = vendor_bill_journal_id
-                    currency_id = currency_pool.search([('name', '=', credit_note.get('CurrencyCode'))], limit=1)
+                    currency_id = currency_pool.browse(lookup.currency_id(credit_note.get('CurrencyCode')))
                     InvoiceData.update({'partner_id': customer.id or False,
                                         'currency_id': currency_id and currency_id.id or False,
                                         'invoice_date': credit_note.get('DateString'),
@@ -526,7 +640,7 @@ class AccountMove(models.Model):
                     invoice_lines = []
                     for line in credit_note.get('LineItems'):
                         product_id = False
-                        account_id = account_pool.search([('code', '=', line.get('AccountCode')), ('company_id', '=', company)], limit=1)
+                        account_id = account_pool.browse(lookup.account_id(line.get('AccountCode'), company))
                         if line.get('ItemCode'):
                             product_id = product_pool.search([('default_code', '=', line.get('ItemCode'))], limit=1)
                         if product_id:
@@ -601,12 +715,13 @@ class AccountMove(models.Model):
                         if current_credit_note.state == 'draft':
                             current_credit_note.with_context({'CurrencyRate': credit_note.get('CurrencyRate')}).post()
                         if credit_note.get('Payments'):
-                            self.pay_invoice(xero_account_id, xero, current_credit_note.partner_id, credit_note, current_credit_note, type=current_credit_note.type, company=company)
+                            self.pay_invoice(xero_account_id, xero, current_credit_note.partner_id, credit_note, current_credit_note, type=current_credit_note.type, company=company, payments=payments)
                         if credit_note.get('Allocations') and credit_note.get('Status') == 'PAID':
                             self.pay_creditnote(xero, current_credit_note.partner_id, credit_note, current_credit_note, type=current_credit_note.type, company=company)
 
     def import_manual_journal(self, journal_list, xero, company=False, import_option=None):
         tax_pool = self.env['account.tax']
+        lookup = get_import_lookup(self.env, xero)
         move_line_pool = self.env['account.move.line']
         for journal in journal_list:
             journal_res = self.search([('xero_manual_journal_id', '=', journal.get('ManualJournalID'))], limit=1)
@@ -621,7 +736,7 @@ class AccountMove(models.Model):
 
                 journal_res.line_ids.unlink()
                 for line_id in journal.get('JournalLines'):
-                    account = self.env['account.account'].search([('code', '=', line_id.get('AccountCode')), ('company_id', '=', company)], limit=1)
+                    account = self.env['account.account'].browse(lookup.account_id(line_id.get('AccountCode'), company))
                     if not account:
                         _logger.info("Account Code '%s' is not available. Please First Import Chart of Account.", line_id.get('AccountCode'))
                         raise Warning(("Account Code '%s' is not available. Please First Import Chart of Account.") % line_id.get('AccountCode'))
@@ -716,7 +831,7 @@ class AccountMove(models.Model):
 
                 journal_line_list = []
                 for line_id in journal.get('JournalLines'):
-                    account = self.env['account.account'].search([('code', '=', line_id.get('AccountCode')),('company_id', '=', company)], limit=1)
+                    account = self.env['account.account'].browse(lookup.account_id(line_id.get('AccountCode'), company))
 
                     if not account:
                         _logger.info("Account Code '%s' is not available. Please First Import Chart of Account.",line_id.get('AccountCode'))
@@ -799,12 +914,19 @@ class AccountMove(models.Model):
                     journal_id.post()
                 self._cr.commit()
 
-    def export_invoice(self, invoice_list, xero, last_export_date, company=False, disable_export=False):
+    def export_invoice(self, xero, last_export_date, company=False, disable_export=False):
         xero_account = self.env['xero.account'].search([('company_id', '=', company)], limit=1)
         if self._context.get('invoice_ids'):
             invoice_ids = self._context.get('invoice_ids')
         else:
-            if last_export_date:
+            queued_ids = self.env['xero.sync.queue'].changed_ids(self._name, last_export_date)
+            if queued_ids is not None:
+                invoice_ids = self.search([('id', 'in', queued_ids),
+                                           ('company_id', '=', company),
+                                           ('able_to_xero_export', '=', True),
+                                           ('type', 'in', ['out_invoice', 'in_invoice']),
+                                           ('state', '!=', 'cancel')])
+            elif last_export_date:
                 invoice_ids = self.search([('company_id', '=', company),
                                            ('able_to_xero_export', '=', True),
                                            ('type', 'in', ['out_invoice', 'in_invoice']),
@@ -816,13 +938,16 @@ class AccountMove(models.Model):
                                            ('able_to_xero_export', '=', True),
                                            ('type', 'in', ['out_invoice', 'in_invoice']),
                                            ('state', '!=', 'cancel')])
+            # Skip the invoices whose exported values are still the ones Xero has
+            invoice_ids -= invoice_ids._xero_sync_state(company)[0]
+        # Only the invoices of the batch already in Xero are fetched, for their status
+        invoice_statuses = xero_account._get_invoice_statuses(xero, invoice_ids.mapped('xero_invoice_id'))
         update_invoice_data = []
         update_invoice_data_list = []
         create_invoice_data = []
         create_invoice_data_list = []
         count = 0
         c = 0
-        request = 0
         for invoice_id in invoice_ids:
             if invoice_id.type == 'out_invoice':
                 type = u'ACCREC'
@@ -839,118 +964,102 @@ class AccountMove(models.Model):
                 self.env['mismatch.log'].create(mismatch_vals)
                 continue
             if invoice_id.xero_invoice_id:
-                for xero_inv in invoice_list:
-                    if xero_inv.get('InvoiceID') == invoice_id.xero_invoice_id and xero_inv.get('Status') in ['DRAFT','SUBMITTED'] :
-                        invoice_currency_rate = 0.0
+                if invoice_statuses.get(invoice_id.xero_invoice_id) in ['DRAFT', 'SUBMITTED']:
+                    invoice_currency_rate = 0.0
+                    status = u'DRAFT'
+                    if invoice_id.state == 'draft':
                         status = u'DRAFT'
-                        if invoice_id.state == 'draft':
-                            status = u'DRAFT'
-                        elif invoice_id.state == 'posted':
-                            status = u'AUTHORISED'
-                            if invoice_id.currency_id.id != invoice_id.company_id.currency_id.id:
-                                if invoice_id.type == 'out_invoice':
-                                    if not invoice_id.line_ids[0].amount_currency == 0.0 and not invoice_id.line_ids[0].debit == 0.0:
-                                        invoice_currency_rate = abs(invoice_id.line_ids[0].amount_currency / invoice_id.line_ids[0].debit)
-                                else:
-                                    if not invoice_id.line_ids[0].amount_currency == 0.0 and not invoice_id.line_ids[0].credit == 0.0:
-                                        invoice_currency_rate = abs(invoice_id.line_ids[0].amount_currency / invoice_id.line_ids[0].credit)
+                    elif invoice_id.state == 'posted':
+                        status = u'AUTHORISED'
+                        if invoice_id.currency_id.id != invoice_id.company_id.currency_id.id:
+                            if invoice_id.type == 'out_invoice':
+                                if not invoice_id.line_ids[0].amount_currency == 0.0 and not invoice_id.line_ids[0].debit == 0.0:
+                                    invoice_currency_rate = abs(invoice_id.line_ids[0].amount_currency / invoice_id.line_ids[0].debit)
+                            else:
+                                if not invoice_id.line_ids[0].amount_currency == 0.0 and not invoice_id.line_ids[0].credit == 0.0:
+                                    invoice_currency_rate = abs(invoice_id.line_ids[0].amount_currency / invoice_id.line_ids[0].credit)
 
-                        line_amount_type = invoice_id.line_amount_type
+                    line_amount_type = invoice_id.line_amount_type
 
-                        if invoice_id.partner_id.parent_id:
-                            contact = invoice_id.partner_id.parent_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
+                    if invoice_id.partner_id.parent_id:
+                        contact = invoice_id.partner_id.parent_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
 
-                            if contact.xero_contact_id:
-                                contact_id = {u'ContactID': contact.xero_contact_id}
-                        else:
-                            contact = invoice_id.partner_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                            if contact.xero_contact_id:
-                                contact_id = {u'ContactID': contact.xero_contact_id}
+                        if contact.xero_contact_id:
+                            contact_id = {u'ContactID': contact.xero_contact_id}
+                    else:
+                        contact = invoice_id.partner_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
+                        if contact.xero_contact_id:
+                            contact_id = {u'ContactID': contact.xero_contact_id}
 
-                        invoice_data = {u'Type': type,
-                                        u'InvoiceID': invoice_id.xero_invoice_id,
-                                        u'Status': status,
-                                        u'LineAmountTypes': line_amount_type,
-                                        u'Contact': contact_id,
-                                        u'Date': invoice_id.invoice_date or fields.Date.today(),
-                                        u'DueDate': invoice_id.invoice_date_due or fields.Date.today(),
-                                        u'CurrencyCode': invoice_id.currency_id.name,
-                                        }
-                        if invoice_id.type == 'out_invoice':
-                            invoice_data.update({u'Reference': invoice_id.name or u''})
-                        elif invoice_id.type == 'in_invoice':
-                            invoice_data.update({u'InvoiceNumber': invoice_id.name or u''})
+                    invoice_data = {u'Type': type,
+                                    u'InvoiceID': invoice_id.xero_invoice_id,
+                                    u'Status': status,
+                                    u'LineAmountTypes': line_amount_type,
+                                    u'Contact': contact_id,
+                                    u'Date': invoice_id.invoice_date or fields.Date.today(),
+                                    u'DueDate': invoice_id.invoice_date_due or fields.Date.today(),
+                                    u'CurrencyCode': invoice_id.currency_id.name,
+                                    }
+                    if invoice_id.type == 'out_invoice':
+                        invoice_data.update({u'Reference': invoice_id.name or u''})
+                    elif invoice_id.type == 'in_invoice':
+                        invoice_data.update({u'InvoiceNumber': invoice_id.name or u''})
 
-                        if invoice_currency_rate:
-                            invoice_data.update({u'CurrencyRate': invoice_currency_rate})
-                        line_items = []
-                        for inv_line in invoice_id.invoice_line_ids:
-                            if inv_line.tax_ids:
-                                tax_type = inv_line.tax_ids[0]
-                            else:
-                                if invoice_id.type == 'out_invoice':
-                                    tax_type = self.env['account.tax'].search([('type_tax_use', '=', 'sale'), ('amount', '=', 0), ('company_id', '=', company)], limit=1)
-                                    if not tax_type:
-                                        company_id = self.env['res.company'].browse(company)
-                                        raise UserError(_('Please create account tax of type \'SALE\' and amount = 0.0 for Company: %s')% (company_id.name))
-                                else:
-                                    tax_type = self.env['account.tax'].search([('type_tax_use', '=', 'purchase'), ('amount', '=', 0), ('company_id', '=', company)], limit=1)
-                                    if not tax_type:
-                                        company_id = self.env['res.company'].browse(company)
-                                        raise UserError(_('Please create account tax of type \'PURCHASE\' and amount = 0.0 for Company: %s')%(company_id.name))
-                            if not tax_type.xero_tax_type:
-                                tax_rates = xero.taxrates.all()
-                                self.env['account.tax'].export_tax(tax_rates, xero, company=company, disable_export=disable_export)
-                            if inv_line.xero_invoice_line_id:
-                                vals = {u'LineItemID': inv_line.xero_invoice_line_id,
-                                        u'AccountCode': inv_line.account_id.code,
-                                        u'Description': inv_line.name or inv_line.product_id.name,
-                                        u'UnitAmount': inv_line.price_unit,
-                                        u'TaxType': u'' if inv_line.move_id.line_amount_type == 'NoTax' else  tax_type and tax_type.xero_tax_type or u'',
-                                        u'ValidationErrors': [],
-                                        u'Quantity': inv_line.quantity,
-                                        }
-                            else:
-                                vals = {u'AccountCode': inv_line.account_id.code,
-                                        u'Description': inv_line.name or inv_line.product_id.name,
-                                        u'UnitAmount': inv_line.price_unit,
-                                        u'TaxType': u'' if inv_line.move_id.line_amount_type == 'NoTax' else  tax_type and tax_type.xero_tax_type or u'',
-                                        u'ValidationErrors': [],
-                                        u'Quantity': inv_line.quantity,
-                                        }
+                    if invoice_currency_rate:
+                        invoice_data.update({u'CurrencyRate': invoice_currency_rate})
+                    line_items = []
+                    for inv_line in invoice_id.invoice_line_ids:
+                        if inv_line.tax_ids:
+                            tax_type = inv_line.tax_ids[0]
+                        else:
                             if invoice_id.type == 'out_invoice':
-                                vals.update({u'DiscountRate': inv_line.discount or 0.0})
-
-                            if inv_line.product_id:
-                                product = inv_line.product_id.product_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                                if not product.xero_item_id:
-                                    xero_account.export_product()
-                                vals.update({u'ItemCode': inv_line.product_id.default_code})
-                            line_items.append(vals)
-                        if line_items:
-                            invoice_data.update({u'LineItems': line_items})
-                        # invoice in draft state individual request
-                        if invoice_id.state == 'draft':
-                            request += 1
-                            if request > 30:
-                                time.sleep(1)
-                            inv_rec = xero.invoices.save(invoice_data)
-
-                            line_item_ids = []
-                            for lines in inv_rec[0].get('LineItems'):
-                                line_item_ids.append(lines.get('LineItemID'))
-                            index = 0
-                            for lines in invoice_id.invoice_line_ids:
-                                lines.write({'xero_invoice_line_id': line_item_ids[index], 'move_id': invoice_id.id})
-                                index += 1
-                            self._cr.commit()
+                                tax_type = self.env['account.tax'].search([('type_tax_use', '=', 'sale'), ('amount', '=', 0), ('company_id', '=', company)], limit=1)
+                                if not tax_type:
+                                    company_id = self.env['res.company'].browse(company)
+                                    raise UserError(_('Please create account tax of type \'SALE\' and amount = 0.0 for Company: %s')% (company_id.name))
+                            else:
+                                tax_type = self.env['account.tax'].search([('type_tax_use', '=', 'purchase'), ('amount', '=', 0), ('company_id', '=', company)], limit=1)
+                                if not tax_type:
+                                    company_id = self.env['res.company'].browse(company)
+                                    raise UserError(_('Please create account tax of type \'PURCHASE\' and amount = 0.0 for Company: %s')%(company_id.name))
+                        if not tax_type.xero_tax_type:
+                            tax_rates = xero.taxrates.all()
+                            self.env['account.tax'].export_tax(tax_rates, xero, company=company, disable_export=disable_export)
+                        if inv_line.xero_invoice_line_id:
+                            vals = {u'LineItemID': inv_line.xero_invoice_line_id,
+                                    u'AccountCode': inv_line.account_id.code,
+                                    u'Description': inv_line.name or inv_line.product_id.name,
+                                    u'UnitAmount': inv_line.price_unit,
+                                    u'TaxType': u'' if inv_line.move_id.line_amount_type == 'NoTax' else  tax_type and tax_type.xero_tax_type or u'',
+                                    u'ValidationErrors': [],
+                                    u'Quantity': inv_line.quantity,
+                                    }
                         else:
-                            update_invoice_data.append(invoice_data)
-                            count += 1
-                            if count == 50:
-                                update_invoice_data_list.append(update_invoice_data)
-                                update_invoice_data = []
-                                count = 0
+                            vals = {u'AccountCode': inv_line.account_id.code,
+                                    u'Description': inv_line.name or inv_line.product_id.name,
+                                    u'UnitAmount': inv_line.price_unit,
+                                    u'TaxType': u'' if inv_line.move_id.line_amount_type == 'NoTax' else  tax_type and tax_type.xero_tax_type or u'',
+                                    u'ValidationErrors': [],
+                                    u'Quantity': inv_line.quantity,
+                                    }
+                        if invoice_id.type == 'out_invoice':
+                            vals.update({u'DiscountRate': inv_line.discount or 0.0})
+
+                        if inv_line.product_id:
+                            product = inv_line.product_id.product_xero_company_ids.filtered(lambda l: l.company_id.id == company)
+                            if not product.xero_item_id:
+                                xero_account.export_product()
+                            vals.update({u'ItemCode': inv_line.product_id.default_code})
+                        line_items.append(vals)
+                    if line_items:
+                        invoice_data.update({u'LineItems': line_items})
+                    # draft and authorised invoices are sent by batches alike
+                    update_invoice_data.append((invoice_id, invoice_data))
+                    count += 1
+                    if count == 50:
+                        update_invoice_data_list.append(update_invoice_data)
+                        update_invoice_data = []
+                        count = 0
 
             elif not invoice_id.xero_invoice_id:
                 if invoice_id.state == 'posted':
@@ -1035,69 +1144,27 @@ class AccountMove(models.Model):
                     if line_items:
                         final_invoice_data.update({u'LineItems': line_items})
 
-                # invoice draft individual request
-                if invoice_id.state == 'draft':
-                    request += 1
-                    if request > 30:
-                        time.sleep(1)
-                    inv_rec = xero.invoices.put(final_invoice_data)
-                    line_item_ids = []
-                    for lines in inv_rec[0].get('LineItems'):
-                        line_item_ids.append(lines.get('LineItemID'))
-                    index = 0
-                    for lines in invoice_id.invoice_line_ids:
-                        lines.write({'xero_invoice_line_id': line_item_ids[index], 'move_id': invoice_id.id})
-                        index += 1
-                    invoice_id.write({'xero_invoice_id': inv_rec[0].get('InvoiceID'), 'xero_invoice_number': inv_rec[0].get('InvoiceNumber')})
-                    self._cr.commit()
-
-                else:
-                    # invoice request batch process
-                    create_invoice_data.append(final_invoice_data)
-                    c += 1
-                    if c == 50:
-                        create_invoice_data_list.append(create_invoice_data)
-                        create_invoice_data = []
-                        c = 0
+                # invoice request batch process, drafts included
+                create_invoice_data.append((invoice_id, final_invoice_data))
+                c += 1
+                if c == 50:
+                    create_invoice_data_list.append(create_invoice_data)
+                    create_invoice_data = []
+                    c = 0
 
         if create_invoice_data:
             create_invoice_data_list.append(create_invoice_data)
 
         for data in create_invoice_data_list:
-            inv_rec = xero.invoices.put(data)
-            for inv in inv_rec:
-                if inv.get('Type') == 'ACCREC':
-                    invoice_id = self.search([('name', '=', inv.get('Reference')), ('company_id', '=', company)])
-                else:
-                    invoice_id = self.search([('name', '=', inv.get('InvoiceNumber')), ('company_id', '=', company)])
-                line_item_ids = []
-                for lines in inv.get('LineItems'):
-                    line_item_ids.append(lines.get('LineItemID'))
-                index = 0
-                for lines in invoice_id.invoice_line_ids:
-                    lines.write({'xero_invoice_line_id': line_item_ids[index], 'move_id': invoice_id.id})
-                    index += 1
-                invoice_id.write({'xero_invoice_id': inv.get('InvoiceID'), 'xero_invoice_number': inv.get('InvoiceNumber')})
-                self._cr.commit()
+            results = xero.invoices.write_batch([invoice_data for invoice_id, invoice_data in data], method='put')
+            self.browse([invoice_id.id for invoice_id, invoice_data in data])._link_exported_invoices(results, company)
 
         if update_invoice_data:
             update_invoice_data_list.append(update_invoice_data)
 
         for data in update_invoice_data_list:
-            inv_rec = xero.invoices.save(data)
-            for inv in inv_rec:
-                if inv.get('Type') == 'ACCREC':
-                    invoice_id = self.search([('name', '=', inv.get('Reference')), ('type', '=', 'out_invoice'), ('company_id', '=', company)])
-                else:
-                    invoice_id = self.search([('name', '=', inv.get('InvoiceNumber')), ('type', '=', 'in_invoice'), ('company_id', '=', company)])
-                line_item_ids = []
-                for lines in inv.get('LineItems'):
-                    line_item_ids.append(lines.get('LineItemID'))
-                index = 0
-                for lines in invoice_id.invoice_line_ids:
-                    lines.write({'xero_invoice_line_id': line_item_ids[index], 'move_id': invoice_id.id})
-                    index += 1
-                self._cr.commit()
+            results = xero.invoices.write_batch([invoice_data for invoice_id, invoice_data in data], method='save')
+            self.browse([invoice_id.id for invoice_id, invoice_data in data])._link_exported_invoices(results, company)
 
     def export_payment(self, xero, company=False, disable_export=False):
         data = []
@@ -1194,8 +1261,9 @@ class AccountMove(models.Model):
         if data:
             payment_data.append(data)
         for data in payment_data:
-            xero_payment = xero.payments.put(data)
-            for payment in xero_payment:
+            results = xero.payments.write_batch(data, method='put')
+            self.env['mismatch.log'].log_rejected('account.payment', results)
+            for payment in [result.result for result in results if result.ok]:
                 payment_id = self.env['account.payment'].search([('name', '=', payment.get('Reference')), ('company_id', '=', company)])
                 payment_id.xero_payment_id = payment.get('PaymentID')
                 self._cr.commit()
@@ -1207,7 +1275,14 @@ class AccountMove(models.Model):
         if self._context.get('invoice_ids'):
             invoice_ids = self._context.get('invoice_ids')
         else:
-            if last_export_date:
+            queued_ids = self.env['xero.sync.queue'].changed_ids(self._name, last_export_date)
+            if queued_ids is not None:
+                invoice_ids = self.search([('id', 'in', queued_ids),
+                                           ('company_id', '=', company),
+                                           ('able_to_xero_export', '=', True),
+                                           ('type', 'in', ['out_refund', 'in_refund']),
+                                           ('state', '!=', 'cancel')])
+            elif last_export_date:
                 invoice_ids = self.search([('company_id', '=', company),
                                            ('able_to_xero_export', '=', True),
                                            ('type', 'in', ['out_refund', 'in_refund']),
@@ -1226,7 +1301,6 @@ class AccountMove(models.Model):
         create_creditnote_data_list = []
         c = 0
         count = 0
-        request = 0
         for invoice_id in invoice_ids:
             if invoice_id.type == 'out_refund':
                 type = u'ACCRECCREDIT'
@@ -1332,9 +1406,6 @@ class AccountMove(models.Model):
                                 invoice_data.update({u'LineItems': line_items})
 
                             if invoice_id.state == 'draft':
-                                request += 1
-                                if request > 30:
-                                    time.sleep(1)
                                 inv_rec = xero.creditnotes.save(invoice_data)
                             else:
                                 update_creditnote_data.append(invoice_data)
@@ -1423,9 +1494,6 @@ class AccountMove(models.Model):
                         final_invoice_data.update({u'LineItems': line_items})
                 # creditnote draft state individual request
                 if invoice_id.state == 'draft':
-                    request += 1
-                    if request > 30:
-                        time.sleep(1)
                     inv_rec = xero.creditnotes.put(final_invoice_data)
                     invoice_id.write({'xero_invoice_id': inv_rec[0].get('CreditNoteID'), 'xero_invoice_number': inv_rec[0].get('CreditNoteNumber')})
                     self._cr.commit()
@@ -1441,8 +1509,9 @@ class AccountMove(models.Model):
         if create_creditnote_data:
             create_creditnote_data_list.append(create_creditnote_data)
         for data in create_creditnote_data_list:
-            inv_rec = xero.creditnotes.put(data)
-            for inv in inv_rec:
+            results = xero.creditnotes.write_batch(data, method='put')
+            self.env['mismatch.log'].log_rejected(self._name, results)
+            for inv in [result.result for result in results if result.ok]:
                 invoice_id = self.search([('name', '=', inv.get('Reference')), ('company_id', '=', company)])
                 invoice_id.write({'xero_invoice_id': inv.get('CreditNoteID'), 'xero_invoice_number': inv.get('CreditNoteNumber')})
                 self._cr.commit()
@@ -1450,7 +1519,8 @@ class AccountMove(models.Model):
         if update_creditnote_data:
             update_creditnote_data_list.append(update_creditnote_data)
         for data in update_creditnote_data_list:
-            inv_rec = xero.creditnotes.save(data)
+            results = xero.creditnotes.write_batch(data, method='save')
+            self.env['mismatch.log'].log_rejected(self._name, results)
 
     def allocate_credit_note_payment(self, credit_note_guid, allocations, xero):
         """
@@ -1583,8 +1653,9 @@ class AccountMove(models.Model):
         if data:
             payment_data.append(data)
         for data in payment_data:
-            xero_payment = xero.payments.put(data)
-            for payment in xero_payment:
+            results = xero.payments.write_batch(data, method='put')
+            self.env['mismatch.log'].log_rejected('account.payment', results)
+            for payment in [result.result for result in results if result.ok]:
                 payment_id = self.env['account.payment'].search([('name', '=', payment.get('Reference')), ('company_id', '=', company)])
                 payment_id.xero_payment_id = payment.get('PaymentID')
                 self._cr.commit()
@@ -1603,11 +1674,18 @@ class AccountMove(models.Model):
 
 
 class AccountMoveLine(models.Model):
-    _inherit = 'account.move.line'
+    _name = 'account.move.line'
+    _inherit = ['account.move.line', 'xero.sync.mixin']
+    _xero_export_fields = ('name', 'quantity', 'price_unit', 'discount', 'account_id', 'product_id', 'tax_ids')
 
     xero_invoice_line_id = fields.Char('Xero InvoiceLine ID', readonly=True, copy=False)
     xero_invoice_payment_id = fields.Char('Xero Payment ID', readonly=True, copy=False)
 
+    def _xero_sync_records(self):
+        # Lines are exported with their invoice, the journal items of other
+        # entries are not tracked
+        return self.filtered(lambda l: l.move_id.is_invoice()).mapped('move_id')
+
     def _reconcile_lines(self, debit_moves, credit_moves, field):
         """ This function loops on the 2 recordsets given as parameter as long as it
             can find a debit and a credit to reconcile together. It returns the recordset of the
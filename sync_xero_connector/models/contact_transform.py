@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+
+def _join(*parts):
+    """Join the address lines Xero splits, as ``line1 + ' ' + line2``."""
+    value = ''
+    for index, part in enumerate(parts):
+        if part:
+            if index:
+                value += ' '
+            value += part
+    return value
+
+
+def normalize_email(email):
+    """Key emails are matched on: trimmed and lowercased, as indexed on res_partner."""
+    return (email or '').strip().lower()
+
+
+def transform_contact(contact_details):
+    """
+        Turn a Xero Contact dict into plain partner values.
+
+        This step has no side effect and doesn't touch the database: countries,
+        regions, the currency and the contact groups are returned as Xero
+        names them, the apply stage resolves them to records. It can run on
+        any thread or process.
+    """
+    street = {}
+    po_box = {}
+    is_po_address = False
+    for address in contact_details.get('Addresses') or []:
+        if address.get('AddressType') == 'STREET':
+            street = address
+        if address.get('AddressType') == 'POBOX':
+            po_box = address
+            is_po_address = is_po_address or any(po_box.get(key) for key in ('AddressLine1', 'AddressLine2', 'AddressLine3', 'AddressLine4', 'Country', 'Region'))
+
+    phones = {}
+    for phone in contact_details.get('Phones') or []:
+        phones[phone.get('PhoneType')] = phone.get('PhoneNumber', False)
+
+    invoice_address = False
+    if is_po_address:
+        invoice_address = {'name': contact_details.get('Name', False),
+                           'city': po_box.get('City', False),
+                           'country': po_box.get('Country'),
+                           'region': po_box.get('Region'),
+                           'attention_to': po_box.get('AttentionTo', False),
+                           'street': _join(po_box.get('AddressLine1'), po_box.get('AddressLine2')),
+                           'street2': _join(po_box.get('AddressLine3'), po_box.get('AddressLine4')),
+                           'zip': po_box.get('PostalCode') or u''}
+
+    return {
+        'contact_id': contact_details.get('ContactID'),
+        'partner': {
+            'name': contact_details.get('Name', False),
+            'phone': phones.get('DEFAULT', ''),
+            'mobile': phones.get('MOBILE', ''),
+            'direct_dial': phones.get('DDI', False),
+            'first_name': contact_details.get('FirstName', False),
+            'last_name': contact_details.get('LastName', False),
+            'active': contact_details.get('ContactStatus') == 'ACTIVE',
+            'skype_name': contact_details.get('SkypeUserName', False),
+            'email': contact_details.get('EmailAddress', False),
+            'attention_to': street.get('AttentionTo', False),
+            'city': street.get('City', False),
+            'street': _join(street.get('AddressLine1'), street.get('AddressLine2')),
+            'street2': _join(street.get('AddressLine3'), street.get('AddressLine4')),
+            'zip': street.get('PostalCode', False),
+            'website': contact_details.get('Website', False),
+            'tax_number': contact_details.get('TaxNumber', False)},
+        'country': street.get('Country'),
+        'region': street.get('Region'),
+        'currency': contact_details.get('DefaultCurrency'),
+        'group_ids': [group.get('ContactGroupID') for group in contact_details.get('ContactGroups') or []],
+        'bank_account': contact_details.get('BankAccountDetails'),
+        'invoice_address': invoice_address,
+        'contact_persons': [{'name': person.get('FirstName', '') + ' ' + person.get('LastName', ''),
+                             'first_name': person.get('FirstName', False),
+                             'last_name': person.get('LastName', False),
+                             'email': person.get('EmailAddress', False)}
+                            for person in contact_details.get('ContactPersons') or []],
+    }
+
+
+def transform_contacts(contact_list):
+    """Transform the contacts of a page that can be imported, those with addresses."""
+    return [(contact_details, transform_contact(contact_details))
+            for contact_details in contact_list if contact_details.get('Addresses')]
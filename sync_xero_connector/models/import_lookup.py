@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+import weakref
+
+# Lookups per Xero client, the client lives as long as the sync run
+_lookups = weakref.WeakKeyDictionary()
+
+
+def get_import_lookup(env, xero=None):
+    """Return the lookup of the sync run of ``xero``, a new one without a client."""
+    if xero is None:
+        return ImportLookup(env)
+    lookup = _lookups.get(xero)
+    if lookup is None or lookup.env.cr is not env.cr:
+        lookup = _lookups[xero] = ImportLookup(env)
+    return lookup
+
+
+class ImportLookup(object):
+    """
+        Reference data used over and over by the imports of a sync run:
+        countries, states, currencies, accounts, taxes and contact tags.
+
+        Each table is read once, the first time it is needed, into dicts keyed
+        by name/code. A key that is not in a loaded table is searched once more,
+        so records created by an earlier step of the run (imported accounts,
+        activated currencies...) are still found. Missing countries and states
+        are created in bulk with ``create_countries`` and ``create_states``.
+    """
+
+    def __init__(self, env):
+        self.env = env
+        self._tables = {}
+
+    def _table(self, name, loader):
+        if name not in self._tables:
+            self._tables[name] = loader()
+        return self._tables[name]
+
+    def _get(self, name, key, loader, search):
+        table = self._table(name, loader)
+        if key not in table:
+            record = search(key)
+            if not record:
+                return False
+            table[key] = record.id
+        return table[key]
+
+    @staticmethod
+    def _index(records, field):
+        index = {}
+        for record in records:
+            index.setdefault(record[field], record.id)
+        return index
+
+    # Countries and states
+
+    def _load_countries(self):
+        return self._index(self.env['res.country'].search([]), 'name')
+
+    def country_id(self, name):
+        if not name:
+            return False
+        return self._get('country', name, self._load_countries,
+                         lambda key: self.env['res.country'].search([('name', '=', key)], limit=1))
+
+    def create_countries(self, names):
+        countries = self._table('country', self._load_countries)
+        missing = sorted(set(name for name in names if name and not self.country_id(name)))
+        for country in self.env['res.country'].create([{'name': name} for name in missing]):
+            countries[country.name] = country.id
+
+    def _load_states(self):
+        states = {}
+        # Position of the state in the default order, a region matching both
+        # the name of a state and the code of another one picks the first
+        for position, state in enumerate(self.env['res.country.state'].search([])):
+            states.setdefault(('name', state.name), (position, state.id))
+            states.setdefault(('code', state.code), (position, state.id))
+        return states
+
+    def state_id(self, region):
+        """State named or coded ``region``, in any country."""
+        if not region:
+            return False
+        states = self._table('state', self._load_states)
+        matches = [states[key] for key in (('name', region), ('code', region)) if key in states]
+        if matches:
+            return min(matches)[1]
+        state = self.env['res.country.state'].search(['|', ('name', '=', region), ('code', '=', region)], limit=1)
+        if state:
+            states[('name', region)] = (-1, state.id)
+        return state.id
+
+    def create_states(self, regions):
+        """Create the missing states of ``regions``, a list of (region, country id)."""
+        states = self._table('state', self._load_states)
+        missing = {}
+        for region, country_id in regions:
+            if region and country_id and region not in missing and not self.state_id(region):
+                missing[region] = country_id
+        for state in self.env['res.country.state'].create([{'name': region, 'code': region, 'country_id': country_id}
+                                                            for region, country_id in missing.items()]):
+            states[('name', state.name)] = (-1, state.id)
+
+    # Currencies, accounts and tags
+
+    def currency_id(self, code):
+        if not code:
+            return False
+        return self._get('currency', code, lambda: self._index(self.env['res.currency'].search([]), 'name'),
+                         lambda key: self.env['res.currency'].search([('name', '=', key)], limit=1))
+
+    def account_id(self, code, company):
+        if not code:
+            return False
+        account_pool = self.env['account.account']
+        return self._get(('account', company), code,
+                         lambda: self._index(account_pool.search([('company_id', '=', company)]), 'code'),
+                         lambda key: account_pool.search([('code', '=', key), ('company_id', '=', company)], limit=1))
+
+    def _account_of_type(self, xml_id, company):
+        key = ('account_type', xml_id, company)
+        if key not in self._tables:
+            self._tables[key] = self.env['account.account'].search([('user_type_id', '=', self.env.ref(xml_id).id),
+                                                                   ('company_id', '=', company)], limit=1).id
+        return self._tables[key]
+
+    def receivable_account_id(self, company):
+        return self._account_of_type('account.data_account_type_receivable', company)
+
+    def payable_account_id(self, company):
+        return self._account_of_type('account.data_account_type_payable', company)
+
+    def tax_id(self, xero_tax_type, company):
+        if not xero_tax_type:
+            return False
+        tax_pool = self.env['account.tax']
+        return self._get(('tax', company), xero_tax_type,
+                         lambda: self._index(tax_pool.search([('xero_tax_type', '!=', False), ('company_id', '=', company)]), 'xero_tax_type'),
+                         lambda key: tax_pool.search([('xero_tax_type', '=', key), ('company_id', '=', company)], limit=1))
+
+    def default_account_id(self, property_name):
+        """Default account of the product categories for ``property_name``."""
+        key = ('property', property_name)
+        if key not in self._tables:
+            account = self.env['ir.property'].get(property_name, 'product.category')
+            self._tables[key] = account.id if account else False
+        return self._tables[key]
+
+    def category_id(self, xero_tag_id):
+        if not xero_tag_id:
+            return False
+        category_pool = self.env['res.partner.category']
+        return self._get('category', xero_tag_id,
+                         lambda: self._index(category_pool.search([('xero_tag_id', '!=', False)]), 'xero_tag_id'),
+                         lambda key: category_pool.search([('xero_tag_id', '=', key)], limit=1))
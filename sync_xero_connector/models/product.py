@@ -6,7 +6,10 @@ from odoo import api, fields, models, _
 
 
 class ProductTemplate(models.Model):
-    _inherit = "product.template"
+    _name = "product.template"
+    _inherit = ["product.template", "xero.sync.mixin"]
+    _xero_export_fields = ('name', 'active', 'default_code', 'description', 'list_price', 'categ_id', 'company_id',
+                           'taxes_id', 'supplier_taxes_id', 'property_account_income_id', 'property_account_expense_id')
 
     taxes_id = fields.Many2many('account.tax', 'product_taxes_rel', 'prod_id', 'tax_id',
                                 string='Customer Taxes', domain=[('type_tax_use', '!=', 'purchase')])
@@ -14,6 +17,10 @@ class ProductTemplate(models.Model):
                                          string='Vendor Taxes', domain=[('type_tax_use', '!=', 'sale')])
     set_initial_stock = fields.Boolean(string='Set Initial Stock')
 
+    def _xero_sync_records(self):
+        # Items are exported per variant
+        return self.with_context(active_test=False).mapped('product_variant_ids')
+
 
 class ProductXeroCompany(models.Model):
     _name = "product.xero.company"
@@ -22,11 +29,17 @@ class ProductXeroCompany(models.Model):
     company_id = fields.Many2one('res.company', 'Company', required=True)
     xero_item_id = fields.Char('Xero ItemID')
     product_id = fields.Many2one('product.product', 'Product')
+    xero_updated_date = fields.Datetime('Xero Updated Date', readonly=True)
+    xero_fingerprint = fields.Char('Xero Fingerprint', readonly=True)
 
 
 class ProductProduct(models.Model):
-    _inherit = 'product.product'
+    _name = 'product.product'
+    _inherit = ['product.product', 'xero.sync.mixin']
     _description = 'Product'
+    _xero_export_fields = ('name', 'active', 'default_code', 'description', 'standard_price', 'list_price', 'categ_id',
+                           'taxes_id', 'supplier_taxes_id', 'property_account_income_id', 'property_account_expense_id',
+                           'product_tmpl_id', 'company_id')
 
     product_xero_company_ids = fields.One2many('product.xero.company', 'product_id', string="Xero Multi Company")
 
@@ -34,6 +47,23 @@ class ProductProduct(models.Model):
         ('default_code_uniq', 'unique(default_code)', 'Internal Reference must be unique!'),
     ]
 
+    def _xero_sync_links(self, company):
+        links = {}
+        for xero_company in self.mapped('product_xero_company_ids'):
+            if xero_company.company_id.id == company and xero_company.xero_item_id:
+                links.setdefault(xero_company.product_id.id, xero_company)
+        return links
+
+    @api.model
+    def _mark_xero_items_synced(self, item_list, company):
+        """Mark the products linked to the Xero items of ``item_list`` as synced."""
+        xero_companies = self.env['product.xero.company'].search([('company_id', '=', company),
+                                                                  ('xero_item_id', 'in', [item.get('ItemID') for item in item_list if item.get('ItemID')])])
+        product_ids = dict((xero_company.xero_item_id, xero_company.product_id.id) for xero_company in xero_companies if xero_company.product_id)
+        updated_dates = dict((product_ids[item.get('ItemID')], item.get('UpdatedDateUTC'))
+                             for item in item_list if item.get('ItemID') in product_ids)
+        self.browse(list(updated_dates))._mark_xero_synced(company, updated_dates)
+
     @api.onchange('company_id')
     def _onchange_company(self):
         if self.company_id:
@@ -52,6 +82,12 @@ class ProductProduct(models.Model):
         """
         account_pool = self.env['account.account']
         tax_pool = self.env['account.tax']
+        # Products changed in Odoo since their last sync keep their fingerprint, their changes are still exported
+        changed_products = self.env['product.xero.company'].search([('company_id', '=', company),
+                                                                    ('xero_item_id', 'in', [product.get('ItemID') for product in product_list])]).mapped('product_id')
+        changed_products = changed_products._xero_sync_state(company)[1]
+        # UpdatedDateUTC of the products created, or updated while in sync, by the import
+        imported = {}
         for product in product_list:
             property_account_income_id = False
             property_account_expense_id = False
@@ -119,6 +155,8 @@ class ProductProduct(models.Model):
                             # 'location_id': warehouse.lot_stock_id.id
                         })
                     onhand_qty_id.change_product_qty()
+                if product_rec[0] not in changed_products:
+                    imported[product_rec[0].id] = product.get('UpdatedDateUTC')
                 self._cr.commit()
             elif not product_rec and import_option in ['create', 'both']:
                 product_id = self.create({'name': product.get('Name', product.get('Code')),
@@ -151,7 +189,11 @@ class ProductProduct(models.Model):
                             # 'location_id': warehouse.lot_stock_id.id
                         })
                     onhand_qty_id.change_product_qty()
+                imported[product_id.id] = product.get('UpdatedDateUTC')
                 self._cr.commit()
+        if imported:
+            self.browse(list(imported))._mark_xero_synced(company, imported)
+            self._cr.commit()
 
     def export_product(self, product_list, xero, last_export_date, company=False, item_ids=[]):
         """
@@ -170,7 +212,10 @@ class ProductProduct(models.Model):
             item_ids = self._context.get('product_ids')
         else:
             if len(item_ids) <= 0:
-                if last_export_date:
+                queued_ids = self.env['xero.sync.queue'].changed_ids(self._name, last_export_date)
+                if queued_ids is not None:
+                    item_ids = self.search([('id', 'in', queued_ids), '|', ('company_id', '=', company), ('company_id', '=', False)])
+                elif last_export_date:
                     item_ids = self.search(['|',('company_id', '=', company), ('company_id', '=', False), '|', ('write_date', '>=', last_export_date), ('create_date', '>=', last_export_date)])
                 else:
                     item_ids = self.search(['|', ('company_id', '=', company), ('company_id', '=', False)])
@@ -311,17 +356,24 @@ class ProductProduct(models.Model):
         if data:
             item_data.append(data)
         for data in item_data:
-            item_rec = xero.items.put(data)
+            results = xero.items.write_batch(data, method='put')
+            self.env['mismatch.log'].log_rejected(self._name, results)
+            item_rec = [result.result for result in results if result.ok]
             for item in item_rec:
                 product_id = self.search(['|',('default_code', '=', item.get('Code')), ('name', '=', item.get('Code'))])
                 xero_company = product_id.product_xero_company_ids.filtered(lambda l: l.company_id.id == company)
                 xero_company.xero_item_id = item.get('ItemID')
                 self._cr.commit()
+            self._mark_xero_items_synced(item_rec, company)
+            self._cr.commit()
 
         item_data = []
         data = []
         c = 0
-        for product in self.browse(same_record):
+        # Skip the products whose exported values are still the ones Xero has
+        update_products = self.browse(same_record)
+        update_products -= update_products._xero_sync_state(company)[0]
+        for product in update_products:
             code = product.default_code and product.default_code[:30]
             item_name = product.name and product.name[:49]
 
@@ -394,7 +446,9 @@ class ProductProduct(models.Model):
         if data:
             item_data.append(data)
         for data in item_data:
-            xero.items.save(data)
+            results = xero.items.write_batch(data, method='save')
+            self.env['mismatch.log'].log_rejected(self._name, results)
+            self._mark_xero_items_synced([result.result for result in results if result.ok], company)
             self._cr.commit()
 
     def action_export_product(self):
@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 # Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
 
+import logging
+from psycopg2 import IntegrityError
+
 from odoo import api, fields, models, _
 from odoo.exceptions import Warning
+from odoo.tools.sql import create_index
+from odoo.addons.sync_xero_connector.models.contact_transform import normalize_email, transform_contacts
+from odoo.addons.sync_xero_connector.models.import_lookup import get_import_lookup
+
+_logger = logging.getLogger(__name__)
 
 
 class ContactXeroCompany(models.Model):
@@ -12,11 +20,27 @@ class ContactXeroCompany(models.Model):
     company_id = fields.Many2one('res.company', 'Company', required=True)
     xero_contact_id = fields.Char('Xero ContctID')
     partner_id = fields.Many2one('res.partner', 'Contact')
+    xero_updated_date = fields.Datetime('Xero Updated Date', readonly=True)
+    xero_fingerprint = fields.Char('Xero Fingerprint', readonly=True)
+
+    _sql_constraints = [
+        ('company_xero_contact_uniq', 'unique(company_id, xero_contact_id)', 'A Xero contact can only be linked to one contact per company!'),
+    ]
+
+    def init(self):
+        super(ContactXeroCompany, self).init()
+        # Imports resolve ContactIDs with it, even if the constraint above couldn't be added
+        create_index(self._cr, 'contact_xero_company_company_contact_index', self._table, ['company_id', 'xero_contact_id'])
 
 
 class ResPartner(models.Model):
-    _inherit = 'res.partner'
+    _name = 'res.partner'
+    _inherit = ['res.partner', 'xero.sync.mixin']
     _description = 'Partner'
+    _xero_export_fields = ('name', 'active', 'email', 'skype_name', 'tax_number', 'first_name', 'last_name',
+                           'street', 'street2', 'city', 'zip', 'state_id', 'country_id', 'attention_to',
+                           'phone', 'mobile', 'direct_dial', 'bank_ids', 'type', 'parent_id', 'child_ids', 'company_id')
+    _xero_export_children = ('child_ids',)
 
     xero_name = fields.Char('Xero Conatct Name')
     skype_name = fields.Char('Skype')
@@ -28,6 +52,56 @@ class ResPartner(models.Model):
     direct_dial = fields.Char('Direct dial')
     contact_xero_company_ids = fields.One2many('contact.xero.company', 'partner_id', string="Xero Multi Company")
 
+    def _xero_sync_records(self):
+        # Contact persons and the invoice address are exported with their parent
+        return (self | self.mapped('parent_id')).filtered(lambda l: not l.parent_id)
+
+    def _xero_sync_links(self, company):
+        links = {}
+        for xero_company in self.mapped('contact_xero_company_ids'):
+            if xero_company.company_id.id == company and xero_company.xero_contact_id:
+                links.setdefault(xero_company.partner_id.id, xero_company)
+        return links
+
+    @api.model
+    def _mark_xero_contacts_synced(self, contact_list, company):
+        """Mark the partners linked to the Xero contacts of ``contact_list`` as synced."""
+        partner_ids = self._get_partner_ids_by_xero_contact([contact.get('ContactID') for contact in contact_list], company)
+        updated_dates = dict((partner_ids[contact.get('ContactID')], contact.get('UpdatedDateUTC'))
+                             for contact in contact_list if contact.get('ContactID') in partner_ids)
+        self.browse(list(updated_dates))._mark_xero_synced(company, updated_dates)
+
+    @api.model
+    def _get_queued_partners(self, last_export_date, company):
+        """Partners queued for export since ``last_export_date``, None when
+        the queue doesn't go back that far."""
+        partner_ids = self.env['xero.sync.queue'].changed_ids(self._name, last_export_date)
+        if partner_ids is None:
+            return None
+        return self.search([('id', 'in', partner_ids), ('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False)])
+
+    def init(self):
+        super(ResPartner, self).init()
+        # Overwrite mode imports match contacts on their normalized email
+        create_index(self._cr, 'res_partner_email_normalized_index', self._table, ['lower(trim(email))'])
+
+    @api.model
+    def _get_partner_ids_by_email(self, emails, company):
+        """
+            Map normalized ``emails`` to the id of the active top-level partner
+            of ``company`` using them, the first by name, in one indexed query.
+        """
+        emails = tuple(set(filter(None, map(normalize_email, emails))))
+        if not emails:
+            return {}
+        self.flush(['email', 'parent_id', 'company_id', 'active', 'display_name'])
+        self._cr.execute("""SELECT DISTINCT ON (lower(trim(email))) lower(trim(email)), id FROM res_partner
+                            WHERE lower(trim(email)) IN %s AND parent_id IS NULL AND active
+                              AND (company_id = %s OR company_id IS NULL)
+                            ORDER BY lower(trim(email)), display_name, id""",
+                         (emails, company))
+        return dict(self._cr.fetchall())
+
     @api.constrains('email')
     def _check_email(self):
         for obj in self:
@@ -53,6 +127,223 @@ class ResPartner(models.Model):
             #     contact_xero = self.contact_xero_company_ids - self.contact_xero_company_ids.xero_company
             #     contact_xero.unlink()
 
+    @api.model
+    def _get_partner_ids_by_xero_contact(self, xero_contact_ids, company):
+        """Map Xero ContactIDs to the ids of their partners in ``company``, in one query."""
+        xero_contact_ids = tuple(set(filter(None, xero_contact_ids)))
+        if not xero_contact_ids:
+            return {}
+        self.env['contact.xero.company'].flush(['company_id', 'xero_contact_id', 'partner_id'])
+        self._cr.execute("""SELECT xero_contact_id, partner_id FROM contact_xero_company
+                            WHERE company_id = %s AND xero_contact_id IN %s AND partner_id IS NOT NULL""",
+                         (company, xero_contact_ids))
+        return dict(self._cr.fetchall())
+
+    def _prepare_imported_contact(self, contact, company, lookup):
+        """
+            Resolve the countries, states, currency and tags of a transformed
+            Xero contact (see contact_transform) into the values of its
+            partner, invoice address and contact persons, without writing them.
+        """
+        invoice_address = False
+        if contact['invoice_address']:
+            invoice_address = dict(contact['invoice_address'])
+            invoice_address.update({'country_id': lookup.country_id(invoice_address.pop('country')),
+                                    'state_id': lookup.state_id(invoice_address.pop('region')),
+                                    'contact_xero_company_ids': [(0, 0, {'company_id': company})],
+                                    'type': 'invoice'})
+        return {
+            'partner': dict(contact['partner'],
+                            country_id=lookup.country_id(contact['country']),
+                            state_id=lookup.state_id(contact['region']),
+                            currency_id=lookup.currency_id(contact['currency']),
+                            property_account_receivable_id=lookup.receivable_account_id(company),
+                            property_account_payable_id=lookup.payable_account_id(company),
+                            bank_account_id=False),
+            'category_ids': list(set(filter(None, [lookup.category_id(group_id) for group_id in contact['group_ids']]))),
+            'bank_account': contact['bank_account'],
+            'invoice_address': invoice_address,
+            'contact_persons': [dict(contact_per, contact_xero_company_ids=[(0, 0, {'company_id': company})], type='contact')
+                                for contact_per in contact['contact_persons']],
+        }
+
+    def _write_changed(self, vals):
+        """Write the values of ``vals`` that differ from the ones of the partner, if any."""
+        self.ensure_one()
+        changed = {}
+        for name, value in vals.items():
+            field = self._fields[name]
+            if name == 'contact_xero_company_ids':
+                # Only add the companies the partner has no row for yet
+                linked_company_ids = self.contact_xero_company_ids.mapped('company_id').ids
+                value = [command for command in value if command[2]['company_id'] not in linked_company_ids]
+                if value:
+                    changed[name] = value
+            elif field.type in ('one2many', 'many2many') or field.convert_to_write(self[name], self) != value:
+                changed[name] = value
+        if changed:
+            self.write(changed)
+
+    def _link_imported_bank_accounts(self, partner_accounts):
+        """Attach the Xero bank account numbers to their partners, creating the missing ones in one go."""
+        partner_bank_pool = self.env['res.partner.bank']
+        partner_accounts = [(partner, acc_number) for partner, acc_number in partner_accounts if acc_number]
+        if not partner_accounts:
+            return
+        banks = {}
+        for bank in partner_bank_pool.search([('acc_number', 'in', list(set(acc_number for _partner, acc_number in partner_accounts)))]):
+            banks.setdefault(bank.acc_number, bank)
+        new_banks = {}
+        for partner, acc_number in partner_accounts:
+            if acc_number in banks:
+                banks[acc_number].partner_id = partner.id
+            else:
+                new_banks[acc_number] = {'acc_number': acc_number, 'partner_id': partner.id}
+        if new_banks:
+            partner_bank_pool.create(list(new_banks.values()))
+
+    def _update_imported_contact(self, partner_rec, values):
+        """Apply the imported values to an existing partner and its children, writing only what changed."""
+        partner_rec._write_changed(values['partner'])
+        if partner_rec.bank_ids.mapped('acc_number')[:1] != [values['bank_account']]:
+            self._link_imported_bank_accounts([(partner_rec, values['bank_account'])])
+        if set(partner_rec.category_id.ids) != set(values['category_ids']):
+            partner_rec.category_id = [(6, 0, values['category_ids'])]
+
+        new_children = []
+        if values['invoice_address']:
+            invoice_address_vals = dict(values['invoice_address'], parent_id=partner_rec.id)
+            invoice_address_id = partner_rec.child_ids.filtered(lambda x: x.type == "invoice")
+            if invoice_address_id:
+                invoice_address_id[0]._write_changed(invoice_address_vals)
+            else:
+                new_children.append(invoice_address_vals)
+
+        child_record = partner_rec.child_ids.filtered(lambda x: x.type == "contact").mapped('email')
+        for contact_per in values['contact_persons']:
+            contact_per_vals = dict(contact_per, parent_id=partner_rec.id)
+            if contact_per['email'] in child_record:
+                child_rec = partner_rec.child_ids.filtered(lambda x: x.email == contact_per['email'])[:1]
+                child_rec._write_changed(contact_per_vals)
+            else:
+                new_children.append(contact_per_vals)
+        if new_children:
+            self.create(new_children)
+
+    def _create_imported_contacts(self, new_contacts, company):
+        """Create the partners of a page, then all their addresses and contact persons, with one create each."""
+        partners = self.create([dict(values['partner'],
+                                     company_id=company,
+                                     category_id=[(6, 0, values['category_ids'])],
+                                     contact_xero_company_ids=[(0, 0, {'company_id': company,
+                                                                       'xero_contact_id': contact_details.get('ContactID', False)})])
+                                for contact_details, values in new_contacts])
+        children = []
+        for partner_id, (contact_details, values) in zip(partners, new_contacts):
+            if values['invoice_address']:
+                children.append(dict(values['invoice_address'], company_id=company, parent_id=partner_id.id))
+            for contact_per in values['contact_persons']:
+                children.append(dict(contact_per, company_id=company, parent_id=partner_id.id))
+        if children:
+            self.create(children)
+        self._link_imported_bank_accounts([(partner_id, values['bank_account'])
+                                           for partner_id, (contact_details, values) in zip(partners, new_contacts)])
+        self.flush()
+        return partners
+
+    def _link_contact_by_email(self, contact_details, company, partners_by_email, partner_ids):
+        """Link a Xero contact to the existing partner with the same email, if it isn't linked yet."""
+        same_contact = self.browse(partners_by_email.get(normalize_email(contact_details.get('EmailAddress')), []))
+        if same_contact and contact_details.get('ContactID') not in partner_ids:
+            xero_contact = same_contact.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)[:1]
+            if xero_contact and not xero_contact.xero_contact_id:
+                xero_contact.xero_contact_id = contact_details.get('ContactID')
+                partner_ids[contact_details.get('ContactID')] = same_contact.id
+            elif not xero_contact:
+                same_contact.contact_xero_company_ids = [(0, 0, {'xero_contact_id': contact_details.get('ContactID'),
+                                                                'company_id': company})]
+                partner_ids[contact_details.get('ContactID')] = same_contact.id
+
+    def _create_contact_countries(self, contacts, lookup):
+        """Create the countries and states of a page that don't exist yet, in one go each."""
+        addresses = [(contact['country'], contact['region']) for contact in contacts]
+        addresses += [(contact['invoice_address']['country'], contact['invoice_address']['region'])
+                      for contact in contacts if contact['invoice_address']]
+        lookup.create_countries([country for country, region in addresses])
+        lookup.create_states([(region, lookup.country_id(country)) for country, region in addresses])
+
+    def _import_contact_page(self, contact_list, xero, company, import_option, match_email=False):
+        """
+            Import one page of Xero contacts, in two stages.
+
+            The contacts are first transformed into plain values, with no
+            database access (contact_transform). The apply stage then resolves
+            their references, writes what changed on the existing partners
+            and creates the new ones together at the end of the page, which is
+            committed once. Each contact runs in its own savepoint: a contact
+            that fails is logged and skipped, the rest of the page is still
+            imported.
+        """
+        transformed = transform_contacts(contact_list)
+        partner_ids = self._get_partner_ids_by_xero_contact([contact_details.get('ContactID') for contact_details in contact_list], company)
+        # One recordset, so the existing partners of the page are read together
+        existing_partners = dict((partner.id, partner) for partner in self.browse(list(set(partner_ids.values()))))
+        # Partners changed in Odoo since their last sync keep their fingerprint, their changes are still exported
+        changed_partners = self.browse(list(existing_partners))._xero_sync_state(company)[1]
+        # UpdatedDateUTC of the partners created, or updated while in sync, by the page
+        imported = {}
+        partners_by_email = {}
+        if match_email:
+            partners_by_email = self._get_partner_ids_by_email([contact_details.get('EmailAddress') for contact_details in contact_list], company)
+            # Contacts without addresses aren't imported, they are still linked to the partner with their email
+            for contact_details in contact_list:
+                if not contact_details.get('Addresses'):
+                    self._link_contact_by_email(contact_details, company, partners_by_email, partner_ids)
+        lookup = get_import_lookup(self.env, xero)
+        self._create_contact_countries([contact for contact_details, contact in transformed], lookup)
+
+        new_contacts = []
+        for contact_details, contact in transformed:
+            try:
+                with self._cr.savepoint():
+                    if match_email:
+                        self._link_contact_by_email(contact_details, company, partners_by_email, partner_ids)
+                    partner_id = partner_ids.get(contact['contact_id'])
+                    partner_rec = existing_partners.get(partner_id) or self.browse(partner_id or [])
+                    if partner_rec and import_option in ['update', 'both']:
+                        values = self._prepare_imported_contact(contact, company, lookup)
+                        self._update_imported_contact(partner_rec, values)
+                        # A partner just linked by email wasn't checked, it may have changes to export
+                        if partner_rec.id in existing_partners and partner_rec not in changed_partners:
+                            imported[partner_rec.id] = contact_details.get('UpdatedDateUTC')
+                    elif not partner_rec and import_option in ['create', 'both']:
+                        new_contacts.append((contact_details, self._prepare_imported_contact(contact, company, lookup)))
+                    self.flush()
+            except Exception:
+                self.invalidate_cache()
+                _logger.exception("Xero contact %s (%s) could not be imported", contact_details.get('Name'), contact_details.get('ContactID'))
+
+        if new_contacts:
+            try:
+                with self._cr.savepoint():
+                    partners = self._create_imported_contacts(new_contacts, company)
+                imported.update((partner_id.id, contact_details.get('UpdatedDateUTC'))
+                                for partner_id, (contact_details, values) in zip(partners, new_contacts))
+            except Exception:
+                # Create them one by one to keep the contacts that are fine
+                self.invalidate_cache()
+                for new_contact in new_contacts:
+                    try:
+                        with self._cr.savepoint():
+                            partners = self._create_imported_contacts([new_contact], company)
+                        imported[partners.id] = new_contact[0].get('UpdatedDateUTC')
+                    except Exception:
+                        self.invalidate_cache()
+                        _logger.exception("Xero contact %s (%s) could not be imported", new_contact[0].get('Name'), new_contact[0].get('ContactID'))
+        if imported:
+            self.browse(list(imported))._mark_xero_synced(company, imported)
+        self._cr.commit()
+
     def import_contact(self, contact_list, xero, company=False, import_option=None):
         """
             Map: ContactID(Odoo) with ContactID(Xero)
@@ -62,313 +353,7 @@ class ResPartner(models.Model):
 
             If contact record is available then it will update that particular record.
         """
-        contact_email = []
-        all_contacts = self.search(['|', ('company_id', '=', company), ('company_id', '=', False), ('parent_id', '=', False)])
-        for contact_rec in all_contacts:
-            contact_email.append(contact_rec.email)
-
-        for contact_details in contact_list:
-            active = True
-            phone_list = []
-            contactgroups_list = []
-            country_id = False
-            state_id = False
-            po_country_id = False
-            po_state_id = False
-            bank_id = False
-            currency_id = False
-            is_po_address = False
-            currency_pool = self.env['res.currency']
-            country_pool = self.env['res.country']
-            state_pool = self.env['res.country.state']
-            account_pool = self.env['account.account']
-            partner_bank_pool = self.env['res.partner.bank']
-            # if contact_details.get('EmailAddress'):
-            #     if contact_details.get('EmailAddress') in contact_email:
-            #         same_contact = self.search([('email', '=', contact_details.get('EmailAddress')), ('company_id', '=', company)], limit=1)
-            #         if same_contact and not same_contact.contact_id:
-            #             same_contact.contact_id = contact_details.get('ContactID')
-
-            # partner_rec = self.search([('contact_id', '=', contact_details.get('ContactID')),
-            #                            ('company_id', '=', company)], limit=1)
-            partner_rec = self.search([]).filtered(lambda partner:partner.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company and l.xero_contact_id == contact_details.get('ContactID')))
-
-            if contact_details.get('Addresses'):
-                for contact_val in contact_details.get('Addresses'):
-                    if contact_val.get('AddressType') == 'STREET':
-                        contact = contact_val
-                        add_line1 = ''
-                        add_line2 = ''
-                        if contact.get('AddressLine1', False):
-                            add_line1 += contact.get('AddressLine1', False)
-                        if contact.get('AddressLine2', False):
-                            add_line1 += ' '
-                            add_line1 += contact.get('AddressLine2', False)
-                        if contact.get('AddressLine3', False):
-                            add_line2 += contact.get('AddressLine3', False)
-                        if contact.get('AddressLine4', False):
-                            add_line2 += ' '
-                            add_line2 += contact.get('AddressLine4', False)
-
-                        if contact.get('Country'):
-                            country_id = country_pool.search([('name', '=' , contact.get('Country'))])
-                            if country_id:
-                                country_id = country_id[0]
-                        if not country_id and contact.get('Country'):
-                            country_id = country_pool.create({'name':  contact.get('Country')})
-                        if contact.get('Region'):
-                            state_id = state_pool.search(['|', ('name', '=' , contact.get('Region')),
-                                              ('code', '=' , contact.get('Region'))])
-                            if state_id:
-                                state_id = state_id[0]
-                        if not state_id and contact.get('Region') and country_id:
-                            state_id = state_pool.create({'name':  contact.get('Region'),
-                                                          'code': contact.get('Region'),
-                                                          'country_id': country_id.id})
-
-                    if contact_val.get('AddressType') == 'POBOX':
-                        po_contact = contact_val
-                        po_add_line1 = ''
-                        po_add_line2 = ''
-                        if po_contact.get('AddressLine1', False):
-                            is_po_address = True
-                            po_add_line1 += po_contact.get('AddressLine1', False)
-                        if po_contact.get('AddressLine2', False):
-                            is_po_address = True
-                            po_add_line1 += ' '
-                            po_add_line1 += po_contact.get('AddressLine2', False)
-                        if po_contact.get('AddressLine3', False):
-                            is_po_address = True
-                            po_add_line2 += po_contact.get('AddressLine3', False)
-                        if po_contact.get('AddressLine4', False):
-                            is_po_address = True
-                            po_add_line2 += ' '
-                            po_add_line2 += po_contact.get('AddressLine4', False)
-
-                        if po_contact.get('Country'):
-                            is_po_address = True
-                            po_country_id = country_pool.search([('name', '=' , po_contact.get('Country'))])
-                            if po_country_id:
-                                po_country_id = po_country_id[0]
-                        if not po_country_id and po_contact.get('Country'):
-                            po_country_id = country_pool.create({'name':  po_contact.get('Country')})
-                        if po_contact.get('Region'):
-                            is_po_address = True
-                            po_state_id = state_pool.search(['|',('name', '=' , po_contact.get('Region')),
-                                ('code', '=' , po_contact.get('Region'))])
-                            if po_state_id:
-                                po_state_id = po_state_id[0]
-                        if not po_state_id and po_contact.get('Region') and po_country_id:
-                            po_state_id = state_pool.create({'name':  po_contact.get('Region'),
-                                                            'code': po_contact.get('Region'),
-                                                            'country_id': po_country_id.id})
-
-                sales_acc_id = account_pool.search([('user_type_id', '=', self.env.ref('account.data_account_type_receivable').id), ('company_id', '=', company)])
-                purchase_acc_id = account_pool.search([('user_type_id', '=', self.env.ref('account.data_account_type_payable').id), ('company_id', '=', company)])
-                currency_id = currency_pool.search([('name', '=', contact_details.get('DefaultCurrency'))])
-                phone_number = ''
-                mobile_number = ''
-                for phone in contact_details.get('Phones'):
-                    if phone.get('PhoneType', False):
-                        if phone.get('PhoneType') == 'DEFAULT':
-                            # if phone.get('PhoneCountryCode', False):
-                            #     phone_number = '+'+phone.get('PhoneCountryCode', False)+' '+phone.get('PhoneNumber', False)
-                            # else:
-                            phone_number = phone.get('PhoneNumber', False)
-                        if phone.get('PhoneType') == 'MOBILE':
-                            # if phone.get('PhoneCountryCode', False):
-                            #     mobile_number = '+'+phone.get('PhoneCountryCode', False)+' '+phone.get('PhoneNumber', False)
-                            # else:
-                            mobile_number = phone.get('PhoneNumber', False)
-                        if phone.get('PhoneType') == 'DDI':
-                            # if phone.get('PhoneCountryCode', False):
-                            #     direct_dial = '+'+phone.get('PhoneCountryCode', False)+' '+phone.get('PhoneNumber', False)
-                            # else:
-                            direct_dial = phone.get('PhoneNumber', False)
-
-                if contact_details.get('ContactStatus') != 'ACTIVE':
-                    active = False
-                if partner_rec and import_option in ['update', 'both']:
-                    partner_rec.write({
-                            'name':contact_details.get('Name'),
-                            'phone': phone_number,
-                            'mobile': mobile_number,
-                            'direct_dial': direct_dial,
-                            'first_name':contact_details.get('FirstName', False),
-                            'last_name':contact_details.get('LastName', False),
-                            # 'contact_id':contact_details.get('ContactID', False),
-                            'active': active,
-                            'skype_name':contact_details.get('SkypeUserName', False),
-                            'email':contact_details.get('EmailAddress', False),
-                            # 'customer': contact_details.get('IsCustomer', False),
-                            # 'supplier': contact_details.get('IsSupplier', False),
-                            'attention_to': contact.get('AttentionTo', False),
-                            'city': contact.get('City', False),
-                            'state_id': state_id and state_id.id or False,
-                            'street': add_line1,
-                            'street2': add_line2,
-                            'zip': contact.get('PostalCode', False),
-                            'country_id': country_id and country_id.id or False,
-                            'website': contact_details.get('Website', False),
-                            'property_account_receivable_id': sales_acc_id and sales_acc_id[0].id or False,
-                            'property_account_payable_id': purchase_acc_id and purchase_acc_id[0].id or False,
-                            'tax_number': contact_details.get('TaxNumber', False),
-                            'bank_account_id': bank_id and bank_id.id or False,
-                            'currency_id': currency_id and currency_id[0].id or False})
-
-                    if contact_details.get('BankAccountDetails'):
-                        bank_id = partner_bank_pool.search([('acc_number', '=' , contact_details.get('BankAccountDetails'))], limit=1)
-                        if not bank_id:
-                            partner_bank_pool.create({'acc_number': contact_details.get('BankAccountDetails'),
-                                                      'partner_id': partner_rec.id})
-                        else:
-                            bank_id.partner_id = partner_rec.id
-
-                    for contactgroups in contact_details.get('ContactGroups'):
-                        group_id = self.env['res.partner.category'].search([('xero_tag_id', '=', contactgroups.get('ContactGroupID'))])
-                        if group_id:
-                            contactgroups_list.append(group_id.id)
-
-                    contactgroups_list = list(set(contactgroups_list))
-                    partner_rec.category_id = [(6, 0, contactgroups_list)] if contactgroups_list else []
-                    if is_po_address:
-                        invoice_address_id = partner_rec.child_ids.filtered(lambda x: x.type == "invoice")
-                        if invoice_address_id:
-                            invoice_address_id[0].write({'name': contact_details.get('Name', False),
-                                'city': po_contact.get('City', False),
-                                'country_id': po_country_id and po_country_id.id or False,
-                                'state_id': po_state_id and po_state_id.id or False,
-                                'attention_to': po_contact.get('AttentionTo', False),
-                                'street': po_add_line1,
-                                'street2': po_add_line2,
-                                'zip': po_contact.get('PostalCode') or u'',
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                'type': 'invoice',
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id':  partner_rec and  partner_rec.id or False})
-                        else:
-                            self.create({'name': contact_details.get('Name', False),
-                                'city': po_contact.get('City', False),
-                                'country_id': po_country_id and po_country_id.id or False,
-                                'state_id': po_state_id and po_state_id.id or False,
-                                'attention_to': po_contact.get('AttentionTo', False),
-                                'street': po_add_line1,
-                                'street2': po_add_line2,
-                                'zip': po_contact.get('PostalCode') or u'',
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                'type': 'invoice',
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id':  partner_rec and  partner_rec.id or False})
-
-                    child_record = []
-                    for record in partner_rec.child_ids.filtered(lambda x: x.type == "contact"):
-                        child_record.append(record.email)
-                    for contact_per in contact_details.get('ContactPersons'):
-                        if contact_per.get('EmailAddress') in child_record:
-                            child_rec = self.search([('parent_id', '=', partner_rec.id), ('email', '=', contact_per.get('EmailAddress'))], limit=1)
-                            child_rec.write({
-                                'name': contact_per.get('FirstName','') + ' ' + contact_per.get('LastName', False),
-                                'first_name': contact_per.get('FirstName', False),
-                                'last_name': contact_per.get('LastName', False),
-                                'email': contact_per.get('EmailAddress', False),
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id': partner_rec and partner_rec.id or False,
-                                'type': 'contact'})
-                        else:
-                            self.create({
-                                'name': contact_per.get('FirstName','') + ' ' + contact_per.get('LastName', False),
-                                'first_name': contact_per.get('FirstName', False),
-                                'last_name': contact_per.get('LastName', False),
-                                'email': contact_per.get('EmailAddress', False),
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id': partner_rec and partner_rec.id or False,
-                                'type': 'contact'})
-                    self._cr.commit()
-
-                elif not partner_rec and import_option in ['create', 'both']:
-                    partner_id = self.create({
-                            'name':contact_details.get('Name', False),
-                            'phone': phone_number,
-                            'mobile': mobile_number,
-                            'direct_dial': direct_dial,
-                            'first_name':contact_details.get('FirstName', False),
-                            'last_name':contact_details.get('LastName', False),
-                            # 'contact_id':contact_details.get('ContactID', False),
-                            'company_id': company,
-                            'contact_xero_company_ids': [(0, 0, {'company_id': company,
-                                                                 'xero_contact_id': contact_details.get('ContactID', False),
-                                                                })],
-                            'active': active,
-                            'skype_name':contact_details.get('SkypeUserName', False),
-                            'email':contact_details.get('EmailAddress', False),
-                            # 'customer': contact_details.get('IsCustomer', False),
-                            # 'supplier': contact_details.get('IsSupplier', False),
-                            'city': contact.get('City', False),
-                            'state_id': state_id and state_id.id or False,
-                            'attention_to': contact.get('AttentionTo', False),
-                            'street': add_line1,
-                            'street2': add_line2,
-                            'zip': contact.get('PostalCode', False),
-                            'country_id': country_id and country_id.id or False,
-                            'website': contact_details.get('Website', False),
-                            'property_account_receivable_id': sales_acc_id and sales_acc_id[0].id or False,
-                            'property_account_payable_id': purchase_acc_id and purchase_acc_id[0].id or False,
-                            'tax_number': contact_details.get('TaxNumber', False),
-                            'bank_account_id': bank_id and bank_id.id or False,
-                            'currency_id': currency_id and currency_id[0].id or False})
-
-                    if contact_details.get('BankAccountDetails'):
-                        bank_id = partner_bank_pool.search([('acc_number', '=' , contact_details.get('BankAccountDetails'))], limit=1)
-                        if not bank_id:
-                            partner_bank_pool.create({'acc_number': contact_details.get('BankAccountDetails'),
-                                                      'partner_id': partner_id.id})
-                        else:
-                            bank_id.partner_id = partner_id.id
-
-                    for contactgroups in contact_details.get('ContactGroups'):
-                        group_id = self.env['res.partner.category'].search([('xero_tag_id', '=', contactgroups.get('ContactGroupID'))])
-                        if group_id:
-                            contactgroups_list.append(group_id.id)
-
-                    partner_id.category_id = [(6, 0, contactgroups_list)] if contactgroups_list else []
-                    if is_po_address:
-                        invoice_add_id = self.create({'name': contact_details.get('Name', False),
-                            'city': po_contact.get('City', False),
-                            'country_id': po_country_id and po_country_id.id or False,
-                            'state_id': po_state_id and po_state_id.id or False,
-                            'attention_to': po_contact.get('AttentionTo', False),
-                            'street': po_add_line1,
-                            'street2': po_add_line2,
-                            'zip': po_contact.get('PostalCode') or u'',
-                            'company_id': company,
-                            'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                            'type': 'invoice',
-                            # 'customer': False,
-                            # 'supplier': False,
-                            'parent_id': partner_id and partner_id.id or False})
-                    for contact_per in contact_details.get('ContactPersons'):
-                        self.create({
-                            'name': contact_per.get('FirstName','') + ' ' + contact_per.get('LastName', False),
-                            'first_name': contact_per.get('FirstName', False),
-                            'last_name': contact_per.get('LastName', False),
-                            'email': contact_per.get('EmailAddress', False),
-                            'company_id': company,
-                            'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                            # 'customer': False,
-                            # 'supplier': False,
-                            'parent_id': partner_id and partner_id.id or False,
-                            'type': 'contact'})
-                    self._cr.commit()
+        self._import_contact_page(contact_list, xero, company, import_option)
 
     def import_contact_overwrite(self, contact_list, xero, company=False, import_option=None):
         """
@@ -379,369 +364,220 @@ class ResPartner(models.Model):
 
             If contact record is available then it will update that particular record.
         """
-        contact_email = []
-        all_contacts = self.search(['|', ('company_id', '=', company), ('company_id', '=', False), ('parent_id', '=', False)])
-        for contact_rec in all_contacts:
-            contact_email.append(contact_rec.email)
-
-        for contact_details in contact_list:
-            active = True
-            phone_list = []
-            contactgroups_list = []
-            country_id = False
-            state_id = False
-            po_country_id = False
-            po_state_id = False
-            bank_id = False
-            currency_id = False
-            is_po_address = False
-            currency_pool = self.env['res.currency']
-            country_pool = self.env['res.country']
-            state_pool = self.env['res.country.state']
-            account_pool = self.env['account.account']
-            partner_bank_pool = self.env['res.partner.bank']
-            if contact_details.get('EmailAddress'):
-                if contact_details.get('EmailAddress') in contact_email:
-                    same_contact = self.search([('email', '=', contact_details.get('EmailAddress')), ('parent_id', '=' , False), '|', ('company_id', '=', company), ('company_id', '=', False)], limit=1)
-                    if same_contact:
-                        xero_contact = same_contact.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                        if xero_contact and not xero_contact.xero_contact_id:
-                            xero_contact.xero_contact_id = contact_details.get('ContactID')
-                        elif not xero_contact:
-                            same_contact.contact_xero_company_ids = [(0, 0, {'xero_contact_id': contact_details.get('ContactID'),
-                                                                            'company_id': company})]
-
-            # partner_rec = self.search([('contact_id', '=', contact_details.get('ContactID')),
-            #                            ('company_id', '=', company)], limit=1)
-            partner_rec = self.search([]).filtered(lambda partner:partner.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company and l.xero_contact_id == contact_details.get('ContactID')))
-            if contact_details.get('Addresses'):
-                for contact_val in contact_details.get('Addresses'):
-                    if contact_val.get('AddressType') == 'STREET':
-                        contact = contact_val
-                        add_line1 = ''
-                        add_line2 = ''
-                        if contact.get('AddressLine1', False):
-                            add_line1 += contact.get('AddressLine1', False)
-                        if contact.get('AddressLine2', False):
-                            add_line1 += ' '
-                            add_line1 += contact.get('AddressLine2', False)
-                        if contact.get('AddressLine3', False):
-                            add_line2 += contact.get('AddressLine3', False)
-                        if contact.get('AddressLine4', False):
-                            add_line2 += ' '
-                            add_line2 += contact.get('AddressLine4', False)
-
-                        if contact.get('Country'):
-                            country_id = country_pool.search([('name', '=' , contact.get('Country'))])
-                            if country_id:
-                                country_id = country_id[0]
-                        if not country_id and contact.get('Country'):
-                            country_id = country_pool.create({'name':  contact.get('Country')})
-                        if contact.get('Region'):
-                            state_id = state_pool.search(['|', ('name', '=' , contact.get('Region')),
-                                              ('code', '=' , contact.get('Region'))])
-                            if state_id:
-                                state_id = state_id[0]
-                        if not state_id and contact.get('Region') and country_id:
-                            state_id = state_pool.create({'name':  contact.get('Region'),
-                                                          'code': contact.get('Region'),
-                                                          'country_id': country_id.id})
-
-                    if contact_val.get('AddressType') == 'POBOX':
-                        po_contact = contact_val
-                        po_add_line1 = ''
-                        po_add_line2 = ''
-                        if po_contact.get('AddressLine1', False):
-                            is_po_address = True
-                            po_add_line1 += po_contact.get('AddressLine1', False)
-                        if po_contact.get('AddressLine2', False):
-                            is_po_address = True
-                            po_add_line1 += ' '
-                            po_add_line1 += po_contact.get('AddressLine2', False)
-                        if po_contact.get('AddressLine3', False):
-                            is_po_address = True
-                            po_add_line2 += po_contact.get('AddressLine3', False)
-                        if po_contact.get('AddressLine4', False):
-                            is_po_address = True
-                            po_add_line2 += ' '
-                            po_add_line2 += po_contact.get('AddressLine4', False)
-
-                        if po_contact.get('Country'):
-                            is_po_address = True
-                            po_country_id = country_pool.search([('name', '=' , po_contact.get('Country'))])
-                            if po_country_id:
-                                po_country_id = po_country_id[0]
-                        if not po_country_id and po_contact.get('Country'):
-                            po_country_id = country_pool.create({'name':  po_contact.get('Country')})
-                        if po_contact.get('Region'):
-                            is_po_address = True
-                            po_state_id = state_pool.search(['|',('name', '=' , po_contact.get('Region')),
-                                ('code', '=' , po_contact.get('Region'))])
-                            if po_state_id:
-                                po_state_id = po_state_id[0]
-                        if not po_state_id and po_contact.get('Region') and po_country_id:
-                            po_state_id = state_pool.create({'name':  po_contact.get('Region'),
-                                                            'code': po_contact.get('Region'),
-                                                            'country_id': po_country_id.id})
-
-                sales_acc_id = account_pool.search([('user_type_id', '=', self.env.ref('account.data_account_type_receivable').id), ('company_id', '=', company)])
-                purchase_acc_id = account_pool.search([('user_type_id', '=', self.env.ref('account.data_account_type_payable').id), ('company_id', '=', company)])
-                currency_id = currency_pool.search([('name', '=', contact_details.get('DefaultCurrency'))])
-                phone_number = ''
-                mobile_number = ''
-                for phone in contact_details.get('Phones'):
-                    if phone.get('PhoneType', False):
-                        if phone.get('PhoneType') == 'DEFAULT':
-                            # if phone.get('PhoneCountryCode', False):
-                            #     phone_number = '+'+phone.get('PhoneCountryCode', False)+' '+phone.get('PhoneNumber', False)
-                            # else:
-                            phone_number = phone.get('PhoneNumber', False)
-                        if phone.get('PhoneType') == 'MOBILE':
-                            # if phone.get('PhoneCountryCode', False):
-                            #     mobile_number = '+'+phone.get('PhoneCountryCode', False)+' '+phone.get('PhoneNumber', False)
-                            # else:
-                            mobile_number = phone.get('PhoneNumber', False)
-                        if phone.get('PhoneType') == 'DDI':
-                            # if phone.get('PhoneCountryCode', False):
-                            #     direct_dial = '+'+phone.get('PhoneCountryCode', False)+' '+phone.get('PhoneNumber', False)
-                            # else:
-                            direct_dial = phone.get('PhoneNumber', False)
-
-                if contact_details.get('ContactStatus') != 'ACTIVE':
-                    active = False
-                if partner_rec and import_option in ['update', 'both']:
-                    partner_rec.write({
-                            'name':contact_details.get('Name'),
-                            'phone': phone_number,
-                            'mobile': mobile_number,
-                            'direct_dial': direct_dial,
-                            'first_name':contact_details.get('FirstName', False),
-                            'last_name':contact_details.get('LastName', False),
-                            # 'contact_id':contact_details.get('ContactID', False),
-                            'active': active,
-                            'skype_name':contact_details.get('SkypeUserName', False),
-                            'email':contact_details.get('EmailAddress', False),
-                            # 'customer': contact_details.get('IsCustomer', False),
-                            # 'supplier': contact_details.get('IsSupplier', False),
-                            'attention_to': contact.get('AttentionTo', False),
-                            'city': contact.get('City', False),
-                            'state_id': state_id and state_id.id or False,
-                            'street': add_line1,
-                            'street2': add_line2,
-                            'zip': contact.get('PostalCode', False),
-                            'country_id': country_id and country_id.id or False,
-                            'website': contact_details.get('Website', False),
-                            'property_account_receivable_id': sales_acc_id and sales_acc_id[0].id or False,
-                            'property_account_payable_id': purchase_acc_id and purchase_acc_id[0].id or False,
-                            'tax_number': contact_details.get('TaxNumber', False),
-                            'bank_account_id': bank_id and bank_id.id or False,
-                            'currency_id': currency_id and currency_id[0].id or False})
-
-                    if contact_details.get('BankAccountDetails'):
-                        bank_id = partner_bank_pool.search([('acc_number', '=' , contact_details.get('BankAccountDetails'))], limit=1)
-                        if not bank_id:
-                            partner_bank_pool.create({'acc_number': contact_details.get('BankAccountDetails'),
-                                                      'partner_id': partner_rec.id})
-                        else:
-                            bank_id.partner_id = partner_rec.id
-
-                    for contactgroups in contact_details.get('ContactGroups'):
-                        group_id = self.env['res.partner.category'].search([('xero_tag_id', '=', contactgroups.get('ContactGroupID'))])
-                        if group_id:
-                            contactgroups_list.append(group_id.id)
-
-                    contactgroups_list = list(set(contactgroups_list))
-                    partner_rec.category_id = [(6, 0, contactgroups_list)] if contactgroups_list else []
-                    if is_po_address:
-                        invoice_address_id = partner_rec.child_ids.filtered(lambda x: x.type == "invoice")
-                        if invoice_address_id:
-                            invoice_address_id[0].write({'name': contact_details.get('Name'),
-                                'city': po_contact.get('City', False),
-                                'country_id': po_country_id and po_country_id.id or False,
-                                'state_id': po_state_id and po_state_id.id or False,
-                                'attention_to': po_contact.get('AttentionTo', False),
-                                'street': po_add_line1,
-                                'street2': po_add_line2,
-                                'zip': po_contact.get('PostalCode') or u'',
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                'type': 'invoice',
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id':  partner_rec and  partner_rec.id or False})
-                        else:
-                            self.create({'name': contact_details.get('Name'),
-                                'city': po_contact.get('City', False),
-                                'country_id': po_country_id and po_country_id.id or False,
-                                'state_id': po_state_id and po_state_id.id or False,
-                                'attention_to': po_contact.get('AttentionTo', False),
-                                'street': po_add_line1,
-                                'street2': po_add_line2,
-                                'zip': po_contact.get('PostalCode') or u'',
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                'type': 'invoice',
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id':  partner_rec and  partner_rec.id or False})
-
-                    child_record = []
-                    for record in partner_rec.child_ids.filtered(lambda x: x.type == "contact"):
-                        child_record.append(record.email)
-                    for contact_per in contact_details.get('ContactPersons'):
-                        if contact_per.get('EmailAddress') in child_record:
-                            child_rec = self.search([('parent_id', '=', partner_rec.id), ('email', '=', contact_per.get('EmailAddress'))], limit=1)
-                            child_rec.write({
-                                'name': contact_per.get('FirstName','') + ' ' + contact_per.get('LastName', False),
-                                'first_name': contact_per.get('FirstName', False),
-                                'last_name': contact_per.get('LastName', False),
-                                'email': contact_per.get('EmailAddress', False),
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id': partner_rec and partner_rec.id or False,
-                                'type': 'contact'})
-                        else:
-                            self.create({
-                                'name': contact_per.get('FirstName','') + ' ' + contact_per.get('LastName', False),
-                                'first_name': contact_per.get('FirstName', False),
-                                'last_name': contact_per.get('LastName', False),
-                                'email': contact_per.get('EmailAddress', False),
-                                # 'company_id': company,
-                                'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                                # 'customer': False,
-                                # 'supplier': False,
-                                'parent_id': partner_rec and partner_rec.id or False,
-                                'type': 'contact'})
-                    self._cr.commit()
-
-                elif not partner_rec and import_option in ['create', 'both']:
-                    partner_id = self.create({
-                            'name':contact_details.get('Name', False),
-                            'phone': phone_number,
-                            'mobile': mobile_number,
-                            'direct_dial': direct_dial,
-                            'first_name':contact_details.get('FirstName', False),
-                            'last_name':contact_details.get('LastName', False),
-                            # 'contact_id':contact_details.get('ContactID', False),
-                            'company_id': company,
-                            'contact_xero_company_ids': [(0, 0, {'company_id': company,
-                                                                 'xero_contact_id': contact_details.get('ContactID', False),
-                                                                })],
-                            'active': active,
-                            'skype_name':contact_details.get('SkypeUserName', False),
-                            'email':contact_details.get('EmailAddress', False),
-                            # 'customer': contact_details.get('IsCustomer', False),
-                            # 'supplier': contact_details.get('IsSupplier', False),
-                            'city': contact.get('City', False),
-                            'state_id': state_id and state_id.id or False,
-                            'attention_to': contact.get('AttentionTo', False),
-                            'street': add_line1,
-                            'street2': add_line2,
-                            'zip': contact.get('PostalCode', False),
-                            'country_id': country_id and country_id.id or False,
-                            'website': contact_details.get('Website', False),
-                            'property_account_receivable_id': sales_acc_id and sales_acc_id[0].id or False,
-                            'property_account_payable_id': purchase_acc_id and purchase_acc_id[0].id or False,
-                            'tax_number': contact_details.get('TaxNumber', False),
-                            'bank_account_id': bank_id and bank_id.id or False,
-                            'currency_id': currency_id and currency_id[0].id or False})
-
-                    if contact_details.get('BankAccountDetails'):
-                        bank_id = partner_bank_pool.search([('acc_number', '=' , contact_details.get('BankAccountDetails'))], limit=1)
-                        if not bank_id:
-                            partner_bank_pool.create({'acc_number': contact_details.get('BankAccountDetails'),
-                                                      'partner_id': partner_id.id})
-                        else:
-                            bank_id.partner_id = partner_id.id
-
-                    for contactgroups in contact_details.get('ContactGroups'):
-                        group_id = self.env['res.partner.category'].search([('xero_tag_id', '=', contactgroups.get('ContactGroupID'))])
-                        if group_id:
-                            contactgroups_list.append(group_id.id)
-
-                    partner_id.category_id = [(6, 0, contactgroups_list)] if contactgroups_list else []
-                    if is_po_address:
-                        invoice_add_id = self.create({'name': contact_details.get('Name', False),
-                            'city': po_contact.get('City', False),
-                            'country_id': po_country_id and po_country_id.id or False,
-                            'state_id': po_state_id and po_state_id.id or False,
-                            'attention_to': po_contact.get('AttentionTo', False),
-                            'street': po_add_line1,
-                            'street2': po_add_line2,
-                            'zip': po_contact.get('PostalCode') or u'',
-                            'company_id': company,
-                            'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                            'type': 'invoice',
-                            # 'customer': False,
-                            # 'supplier': False,
-                            'parent_id': partner_id and partner_id.id or False})
-                    for contact_per in contact_details.get('ContactPersons'):
-                        self.create({
-                            'name': contact_per.get('FirstName','') + ' ' + contact_per.get('LastName', False),
-                            'first_name': contact_per.get('FirstName', False),
-                            'last_name': contact_per.get('LastName', False),
-                            'email': contact_per.get('EmailAddress', False),
-                            'company_id': company,
-                            'contact_xero_company_ids': [(0, 0, {'company_id': company})],
-                            # 'customer': False,
-                            # 'supplier': False,
-                            'parent_id': partner_id and partner_id.id or False,
-                            'type': 'contact'})
-                    self._cr.commit()
+        self._import_contact_page(contact_list, xero, company, import_option, match_email=True)
+
+    @api.model
+    def _map_partners_by_xero_contact(self, partners, company):
+        """Index ``partners`` by the ContactID they are linked to in ``company``, the first one wins."""
+        partners_by_contact = {}
+        for partner in partners:
+            for xero_company in partner.contact_xero_company_ids:
+                if xero_company.company_id.id == company and xero_company.xero_contact_id:
+                    partners_by_contact.setdefault(xero_company.xero_contact_id, partner)
+        return partners_by_contact
+
+    def _link_exported_contacts(self, partners, contact_details, company):
+        """
+            Write the ContactIDs returned by Xero for a PUT batch on the
+            partners sent, in one query, and commit the batch.
 
-    def export_contact(self, contact_list, xero, last_export_date, company=False, contact_ids=[]):
-        '''
-        Map: ContactID(Odoo) with ContactID(Xero)
+            Xero returns the contacts in the order they were sent, so they are
+            matched by position; by name only if the counts don't add up.
 
-        Create a contact in xero if contact is not available.
+            A ContactID already linked to another contact of the company can't
+            be written (unique constraint): the batch is then written link by
+            link and the conflicting ones are logged in mismatch.log.
+        """
+        if len(contact_details) == len(partners):
+            exported = list(zip(partners, contact_details))
+        else:
+            partners_by_name = dict((partner.xero_name, partner) for partner in reversed(partners))
+            exported = [(partners_by_name.get(contact.get('Name')), contact) for contact in contact_details]
+        rows = []
+        new_rows = []
+        for partner_id, contact in exported:
+            if not partner_id or not contact.get('ContactID'):
+                continue
+            xero_contact = partner_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)[:1]
+            if xero_contact:
+                rows.append((xero_contact.id, contact.get('ContactID'), partner_id))
+            else:
+                new_rows.append(({'partner_id': partner_id.id, 'company_id': company, 'xero_contact_id': contact.get('ContactID')}, partner_id))
+        xero_company_pool = self.env['contact.xero.company']
+        conflicts = []
+        if new_rows:
+            try:
+                with self._cr.savepoint():
+                    xero_company_pool.create([vals for vals, partner_id in new_rows])
+            except IntegrityError:
+                self.invalidate_cache()
+                for vals, partner_id in new_rows:
+                    try:
+                        with self._cr.savepoint():
+                            xero_company_pool.create(vals)
+                    except IntegrityError:
+                        conflicts.append((partner_id, vals['xero_contact_id']))
+        if rows:
+            xero_company_pool.flush(['xero_contact_id'])
+            try:
+                with self._cr.savepoint():
+                    self._cr.execute("""UPDATE contact_xero_company AS x SET xero_contact_id = v.xero_contact_id
+                                        FROM (VALUES %s) AS v (id, xero_contact_id) WHERE x.id = v.id""" % ', '.join(['(%s, %s)'] * len(rows)),
+                                     [value for row in rows for value in row[:2]])
+            except IntegrityError:
+                for xero_contact_id, contact_id, partner_id in rows:
+                    try:
+                        with self._cr.savepoint():
+                            self._cr.execute("UPDATE contact_xero_company SET xero_contact_id = %s WHERE id = %s", (contact_id, xero_contact_id))
+                    except IntegrityError:
+                        conflicts.append((partner_id, contact_id))
+            xero_company_pool.invalidate_cache(['xero_contact_id'], [row[0] for row in rows])
+        if conflicts:
+            self.env['mismatch.log'].create([{'name': partner_id.display_name,
+                                              'source_model': self._name,
+                                              'source_id': partner_id.id,
+                                              'description': 'Xero ContactID %s is already linked to another contact of this company' % contact_id,
+                                              'exported_date': fields.Datetime.now()}
+                                             for partner_id, contact_id in conflicts])
+            # The contact owning a conflicting ContactID wasn't part of this export
+            conflicting_ids = set(contact_id for partner_id, contact_id in conflicts)
+            contact_details = [contact for contact in contact_details if contact.get('ContactID') not in conflicting_ids]
+        self._mark_xero_contacts_synced(contact_details, company)
+        self._cr.commit()
+
+    def _prepare_xero_contacts(self):
+        """
+            Build the Xero Contact of each partner of ``self``, Name excluded,
+            as {partner id: vals}.
 
-        Note: If contact is available in xero with name which we going to
-        export from odoo then it will skip that record.
+            The partners, their children, bank accounts, countries and states
+            are read up front with one query each, whatever the number of
+            partners, and the dicts are then built from those rows.
+        """
+        partner_fields = ['name', 'active', 'email', 'skype_name', 'tax_number', 'first_name', 'last_name', 'phone', 'mobile',
+                          'direct_dial', 'street', 'street2', 'city', 'zip', 'state_id', 'country_id', 'attention_to']
+        partners = self.read(partner_fields, load=None)
+        children = self.search([('parent_id', 'in', self.ids)]).read(partner_fields + ['type', 'parent_id'], load=None)
+        children_by_parent = {}
+        for child in children:
+            children_by_parent.setdefault(child['parent_id'], []).append(child)
+        bank_numbers = {}
+        for bank in self.env['res.partner.bank'].search([('partner_id', 'in', self.ids)]).read(['partner_id', 'acc_number'], load=None):
+            bank_numbers.setdefault(bank['partner_id'], bank['acc_number'])
+        addresses = partners + children
+        country_names = dict((country['id'], country['name']) for country in
+                             self.env['res.country'].browse(set(row['country_id'] for row in addresses if row['country_id'])).read(['name']))
+        state_names = dict((state['id'], state['name']) for state in
+                           self.env['res.country.state'].browse(set(row['state_id'] for row in addresses if row['state_id'])).read(['name']))
+
+        def address(row, address_type):
+            return {u'City': row['city'] or u'',
+                    u'AddressType': address_type,
+                    u'Country': country_names.get(row['country_id'], u''),
+                    u'Region': state_names.get(row['state_id'], u''),
+                    u'AttentionTo': row['attention_to'] or u'',
+                    u'AddressLine1': row['street'] or u'',
+                    u'AddressLine2': row['street2'] or u'',
+                    u'PostalCode': row['zip'] or u''}
+
+        contact_vals = {}
+        for partner in partners:
+            phone_list = []
+            for field_name, phone_type in (('phone', u'DEFAULT'), ('mobile', u'MOBILE'), ('direct_dial', u'DDI')):
+                if partner[field_name]:
+                    phone_list.append({u'PhoneNumber': partner[field_name], u'PhoneType': phone_type})
 
-        Constraint(Xero): The name of the Contact must be unique
+            contact_person_list = []
+            po_address = address(dict.fromkeys(['city', 'country_id', 'state_id', 'attention_to', 'street', 'street2', 'zip']), u'POBOX')
+            for child in children_by_parent.get(partner['id'], []):
+                if child['type'] == 'contact':
+                    # Xero takes up to 5 contact persons
+                    if len(contact_person_list) < 5:
+                        contact_person_list.append({u'LastName': child['last_name'] or u'',
+                                                    u'EmailAddress': child['email'] or u'',
+                                                    u'IncludeInEmails': u'true',
+                                                    u'FirstName': child['first_name'] or child['name'] or u''})
+                elif child['type'] == 'invoice':
+                    po_address = address(child, u'POBOX')
+
+            vals = {u'ContactStatus': 'ACTIVE' if partner['active'] else 'ARCHIVED',
+                    u'EmailAddress': partner['email'] or u'',
+                    u'SkypeUserName': partner['skype_name'] or u'',
+                    u'TaxNumber': partner['tax_number'] or u'',
+                    u'FirstName': partner['first_name'] or u'',
+                    u'LastName': partner['last_name'] or u'',
+                    u'Addresses': [address(partner, u'STREET'), po_address],
+                    u'Phones': phone_list,
+                    u'ContactPersons': contact_person_list}
+            if partner['id'] in bank_numbers:
+                vals.update({u'BankAccountDetails': bank_numbers[partner['id']]})
+            contact_vals[partner['id']] = vals
+        return contact_vals
+
+    def _link_xero_contacts_by_name(self, partners, contact_list, company):
+        """Link the partners of ``partners`` to the Xero contact with their
+        name and email, when the ContactID isn't linked yet. Return the ids of
+        the partners Xero has a contact for."""
+        contacts_by_name_email = {}
+        for contact in contact_list:
+            contacts_by_name_email.setdefault((contact.get('Name').lower(), contact.get('EmailAddress')), contact)
+        linked_contact_ids = set(self._get_partner_ids_by_xero_contact([contact.get('ContactID') for contact in contact_list], company))
+        matched_ids = set()
+        for partner_id in partners:
+            contact = partner_id.name and contacts_by_name_email.get((partner_id.name.lower(), partner_id.email))
+            if not contact:
+                continue
+            matched_ids.add(partner_id.id)
+            if contact.get('ContactID') not in linked_contact_ids:
+                xero_company = partner_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)[:1]
+                if xero_company and not xero_company.xero_contact_id:
+                    xero_company.xero_contact_id = contact.get('ContactID')
+                    linked_contact_ids.add(contact.get('ContactID'))
+                elif not xero_company:
+                    partner_id.contact_xero_company_ids = [(0, 0, {'company_id': company,
+                                                                   'xero_contact_id': contact.get('ContactID')})]
+                    linked_contact_ids.add(contact.get('ContactID'))
+        return matched_ids
 
-        If contact record is available in xero then it will update that particular record.
-        '''
-        status = ''
-        same_record = []
-        final_contact_list = []
-        contact_name_list = []
-        count = 1
+    def _export_contacts(self, contact_list, xero, last_export_date, company, contact_ids, link_by_name=False):
+        """
+            Create in Xero the partners of ``contact_ids`` (by default the
+            queued ones, or the ones changed since ``last_export_date``) it has
+            no contact for, then update the contacts of the changed partners,
+            by batches of 50.
+
+            A partner is in Xero when it is linked to a ContactID of
+            ``contact_list``, or with ``link_by_name`` when a contact has its
+            name and email, and is then linked to it.
+        """
+        queued_partners = self._get_queued_partners(last_export_date, company)
         if self._context.get('contact_ids'):
             contact_ids = self._context.get('contact_ids')
+        elif len(contact_ids) <= 0:
+            if queued_partners is not None:
+                contact_ids = queued_partners
+            elif last_export_date:
+                contact_ids = self.search([('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date)])
+                update_child_contact_ids = self.search(['|', ('company_id', '=', company), ('company_id', '=', False), ('parent_id', '!=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date),
+                    '|', ('active', '=', True), ('active', '=', False)]).mapped('parent_id').filtered(lambda l: not l.parent_id and l.name)
+                contact_ids = contact_ids.union(update_child_contact_ids)
+            else:
+                contact_ids = self.search([('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False)])
+
+        contact_name_list = set(contact.get('Name').lower() for contact in contact_list)
+        if link_by_name:
+            same_record = self._link_xero_contacts_by_name(contact_ids, contact_list, company)
         else:
-            if len(contact_ids) <= 0:
-                if last_export_date:
-                    # contact_ids = self.search([('company_id', '=', company), ('parent_id', '=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date)])
-                    contact_ids = self.search([('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date)])
-                    update_child_contact_ids = self.search(['|', ('company_id', '=', company), ('company_id', '=', False), ('parent_id', '!=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date),
-                        '|', ('active', '=', True), ('active', '=', False)]).mapped('parent_id').filtered(lambda l: not l.parent_id and l.name)
-                    contact_ids = contact_ids.union(update_child_contact_ids)
-                else:
-                    contact_ids = self.search([('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False)])
-
-        for contact_id in contact_ids:
-            contact_name_list = []
-            for contact in contact_list:
-                contact_name_list.append(contact.get('Name').lower())
-                # if contact_id.contact_id == contact.get('ContactID'):
-                #     same_record.append(contact_id.id)
-                xero_company = contact_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                if xero_company and xero_company.xero_contact_id == contact.get('ContactID'):
-                    same_record.append(contact_id.id)
-                elif xero_company and not xero_company.xero_contact_id:
-                    xero_company.xero_contact_id = contact.get('ContactID')
-                elif not xero_company:
-                    contact_id.contact_xero_company_ids = [(0, 0, {'company_id': company,
-                                                                   'xero_contact_id': contact.get('ContactID')})]
-            final_contact_list.append(contact_id.id)
+            xero_contact_ids = set(contact.get('ContactID') for contact in contact_list)
+            same_record = set(partner_id.id for contact_id, partner_id in self._map_partners_by_xero_contact(contact_ids, company).items()
+                              if contact_id in xero_contact_ids)
 
         data_list = []
         contact_list_data = []
-        c = 0
-        partner_ids = self.browse(list(set(final_contact_list).difference(set(same_record))))
+        partner_list_data = []
+        count = 1
+        partner_ids = self.browse(list(set(contact_ids.ids).difference(same_record)))
+        contact_vals = partner_ids._prepare_xero_contacts()
         for partner_id in partner_ids:
             contact_name = ''
 
@@ -752,222 +588,62 @@ class ResPartner(models.Model):
                     name = partner_id.name.lower() + ' (' + str(count) + ')'
                     contact_name = partner_id.name + ' (' + str(count) + ')'
                     count += 1
-                contact_name_list.append(name)
+                contact_name_list.add(name)
             elif partner_id.name:
-                contact_name_list.append(partner_id.name.lower())
+                contact_name_list.add(partner_id.name.lower())
 
-            phone_list = []
-            if partner_id.phone:
-                phone_list.append({u'PhoneNumber': partner_id.phone or u'',
-                                    u'PhoneType':  u'DEFAULT'})
-            if partner_id.mobile:
-                phone_list.append({u'PhoneNumber': partner_id.mobile or u'',
-                                    u'PhoneType':  u'MOBILE'})
-            if partner_id.direct_dial:
-                phone_list.append({u'PhoneNumber': partner_id.direct_dial   or u'',
-                                    u'PhoneType':  u'DDI'})
-
-            contact_person_list = []
-            po_country = u''
-            po_state = u''
-            po_city = u''
-            po_zip = u''
-            po_add_line1 = u''
-            po_add_line2 = u''
-            attention_to = u''
-            i = 0
-            for contact_per_id in partner_id.child_ids:
-                if contact_per_id.type == 'contact':
-                    i += 1
-                    if contact_per_id.first_name:
-                        FirstName = contact_per_id.first_name
-                    else:
-                        FirstName = contact_per_id.name
-                    if i < 6:
-                        contact_person_list.append({u'LastName':contact_per_id.last_name or u'',
-                                                    u'EmailAddress':contact_per_id.email or u'',
-                                                    u'IncludeInEmails': u'true',
-                                                    u'FirstName':FirstName or u''})
-                elif contact_per_id.type == 'invoice':
-                    po_country = contact_per_id.country_id and contact_per_id.country_id.name or u''
-                    po_state = contact_per_id.state_id and contact_per_id.state_id.name or u''
-                    po_city = contact_per_id.city or u''
-                    po_zip = contact_per_id.zip or u''
-                    po_add_line1 = contact_per_id.street or u''
-                    po_add_line2 = contact_per_id.street2 or u''
-                    attention_to = contact_per_id.attention_to or u''
-
-            if partner_id.active:
-                status = 'ACTIVE'
-            else:
-                status = 'ARCHIVED'
-
-            if contact_name:
-                vals = {u'Name': contact_name or u''}
-                partner_id.xero_name = contact_name
-            else:
-                vals = {u'Name': partner_id.name or u''}
-                partner_id.xero_name = partner_id.name
-
-            vals.update({u'ContactStatus': status,
-                        u'EmailAddress': partner_id.email or u'',
-                        u'SkypeUserName': partner_id.skype_name or u'',
-                        u'TaxNumber': partner_id.tax_number or u'',
-                        u'FirstName': partner_id.first_name or u'',
-                        u'LastName': partner_id.last_name or u'',
-                        # u'IsCustomer':partner_id.customer or False,
-                        # u'IsSupplier':partner_id.supplier or False,
-                        u'Addresses': [{
-                                    u'City': partner_id.city or u'',
-                                    u'AddressType': u'STREET',
-                                    u'Country': partner_id.country_id and partner_id.country_id.name or u'',
-                                    u'Region': partner_id.state_id and partner_id.state_id.name or u'',
-                                    u'AttentionTo': partner_id.attention_to or u'',
-                                    u'AddressLine1': partner_id.street or  u'',
-                                    u'AddressLine2': partner_id.street2 or u'',
-                                    u'PostalCode': partner_id.zip or u''},
-                                    {
-                                    u'City': po_city,
-                                    u'AddressType': u'POBOX',
-                                    u'Country': po_country,
-                                    u'Region': po_state,
-                                    u'AttentionTo': attention_to,
-                                    u'AddressLine1': po_add_line1,
-                                    u'AddressLine2': po_add_line2,
-                                    u'PostalCode': po_zip}],
-                        u'Phones': phone_list or [],
-                        u'ContactPersons': contact_person_list or []
-                    })
-            if partner_id.bank_ids:
-                vals.update({u'BankAccountDetails': partner_id.bank_ids[0].acc_number})
+            partner_id.xero_name = contact_name or partner_id.name
+            vals = {u'Name': partner_id.xero_name or u''}
+            vals.update(contact_vals[partner_id.id])
             contact_list_data.append(vals)
-            c += 1
-            if c == 50:
-                data_list.append(contact_list_data)
+            partner_list_data.append(partner_id)
+            if len(contact_list_data) == 50:
+                data_list.append((contact_list_data, partner_list_data))
                 contact_list_data = []
-                c = 0
-
+                partner_list_data = []
         if contact_list_data:
-            data_list.append(contact_list_data)
-        for data in data_list:
-            contact_details = xero.contacts.put(data)
-            for contact in contact_details:
-                contact_id = self.search([('xero_name' , '=', contact.get('Name'))], limit=1)
-                # if contact_id:
-                #     contact_id.contact_id = contact.get('ContactID', False)
-                if contact_id:
-                    xero_contact = contact_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                    xero_contact.xero_contact_id = contact.get('ContactID', False)
-                    self._cr.commit()
+            data_list.append((contact_list_data, partner_list_data))
+        for data, partners in data_list:
+            results = xero.contacts.write_batch(data, method='put')
+            self.env['mismatch.log'].log_rejected(self._name, results, partners)
+            self._link_exported_contacts([partner_id for partner_id, result in zip(partners, results) if result.ok],
+                                         [result.result for result in results if result.ok], company)
 
         #Update Record
-        contact_list_data = []
+        if queued_partners is not None:
+            update_partner_ids = queued_partners
+        elif last_export_date:
+            update_partner_ids = self.search([('write_date', '>', last_export_date), '|', ('company_id', '=', company), ('company_id', '=', False)])
+            update_child_contact_ids = self.search([('parent_id', '!=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date), '|', ('company_id', '=', company), ('company_id', '=', False),
+                '|', ('active', '=', True), ('active', '=', False)]).mapped('parent_id').filtered(lambda l: not l.parent_id and l.name)
+            update_partner_ids = update_partner_ids.union(update_child_contact_ids)
+        else:
+            update_partner_ids = self.search(['|', ('company_id', '=', company), ('company_id', '=', False)])
+        # Skip the partners whose exported values are still the ones Xero has
+        update_partner_ids -= update_partner_ids._xero_sync_state(company)[0]
+        partners_by_contact = self._map_partners_by_xero_contact(update_partner_ids, company)
+        contact_vals = self.browse(list(set(partner.id for partner in partners_by_contact.values())))._prepare_xero_contacts()
         data_list = []
-        c = 0
-        for contact_id in contact_list:
-            if last_export_date:
-                partner_ids = self.search([('write_date', '>', last_export_date), '|', ('company_id', '=', company), ('company_id', '=', False)])
-                partner_id = partner_ids.filtered(lambda contact: contact.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company and l.xero_contact_id == contact_id.get('ContactID')))
-                update_child_contact_ids = self.search([('parent_id', '!=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date), '|', ('company_id', '=', company), ('company_id', '=', False),
-                    '|', ('active', '=', True), ('active', '=', False)]).mapped('parent_id').filtered(lambda l: not l.parent_id and l.name and l.contact_xero_company_ids.filtered(lambda contact: contact.company_id.id == company and contact.xero_contact_id == contact_id.get('ContactID')))
-
-                partner_id = partner_id.union(update_child_contact_ids)
-            else:
-                partner_id = self.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda contact: contact.contact_xero_company_ids.filtered(lambda l:l.company_id.id == company and l.xero_contact_id == contact_id.get('ContactID')))
-
+        contact_list_data = []
+        for contact in contact_list:
+            partner_id = partners_by_contact.get(contact.get('ContactID'))
             if partner_id:
-                partner_id = partner_id[0]
-                phone_list = []
-                if partner_id.phone:
-                    phone_list.append({u'PhoneNumber': partner_id.phone or u'',
-                                        u'PhoneType':  u'DEFAULT'})
-                if partner_id.mobile:
-                    phone_list.append({u'PhoneNumber': partner_id.mobile or u'',
-                                        u'PhoneType':  u'MOBILE'})
-                if partner_id.direct_dial:
-                    phone_list.append({u'PhoneNumber': partner_id.direct_dial   or u'',
-                                        u'PhoneType':  u'DDI'})
-
-                contact_person_list = []
-                po_country = u''
-                po_state = u''
-                po_city = u''
-                po_zip = u''
-                po_add_line1 = u''
-                po_add_line2 = u''
-                attention_to = u''
-                i = 0
-                for contact_per_id in partner_id.child_ids:
-                    if contact_per_id.type == 'contact':
-                        i += 1
-                        if contact_per_id.first_name:
-                            FirstName = contact_per_id.first_name
-                        else:
-                            FirstName = contact_per_id.name
-                        if i < 6:
-                            contact_person_list.append({u'LastName':contact_per_id.last_name or u'',
-                                                        u'EmailAddress':contact_per_id.email or u'',
-                                                        u'IncludeInEmails': u'true',
-                                                        u'FirstName':FirstName or u''}
-                                                       )
-                    elif contact_per_id.type == 'invoice':
-                        po_country = contact_per_id.country_id and contact_per_id.country_id.name or u''
-                        po_state = contact_per_id.state_id and contact_per_id.state_id.name or u''
-                        po_city = contact_per_id.city or u''
-                        po_zip = contact_per_id.zip or u''
-                        po_add_line1 = contact_per_id.street or u''
-                        po_add_line2 = contact_per_id.street2 or u''
-                        attention_to = contact_per_id.attention_to or u''
-
-                if partner_id.active:
-                    status = 'ACTIVE'
-                else:
-                    status = 'ARCHIVED'
-
-                vals = {u'Name': contact_id.get('Name') or u'',
-                        u'ContactStatus': status,
-                        u'EmailAddress': partner_id.email or u'',
-                        u'SkypeUserName': partner_id.skype_name or u'',
-                        u'TaxNumber': partner_id.tax_number or u'',
-                        u'FirstName': partner_id.first_name or u'',
-                        u'LastName': partner_id.last_name or u'',
-                        # u'IsCustomer':partner_id.customer or False,
-                        # u'IsSupplier':partner_id.supplier or False,
-                        u'Addresses': [{
-                                u'City': partner_id.city or u'',
-                                u'AddressType': u'STREET',
-                                u'Country': partner_id.country_id and partner_id.country_id.name or u'',
-                                u'Region': partner_id.state_id and partner_id.state_id.name or u'',
-                                u'AttentionTo': partner_id.attention_to or u'',
-                                u'AddressLine1': partner_id.street or  u'',
-                                u'AddressLine2': partner_id.street2 or u'',
-                                u'PostalCode': partner_id.zip or u''},
-                                {
-                                u'City': po_city,
-                                u'AddressType': u'POBOX',
-                                u'Country': po_country,
-                                u'Region': po_state,
-                                u'AttentionTo': attention_to,
-                                u'AddressLine1': po_add_line1,
-                                u'AddressLine2': po_add_line2,
-                                u'PostalCode': po_zip}],
-                        u'Phones': phone_list or [],
-                        u'ContactPersons': contact_person_list or []}
-                if partner_id.bank_ids:
-                    vals.update({u'BankAccountDetails': partner_id.bank_ids[0].acc_number})
+                vals = {u'Name': contact.get('Name') or u'',
+                        u'ContactID': contact.get('ContactID')}
+                vals.update(contact_vals[partner_id.id])
                 contact_list_data.append(vals)
-                c += 1
-                if c == 50:
+                if len(contact_list_data) == 50:
                     data_list.append(contact_list_data)
                     contact_list_data = []
-                    c = 0
         if contact_list_data:
             data_list.append(contact_list_data)
         for data in data_list:
-            xero.contacts.save(data)
+            results = xero.contacts.write_batch(data, method='save')
+            self.env['mismatch.log'].log_rejected(self._name, results)
+            self._mark_xero_contacts_synced([result.result for result in results if result.ok], company)
             self._cr.commit()
 
-    def export_contact_overwrite(self, contact_list, xero, last_export_date, company=False, contact_ids=[]):
+    def export_contact(self, contact_list, xero, last_export_date, company=False, contact_ids=[]):
         '''
         Map: ContactID(Odoo) with ContactID(Xero)
 
@@ -980,276 +656,22 @@ class ResPartner(models.Model):
 
         If contact record is available in xero then it will update that particular record.
         '''
-        status = ''
-        same_record = []
-        final_contact_list = []
-        contact_name_list = []
-        count = 1
-        if self._context.get('contact_ids'):
-            contact_ids = self._context.get('contact_ids')
-        else:
-            if len(contact_ids) <= 0:
-                if last_export_date:
-                    # contact_ids = self.search([('company_id', '=', company), ('parent_id', '=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date)])
-                    contact_ids = self.search([('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date)])
-                    update_child_contact_ids = self.search(['|', ('company_id', '=', company), ('company_id', '=', False), ('parent_id', '!=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date),
-                        '|', ('active', '=', True), ('active', '=', False)]).mapped('parent_id').filtered(lambda l: not l.parent_id and l.name)
-                    contact_ids = contact_ids.union(update_child_contact_ids)
-                else:
-                    contact_ids = self.search([('parent_id', '=', False), '|', ('company_id', '=', company), ('company_id', '=', False)])
-
-        for contact_id in contact_ids:
-            contact_name_list = []
-            for contact in contact_list:
-                if contact_id.name.lower() == contact.get('Name').lower() and contact_id.email == contact.get('EmailAddress'):
-                    # xero_contact = contact_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company and not l.xero_contact_id)
-                    # if xero_contact:
-                    #     xero_contact.write({'xero_contact_id': contact.get('ContactID')})
-
-                    contact_name_list.append(contact.get('Name').lower())
-                    # if contact_id.contact_id == contact.get('ContactID'):
-                    #     same_record.append(contact_id.id)
-                    xero_company = contact_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                    # if xero_company and xero_company.xero_contact_id == contact.get('ContactID'):
-                    same_record.append(contact_id.id)
-                    if xero_company and not xero_company.xero_contact_id:
-                        xero_company.xero_contact_id = contact.get('ContactID')
-                    elif not xero_company:
-                        contact_id.contact_xero_company_ids = [(0, 0, {'company_id': company,
-                                                                       'xero_contact_id': contact.get('ContactID')})]
-            final_contact_list.append(contact_id.id)
-
-        data_list = []
-        contact_list_data = []
-        c = 0
-        partner_ids = self.browse(list(set(final_contact_list).difference(set(same_record))))
-        for partner_id in partner_ids:
-            contact_name = ''
-
-            if partner_id.name and partner_id.name.lower() in contact_name_list:
-                name = partner_id.name.lower() + ' (' + str(count) + ')'
-                contact_name = partner_id.name + ' (' + str(count) + ')'
-                while(name in contact_name_list):
-                    name = partner_id.name.lower() + ' (' + str(count) + ')'
-                    contact_name = partner_id.name + ' (' + str(count) + ')'
-                    count += 1
-                contact_name_list.append(name)
-            elif partner_id.name:
-                contact_name_list.append(partner_id.name.lower())
-
-            phone_list = []
-            if partner_id.phone:
-                phone_list.append({u'PhoneNumber': partner_id.phone or u'',
-                                    u'PhoneType':  u'DEFAULT'})
-            if partner_id.mobile:
-                phone_list.append({u'PhoneNumber': partner_id.mobile or u'',
-                                    u'PhoneType':  u'MOBILE'})
-            if partner_id.direct_dial:
-                phone_list.append({u'PhoneNumber': partner_id.direct_dial   or u'',
-                                    u'PhoneType':  u'DDI'})
-
-            contact_person_list = []
-            po_country = u''
-            po_state = u''
-            po_city = u''
-            po_zip = u''
-            po_add_line1 = u''
-            po_add_line2 = u''
-            attention_to = u''
-            i = 0
-            for contact_per_id in partner_id.child_ids:
-                if contact_per_id.type == 'contact':
-                    i += 1
-                    if contact_per_id.first_name:
-                        FirstName = contact_per_id.first_name
-                    else:
-                        FirstName = contact_per_id.name
-                    if i < 6:
-                        contact_person_list.append({u'LastName':contact_per_id.last_name or u'',
-                                                    u'EmailAddress':contact_per_id.email or u'',
-                                                    u'IncludeInEmails': u'true',
-                                                    u'FirstName':FirstName or u''})
-                elif contact_per_id.type == 'invoice':
-                    po_country = contact_per_id.country_id and contact_per_id.country_id.name or u''
-                    po_state = contact_per_id.state_id and contact_per_id.state_id.name or u''
-                    po_city = contact_per_id.city or u''
-                    po_zip = contact_per_id.zip or u''
-                    po_add_line1 = contact_per_id.street or u''
-                    po_add_line2 = contact_per_id.street2 or u''
-                    attention_to = contact_per_id.attention_to or u''
-
-            if partner_id.active:
-                status = 'ACTIVE'
-            else:
-                status = 'ARCHIVED'
+        self._export_contacts(contact_list, xero, last_export_date, company, contact_ids)
 
-            if contact_name:
-                vals = {u'Name': contact_name or u''}
-                partner_id.xero_name = contact_name
-            else:
-                vals = {u'Name': partner_id.name or u''}
-                partner_id.xero_name = partner_id.name
-
-            vals.update({u'ContactStatus': status,
-                        u'EmailAddress': partner_id.email or u'',
-                        u'SkypeUserName': partner_id.skype_name or u'',
-                        u'TaxNumber': partner_id.tax_number or u'',
-                        u'FirstName': partner_id.first_name or u'',
-                        u'LastName': partner_id.last_name or u'',
-                        # u'IsCustomer':partner_id.customer or False,
-                        # u'IsSupplier':partner_id.supplier or False,
-                        u'Addresses': [{
-                                    u'City': partner_id.city or u'',
-                                    u'AddressType': u'STREET',
-                                    u'Country': partner_id.country_id and partner_id.country_id.name or u'',
-                                    u'Region': partner_id.state_id and partner_id.state_id.name or u'',
-                                    u'AttentionTo': partner_id.attention_to or u'',
-                                    u'AddressLine1': partner_id.street or  u'',
-                                    u'AddressLine2': partner_id.street2 or u'',
-                                    u'PostalCode': partner_id.zip or u''},
-                                    {
-                                    u'City': po_city,
-                                    u'AddressType': u'POBOX',
-                                    u'Country': po_country,
-                                    u'Region': po_state,
-                                    u'AttentionTo': attention_to,
-                                    u'AddressLine1': po_add_line1,
-                                    u'AddressLine2': po_add_line2,
-                                    u'PostalCode': po_zip}],
-                        u'Phones': phone_list or [],
-                        u'ContactPersons': contact_person_list or []
-                    })
-            if partner_id.bank_ids:
-                vals.update({u'BankAccountDetails': partner_id.bank_ids[0].acc_number})
-            contact_list_data.append(vals)
-            c += 1
-            if c == 50:
-                data_list.append(contact_list_data)
-                contact_list_data = []
-                c = 0
+    def export_contact_overwrite(self, contact_list, xero, last_export_date, company=False, contact_ids=[]):
+        '''
+        Map: ContactID(Odoo) with ContactID(Xero)
 
-        if contact_list_data:
-            data_list.append(contact_list_data)
-        for data in data_list:
-            contact_details = xero.contacts.put(data)
-            for contact in contact_details:
-                contact_id = self.search([('xero_name' , '=', contact.get('Name'))], limit=1)
-                # if contact_id:
-                #     contact_id.contact_id = contact.get('ContactID', False)
-                if contact_id:
-                    xero_contact = contact_id.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company)
-                    xero_contact.xero_contact_id = contact.get('ContactID', False)
-                    self._cr.commit()
+        Create a contact in xero if contact is not available.
 
-        #Update Record
-        contact_list_data = []
-        data_list = []
-        c = 0
-        for contact_id in contact_list:
-            if last_export_date:
-                partner_ids = self.search([('write_date', '>', last_export_date), '|', ('company_id', '=', company), ('company_id', '=', False)])
-                partner_id = partner_ids.filtered(lambda contact: contact.contact_xero_company_ids.filtered(lambda l: l.company_id.id == company and l.xero_contact_id == contact_id.get('ContactID')))
-                update_child_contact_ids = self.search([('parent_id', '!=', False), '|', ('create_date', '>=', last_export_date), ('write_date', '>=', last_export_date),
-                    '|', ('active', '=', True), ('active', '=', False)]).mapped('parent_id').filtered(lambda l: not l.parent_id and l.name and (l.company_id.id == company or not l.company_id) \
-                    and l.contact_xero_company_ids.filtered(lambda contact: contact.company_id.id == company and contact.xero_contact_id == contact_id.get('ContactID')))
-                partner_id = partner_id.union(update_child_contact_ids)
-            else:
-                partner_id = self.search(['|', ('company_id', '=', company), ('company_id', '=', False)]).filtered(lambda contact: contact.contact_xero_company_ids.filtered(lambda l:l.company_id.id == company and l.xero_contact_id == contact_id.get('ContactID')))
+        Note: If contact is available in xero with name which we going to
+        export from odoo then it will skip that record.
 
-            if partner_id:
-                partner_id = partner_id[0]
-                phone_list = []
-                if partner_id.phone:
-                    phone_list.append({u'PhoneNumber': partner_id.phone or u'',
-                                        u'PhoneType':  u'DEFAULT'})
-                if partner_id.mobile:
-                    phone_list.append({u'PhoneNumber': partner_id.mobile or u'',
-                                        u'PhoneType':  u'MOBILE'})
-                if partner_id.direct_dial:
-                    phone_list.append({u'PhoneNumber': partner_id.direct_dial   or u'',
-                                        u'PhoneType':  u'DDI'})
-
-                contact_person_list = []
-                po_country = u''
-                po_state = u''
-                po_city = u''
-                po_zip = u''
-                po_add_line1 = u''
-                po_add_line2 = u''
-                attention_to = u''
-                i = 0
-                for contact_per_id in partner_id.child_ids:
-                    if contact_per_id.type == 'contact':
-                        i += 1
-                        if contact_per_id.first_name:
-                            FirstName = contact_per_id.first_name
-                        else:
-                            FirstName = contact_per_id.name
-                        if i < 6:
-                            contact_person_list.append({u'LastName':contact_per_id.last_name or u'',
-                                                        u'EmailAddress':contact_per_id.email or u'',
-                                                        u'IncludeInEmails': u'true',
-                                                        u'FirstName':FirstName or u''}
-                                                       )
-                    elif contact_per_id.type == 'invoice':
-                        po_country = contact_per_id.country_id and contact_per_id.country_id.name or u''
-                        po_state = contact_per_id.state_id and contact_per_id.state_id.name or u''
-                        po_city = contact_per_id.city or u''
-                        po_zip = contact_per_id.zip or u''
-                        po_add_line1 = contact_per_id.street or u''
-                        po_add_line2 = contact_per_id.street2 or u''
-                        attention_to = contact_per_id.attention_to or u''
-
-                if partner_id.active:
-                    status = 'ACTIVE'
-                else:
-                    status = 'ARCHIVED'
-
-                xero_contact_id = partner_id.contact_xero_company_ids.filtered(lambda contact: contact.company_id.id == company).xero_contact_id
-                vals = {u'Name': contact_id.get('Name') or u'',
-                        u'ContactID': xero_contact_id,
-                        u'ContactStatus': status,
-                        u'EmailAddress': partner_id.email or u'',
-                        u'SkypeUserName': partner_id.skype_name or u'',
-                        u'TaxNumber': partner_id.tax_number or u'',
-                        u'FirstName': partner_id.first_name or u'',
-                        u'LastName': partner_id.last_name or u'',
-                        # u'IsCustomer':partner_id.customer or False,
-                        # u'IsSupplier':partner_id.supplier or False,
-                        u'Addresses': [{
-                                u'City': partner_id.city or u'',
-                                u'AddressType': u'STREET',
-                                u'Country': partner_id.country_id and partner_id.country_id.name or u'',
-                                u'Region': partner_id.state_id and partner_id.state_id.name or u'',
-                                u'AttentionTo': partner_id.attention_to or u'',
-                                u'AddressLine1': partner_id.street or  u'',
-                                u'AddressLine2': partner_id.street2 or u'',
-                                u'PostalCode': partner_id.zip or u''},
-                                {
-                                u'City': po_city,
-                                u'AddressType': u'POBOX',
-                                u'Country': po_country,
-                                u'Region': po_state,
-                                u'AttentionTo': attention_to,
-                                u'AddressLine1': po_add_line1,
-                                u'AddressLine2': po_add_line2,
-                                u'PostalCode': po_zip}],
-                        u'Phones': phone_list or [],
-                        u'ContactPersons': contact_person_list or []}
-                if partner_id.bank_ids:
-                    vals.update({u'BankAccountDetails': partner_id.bank_ids[0].acc_number})
-                contact_list_data.append(vals)
+        Constraint(Xero): The name of the Contact must be unique
 
-                c += 1
-                if c == 50:
-                    data_list.append(contact_list_data)
-                    contact_list_data = []
-                    c = 0
-        if contact_list_data:
-            data_list.append(contact_list_data)
-        for data in data_list:
-            test = xero.contacts.save(data)
-            self._cr.commit()
+        If contact record is available in xero then it will update that particular record.
+        '''
+        self._export_contacts(contact_list, xero, last_export_date, company, contact_ids, link_by_name=True)
 
     def action_export_contact(self):
         context = self._context
@@ -2,14 +2,23 @@
 # Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
 
 import base64
+import hashlib
 import json
 import ast
+import logging
 import requests
+import weakref
+from psycopg2 import OperationalError, errorcodes
+from concurrent.futures import ThreadPoolExecutor
 from odoo import api, fields, models, _
 from odoo.addons.sync_xero_connector.lib.xero.auth import PublicCredentials,PrivateCredentials, OAuth2Credentials
 from odoo.addons.sync_xero_connector.lib.xero.constants import XeroScopes
 from odoo.exceptions import UserError, ValidationError, Warning
+from odoo.tools.sql import create_index
 from odoo.addons.sync_xero_connector.lib.xero import Xero
+from odoo.addons.sync_xero_connector.lib.xero.ratelimit import PostgresBucketStore, RateLimiter
+from odoo.addons.sync_xero_connector.lib.xero.retry import DEFAULT_MAX_RETRIES, DEFAULT_RUN_BUDGET, RetryPolicy
+from odoo.addons.sync_xero_connector.lib.xero.session import DEFAULT_POOL_SIZE, DEFAULT_TIMEOUT
 from datetime import datetime
 from odoo.addons.sync_xero_connector.lib.xero.exceptions import (
     XeroAccessDenied,
@@ -26,6 +35,17 @@ from odoo.addons.sync_xero_connector.lib.xero.exceptions import (
     XeroUnauthorized,
 )
 
+_logger = logging.getLogger(__name__)
+
+# One rate limiter per database, shared by every thread of the worker
+_rate_limiters = {}
+# Authenticated clients per cursor and account, reused for the whole transaction
+_clients = weakref.WeakKeyDictionary()
+# Refresh OAuth2 tokens this many seconds before they expire
+TOKEN_REFRESH_MARGIN = 300
+# Ids per request when fetching given records with IDs=, keeps the URL short
+XERO_IDS_CHUNK = 50
+
 
 class MisMatchLog(models.Model):
     _name = 'mismatch.log'
@@ -37,6 +57,209 @@ class MisMatchLog(models.Model):
     description = fields.Char('Description')
     exported_date = fields.Datetime('Exported Date')
 
+    @api.model
+    def log_rejected(self, source_model, results, records=None):
+        """
+            Log the elements of a batch write (see Manager.write_batch) that
+            Xero rejected, with their validation errors. ``records`` are the
+            records sent, in the order of ``results``, when they are known.
+        """
+        vals = []
+        for index, result in enumerate(results):
+            if result.ok:
+                continue
+            record = records[index] if records is not None else None
+            data = result.data if isinstance(result.data, dict) else {}
+            vals.append({'name': record.display_name if record else data.get('Name') or data.get('Code') or data.get('Reference'),
+                         'source_model': source_model,
+                         'source_id': record.id if record else False,
+                         'description': '\n'.join(result.errors),
+                         'exported_date': fields.Datetime.now()})
+        if vals:
+            self.create(vals)
+
+
+class XeroRateLimit(models.Model):
+    _name = 'xero.rate.limit'
+    _description = 'Xero Rate Limit'
+    _log_access = False
+
+    tenant_id = fields.Char('Tenant Id', required=True)
+    tokens = fields.Float('Available Calls')
+    refilled_at = fields.Float('Refilled At')
+    day_remaining = fields.Integer('Daily Calls Remaining')
+    day_seen_at = fields.Float('Daily Limit Seen At')
+
+    _sql_constraints = [
+        ('tenant_id_uniq', 'unique(tenant_id)', 'Rate limit of a tenant must be unique!'),
+    ]
+
+
+class XeroSyncQueue(models.Model):
+    _name = 'xero.sync.queue'
+    _description = 'Xero Sync Queue'
+    _log_access = False
+
+    model = fields.Char('Model', required=True)
+    res_id = fields.Integer('Record Id', required=True)
+    operation = fields.Selection([('create', 'Create'), ('write', 'Write')], string='Operation')
+    changed_at = fields.Datetime('Changed At', required=True, index=True)
+
+    _sql_constraints = [
+        ('model_res_id_uniq', 'unique(model, res_id)', 'A record can only be queued once!'),
+    ]
+
+    def init(self):
+        # Id of the transaction that queued the entry. An export only sees the
+        # entries committed when it started, the next one reads every entry its
+        # snapshot did not cover whatever changed_at is. A bigint the ORM has no
+        # field type for, only read and written in SQL.
+        self._cr.execute("ALTER TABLE xero_sync_queue ADD COLUMN IF NOT EXISTS txid bigint")
+        create_index(self._cr, 'xero_sync_queue_txid_index', self._table, ['txid'])
+        # Changes made before the queue existed are not in it, exports last run
+        # before this date scan their model one more time
+        config = self.env['ir.config_parameter'].sudo()
+        if not config.get_param('sync_xero_connector.sync_queue_since'):
+            config.set_param('sync_xero_connector.sync_queue_since', fields.Datetime.to_string(fields.Datetime.now()))
+
+    @api.model
+    def enqueue(self, model, ids, operation):
+        ids = list(set(filter(None, ids)))
+        if not ids:
+            return
+        self._cr.execute("""INSERT INTO xero_sync_queue (model, res_id, operation, changed_at, txid)
+                            SELECT %s, res_id, %s, now() at time zone 'UTC', txid_current() FROM unnest(%s) AS res_id
+                            ON CONFLICT (model, res_id) DO UPDATE
+                            SET operation = EXCLUDED.operation, changed_at = EXCLUDED.changed_at, txid = EXCLUDED.txid""",
+                         (model, operation, ids))
+
+    @api.model
+    def dequeue(self, model, ids):
+        if ids:
+            self._cr.execute("DELETE FROM xero_sync_queue WHERE model = %s AND res_id IN %s", (model, tuple(ids)))
+
+    @api.model
+    def current_snapshot(self):
+        """Snapshot of the current transaction, taken before an export reads the queue."""
+        self._cr.execute("SELECT txid_current_snapshot()::text")
+        return self._cr.fetchone()[0]
+
+    @api.model
+    def changed_ids(self, model, since):
+        """Ids of the ``model`` records changed since ``since``, or None when
+        the queue doesn't cover that period and the model must be scanned.
+
+        With the ``xero_queue_snapshot`` of the previous export in the context,
+        the entries its snapshot did not see are returned instead: a change
+        committed while that export ran is stamped before ``since``."""
+        queue_since = self.env['ir.config_parameter'].sudo().get_param('sync_xero_connector.sync_queue_since')
+        if not since or not queue_since or fields.Datetime.to_datetime(since) < fields.Datetime.to_datetime(queue_since):
+            return None
+        snapshot = self._context.get('xero_queue_snapshot')
+        if snapshot:
+            self._cr.execute("""SELECT res_id FROM xero_sync_queue
+                                WHERE model = %s AND NOT txid_visible_in_snapshot(txid, %s::txid_snapshot)
+                                ORDER BY changed_at, res_id""", (model, snapshot))
+        else:
+            self._cr.execute("SELECT res_id FROM xero_sync_queue WHERE model = %s AND changed_at >= %s ORDER BY changed_at, res_id",
+                             (model, since))
+        return [row[0] for row in self._cr.fetchall()]
+
+    @api.model
+    def prune(self, model, watermark_fields):
+        """Drop the entries of ``model`` that every active account has exported already."""
+        accounts = self.env['xero.account'].search([('active', '=', True)])
+        marks = [(account[fname], account._get_queue_snapshot(fname))
+                 for fname in watermark_fields for account in accounts if account[fname]]
+        if marks and all(snapshot for date, snapshot in marks):
+            # Transactions older than the oldest snapshot's xmin were committed
+            # before every account's last export read the queue
+            self._cr.execute("""DELETE FROM xero_sync_queue
+                                WHERE model = %s AND (txid IS NULL OR txid < (SELECT min(txid_snapshot_xmin(snapshot::txid_snapshot))
+                                                                              FROM unnest(%s) AS snapshot))""",
+                             (model, [snapshot for date, snapshot in marks]))
+        else:
+            self._cr.execute("DELETE FROM xero_sync_queue WHERE model = %s AND changed_at < %s",
+                             (model, min(date for date, snapshot in marks) if marks else fields.Datetime.now()))
+
+
+class XeroSyncMixin(models.AbstractModel):
+    _name = 'xero.sync.mixin'
+    _description = 'Xero Export Change Tracking'
+
+    # Fields sent to Xero, only a change of one of them queues a record for export
+    _xero_export_fields = ()
+    # x2many fields of _xero_export_fields whose records are sent with the record
+    _xero_export_children = ()
+
+    def _xero_sync_records(self):
+        """Records to export again when ``self`` changes."""
+        return self
+
+    def _xero_fingerprint(self):
+        """Hash of the exported values of each record of ``self``, {id: fingerprint}."""
+        fnames = [fname for fname in self._xero_export_fields if fname not in self._xero_export_children]
+        values = dict((row.pop('id'), row) for row in self.read(fnames, load=None))
+        for fname in self._xero_export_children:
+            child_fingerprints = self.mapped(fname)._xero_fingerprint()
+            for record in self:
+                values[record.id][fname] = sorted(child_fingerprints[child.id] for child in record[fname])
+        return dict((record_id, hashlib.sha1(repr(sorted(vals.items())).encode('utf-8')).hexdigest())
+                    for record_id, vals in values.items())
+
+    def _xero_sync_links(self, company):
+        """Records holding xero_fingerprint and xero_updated_date of ``self``
+        in ``company``, {id: link}."""
+        return dict((record.id, record) for record in self)
+
+    def _xero_sync_state(self, company):
+        """Split the records of ``self`` into (unchanged, changed) since their
+        last sync with Xero in ``company``. A record without fingerprint
+        (never synced, or synced before fingerprints were kept) may have
+        changes Xero doesn't have, it is changed."""
+        links = self._xero_sync_links(company)
+        synced = self.filtered(lambda l: l.id in links and links[l.id].xero_fingerprint)
+        fingerprints = synced._xero_fingerprint()
+        unchanged = synced.filtered(lambda l: links[l.id].xero_fingerprint == fingerprints[l.id])
+        return unchanged, self - unchanged
+
+    def _mark_xero_synced(self, company, updated_dates):
+        """Store the fingerprint of the records of ``self`` as they are now in
+        Xero, with the UpdatedDateUTC Xero returned for them ({id: date}).
+        Their next export skips them until an exported value changes in Odoo."""
+        links = self._xero_sync_links(company)
+        fingerprints = self._xero_fingerprint()
+        for record in self:
+            if record.id in links:
+                links[record.id].write({'xero_fingerprint': fingerprints[record.id],
+                                        'xero_updated_date': updated_dates.get(record.id)})
+
+    def _xero_enqueue(self, operation):
+        records = self._xero_sync_records()
+        if records:
+            self.env['xero.sync.queue'].enqueue(records._name, records.ids, operation)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super(XeroSyncMixin, self).create(vals_list)
+        records._xero_enqueue('create')
+        return records
+
+    def write(self, vals):
+        res = super(XeroSyncMixin, self).write(vals)
+        if set(vals).intersection(self._xero_export_fields):
+            self._xero_enqueue('write')
+        return res
+
+    def unlink(self):
+        others = self._xero_sync_records()
+        if others._name == self._name:
+            others -= self
+            self.env['xero.sync.queue'].dequeue(self._name, self.ids)
+        res = super(XeroSyncMixin, self).unlink()
+        others.exists()._xero_enqueue('write')
+        return res
+
 
 class XeroAccount(models.Model):
     _name = 'xero.account'
@@ -109,6 +332,16 @@ class XeroAccount(models.Model):
     xero_org_ids = fields.One2many('xero.organization', 'xero_account_id', string='Xero Organization Ids')
     xero_org_id = fields.Many2one('xero.organization', string='Import/Export Xero Organization')
     contact_overwrite = fields.Boolean(string='Contact Overwrite')
+    # Sync queue snapshot of the last export, by export date field, as JSON
+    sync_queue_snapshots = fields.Text(string='Sync Queue Snapshots', copy=False)
+
+    def _get_queue_snapshot(self, watermark_field):
+        return json.loads(self.sync_queue_snapshots or '{}').get(watermark_field)
+
+    def _set_queue_snapshot(self, watermark_field, snapshot):
+        snapshots = json.loads(self.sync_queue_snapshots or '{}')
+        snapshots[watermark_field] = snapshot
+        self.sync_queue_snapshots = json.dumps(snapshots)
 
     @api.onchange('oauth_type')
     def _onchange_oauth(self):
@@ -164,6 +397,7 @@ class XeroAccount(models.Model):
             raise UserError(e)
 
         self.token = new_credentials.token
+        self._drop_client()
 
         xero = Xero(new_credentials)
         self.auth = Xero(new_credentials)
@@ -186,26 +420,110 @@ class XeroAccount(models.Model):
 
         return Xero(new_credentials)
 
+    def _get_client_options(self):
+        """HTTP session, request body and cache settings of the Xero client, from system parameters."""
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        return {
+            'body_format': get_param('sync_xero_connector.body_format', 'xml'),
+            # Settings endpoints are cached for the run of the client only
+            'cache': get_param('sync_xero_connector.settings_cache', 'True') not in ('False', 'false', '0'),
+            'pool_size': int(get_param('sync_xero_connector.http_pool_size', DEFAULT_POOL_SIZE)),
+            'keep_alive': get_param('sync_xero_connector.http_keep_alive', 'True') not in ('False', 'false', '0'),
+            'timeout': (float(get_param('sync_xero_connector.http_connect_timeout', DEFAULT_TIMEOUT[0])),
+                        float(get_param('sync_xero_connector.http_read_timeout', DEFAULT_TIMEOUT[1]))),
+        }
+
+    def _get_retry_policy(self):
+        """Retry budgets for transient Xero errors (429, 500, 503), from system parameters."""
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        return RetryPolicy(max_retries=int(get_param('sync_xero_connector.retry_max', DEFAULT_MAX_RETRIES)),
+                           run_budget=int(get_param('sync_xero_connector.retry_run_budget', DEFAULT_RUN_BUDGET)))
+
+    def _get_rate_limiter(self):
+        """Token bucket per tenant, shared by all cron workers through the xero_rate_limit table."""
+        dbname = self.env.cr.dbname
+        if dbname not in _rate_limiters:
+            _rate_limiters[dbname] = RateLimiter(store=PostgresBucketStore(self.env.registry.cursor))
+        return _rate_limiters[dbname]
+
     def re_authenticate(self):
         self.ensure_one()
         my_scope = [XeroScopes.ACCOUNTING_SETTINGS, XeroScopes.OPENID, XeroScopes.PROFILE, XeroScopes.EMAIL, XeroScopes.OFFLINE_ACCESS, XeroScopes.ACCOUNTING_TRANSACTIONS, XeroScopes.ACCOUNTING_CONTACTS, XeroScopes.ACCOUNTING_ATTACHMENTS]
         new_credentials = OAuth2Credentials(self.client_id, self.client_secret, scope=my_scope, callback_uri=self.callback_uri, token=ast.literal_eval(self.token))
 
-        if new_credentials.expired():
-            try:
-                new_credentials.refresh()
-            except Exception as e:
-                raise UserError(_('Your Token has been expired %s, you need to Reauthentication' % e))
-            self.state = new_credentials.state
-            self.token = new_credentials.token
+        if new_credentials.expired(seconds=TOKEN_REFRESH_MARGIN):
+            self._refresh_token(new_credentials)
 
         if not self.xero_org_id:
             raise UserError('Please configure Xero Organization for Import/Export Operation.')
         new_credentials.tenant_id = self.xero_org_id.xero_tenant_id
-        return Xero(new_credentials)
+        return Xero(new_credentials, rate_limiter=self._get_rate_limiter(), retry_policy=self._get_retry_policy(),
+                    **self._get_client_options())
+
+    def _refresh_token(self, credentials):
+        """Refresh the OAuth2 token of the account, at most one worker at a time.
+
+        Xero rotates the refresh token on every refresh, so two workers refreshing
+        the same account would invalidate each other's token. Refreshes are
+        serialized with an advisory lock held on a separate cursor; the token is
+        re-read on that cursor and only refreshed if no other worker did it
+        meanwhile. The new token is written and committed on that cursor too, so
+        neither a later rollback can lose it nor the transaction of the caller
+        is committed half-done.
+        """
+        self.ensure_one()
+        with self.env.registry.cursor() as lock_cr:
+            lock_cr.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", ('xero_account_token:%s' % self.id,))
+            lock_cr.execute("SELECT state, token FROM xero_account WHERE id = %s", (self.id,))
+            state, token = lock_cr.fetchone()
+            if token and ast.literal_eval(token) != credentials.token:
+                credentials._init_oauth(ast.literal_eval(token))
+            if credentials.expired(seconds=TOKEN_REFRESH_MARGIN):
+                try:
+                    credentials.refresh()
+                except Exception as e:
+                    raise UserError(_('Your Token has been expired %s, you need to Reauthentication' % e))
+                state, token = credentials.state, str(credentials.token)
+                if not self._store_token(lock_cr, state, token):
+                    # The transaction of the caller holds the row, it writes the token
+                    _logger.warning("Xero account %s is locked by the current transaction, its new token is saved with it", self.id)
+                    self.write({'state': state, 'token': token})
+                    return
+            lock_cr.commit()
+        # The caller's snapshot may predate the new token, put it in its cache
+        for name, value in (('state', state), ('token', token)):
+            field = self._fields[name]
+            self.env.cache.set(self, field, field.convert_to_cache(value, self))
+
+    def _store_token(self, cr, state, token):
+        """Write the token of the account through ``cr``, False when the row
+        stays locked by another transaction (the caller's one, usually)."""
+        cr.execute("SET LOCAL lock_timeout = '5s'")
+        try:
+            with cr.savepoint():
+                cr.execute("""UPDATE xero_account SET state = %s, token = %s, write_date = (now() at time zone 'UTC')
+                              WHERE id = %s""", (state, token, self.id))
+        except OperationalError as e:
+            if e.pgcode != errorcodes.LOCK_NOT_AVAILABLE:
+                raise
+            return False
+        return True
+
+    def _drop_client(self):
+        clients = _clients.get(self.env.cr, {})
+        for key in [key for key in clients if key[0] in self.ids]:
+            del clients[key]
 
     def xero_auth(self):
         self.ensure_one()
+        # Every import/export method authenticates, reuse the client of this transaction
+        clients = _clients.setdefault(self.env.cr, {})
+        key = (self.id, self.oauth_type, self.account_type, self.xero_org_id.id)
+        xero = clients.get(key)
+        if xero is not None:
+            if self.oauth_type == 'oauth2' and xero.credentials.expired(seconds=TOKEN_REFRESH_MARGIN):
+                self._refresh_token(xero.credentials)
+            return xero
         if self.oauth_type == 'oauth1':
             if self.account_type == 'public' and not self.authentication_number:
                 raise Warning(_('Please enter Authentication Number!'))
@@ -216,6 +534,8 @@ class XeroAccount(models.Model):
                 raise Warning(_('Please configure Xero Organization for Import/Export Operation.'))
             xero = self.re_authenticate()
             # company = self.xero_org_id.company_id.id
+        self._drop_client()
+        clients[key] = xero
         # return xero, company
         return xero
 
@@ -236,72 +556,135 @@ class XeroAccount(models.Model):
                     record.oauth_authorization_expires_at = False
                     record.auth = False
 
+    def _is_automatic_sync_ready(self):
+        return self.oauth_type == 'oauth2' or (self.oauth_type == 'oauth1' and self.account_type == 'private' and self.consumer_key and self.rsa_key_file)
+
+    def _automatic_import_account(self):
+        self.ensure_one()
+        xero = self.xero_auth()
+        try:
+            # Import Currency
+            currency_list = xero.currencies.all()
+            self.env['res.currency'].import_currency(currency_list, xero)
+            # Import Tax
+            tax_list = xero.taxrates.all()
+            self.env['account.tax'].import_tax(tax_list, xero, company=self.company_id.id, import_option=self.import_option)
+            # Import Account
+            account_list = xero.accounts.all()
+            self.env['account.account'].import_account(account_list, xero, company=self.company_id.id, import_option=self.import_option)
+            # Import Contact Group
+            # group_list = xero.contactgroups.all()
+            # self.env['res.partner.category'].import_contact_group(group_list, xero)
+            # Import Contacts
+            self.import_contact_overwrite() if self.contact_overwrite else self.import_contact()
+            # Import Bank Account
+            bank_account_list = xero.accounts.filter(Type='BANK')
+            self.env['res.partner.bank'].import_bank_account(bank_account_list, xero, import_option=self.import_option, company=self.company_id.id)
+            if not self.inv_without_product:
+                # Import Product
+                self.import_product()
+            # Import Invoice
+            self.import_invoice()
+            # Import Manual Journal
+            self.import_manual_journal()
+            # Import Credit Notes
+            if self.import_export_creditnotes == 'import':
+                self.import_credit_notes()
+        finally:
+            # Release the pooled connections of this tenant
+            xero.close()
+
+    def _automatic_export_account(self):
+        self.ensure_one()
+        xero = self.xero_auth()
+        try:
+            # Export Taxes
+            tax_rates = xero.taxrates.all()
+            self.env['account.tax'].export_tax(tax_rates, xero, company=self.company_id.id, disable_export=self.export_disable)
+            # Export Accounts
+            account_list = xero.accounts.all()
+            self.env['account.account'].export_account(account_list, xero, company=self.company_id.id, disable_export=self.export_disable)
+            # Export Bank Accounts
+            bank_account_list = xero.accounts.filter(Type='BANK')
+            self.env['res.partner.bank'].export_bank_account(bank_account_list, xero, company=self.company_id.id, disable_export=self.export_disable)
+            # Export Contact Groups
+            group_list = xero.contactgroups.all()
+            self.env['res.partner.category'].export_contact_group(group_list, xero)
+            # Export Contacts
+            self.export_contact_overwrite()if self.contact_overwrite else self.export_contact()
+            # Export Products
+            self.export_product()
+            # Export invoices
+            self.export_invoice()
+            self.export_payment()
+            # Export credit Notes
+            if self.import_export_creditnotes == 'export':
+                self.export_credit_notes()
+                self.export_credit_notes_payment()
+            # Export Inventory Adjustments
+            self.env['stock.move.line'].create_inventory_adjustments(xero, company=self.company_id.id)
+            #Export Attachment
+            self.export_attachments()
+            # self.env['ir.attachment'].export_attachments(xero, company=self.company_id.id)
+        finally:
+            # Release the pooled connections of this tenant
+            xero.close()
+
+    def _run_account_sync(self, account_id, method, uid, context):
+        """Run ``method`` for one account in its own cursor and commit it.
+
+        This is the failure boundary of a tenant: an error rolls back this
+        account's cursor only and is logged, the other accounts carry on.
+        """
+        with api.Environment.manage(), self.pool.cursor() as cr:
+            account = api.Environment(cr, uid, context)['xero.account'].browse(account_id)
+            try:
+                getattr(account, method)()
+            except Exception:
+                cr.rollback()
+                _logger.exception("Xero %s failed for account %s", method, account_id)
+                return False
+        return True
+
+    @api.model
+    def _run_accounts_sync(self, method):
+        """Sync every active account, each in its own worker thread and cursor.
+
+        The number of accounts synced at once comes from the
+        sync_xero_connector.sync_workers system parameter (1 by default, i.e.
+        one account after the other). Each worker holds a database connection,
+        keep it well below db_maxconn.
+        """
+        account_ids = self.search([('active', '=', True)]).filtered(lambda r: r._is_automatic_sync_ready()).ids
+        workers = int(self.env['ir.config_parameter'].sudo().get_param('sync_xero_connector.sync_workers', 1))
+        args = (method, self.env.uid, dict(self.env.context))
+        if workers <= 1 or len(account_ids) <= 1:
+            results = [self._run_account_sync(account_id, *args) for account_id in account_ids]
+        else:
+            with ThreadPoolExecutor(max_workers=min(workers, len(account_ids))) as executor:
+                results = list(executor.map(lambda account_id: self._run_account_sync(account_id, *args), account_ids))
+        failed = results.count(False)
+        if failed:
+            _logger.warning("Xero %s failed for %s of %s accounts", method, failed, len(account_ids))
+        return results
+
     @api.model
     def automatic_import(self):
-        for record in self.search([('active', '=', True)]):
-            if record.oauth_type == 'oauth2' or (record.oauth_type == 'oauth1' and record.account_type == 'private' and record.consumer_key and record.rsa_key_file):
-                xero = record.xero_auth()
-                # Import Currency
-                currency_list = xero.currencies.all()
-                self.env['res.currency'].import_currency(currency_list, xero)
-                # Import Tax
-                tax_list = xero.taxrates.all()
-                self.env['account.tax'].import_tax(tax_list, xero, company=record.company_id.id, import_option=record.import_option)
-                # Import Account
-                account_list = xero.accounts.all()
-                self.env['account.account'].import_account(account_list, xero, company=record.company_id.id, import_option=record.import_option)
-                # Import Contact Group
-                # group_list = xero.contactgroups.all()
-                # self.env['res.partner.category'].import_contact_group(group_list, xero)
-                # Import Contacts
-                record.import_contact_overwrite() if record.contact_overwrite else record.import_contact()
-                # Import Bank Account
-                bank_account_list = xero.accounts.filter(Type='BANK')
-                self.env['res.partner.bank'].import_bank_account(bank_account_list, xero, import_option=record.import_option, company=record.company_id.id)
-                if not record.inv_without_product:
-                    # Import Product
-                    record.import_product()
-                # Import Invoice
-                record.import_invoice()
-                # Import Manual Journal
-                record.import_manual_journal()
-                # Import Credit Notes
-                if record.import_export_creditnotes == 'import':
-                    record.import_credit_notes()
+        return self._run_accounts_sync('_automatic_import_account')
 
     @api.model
     def automatic_export(self):
-        for record in self.search([('active', '=', True)]):
-            if record.oauth_type == 'oauth2' or (record.oauth_type == 'oauth1' and record.account_type == 'private' and record.consumer_key and record.rsa_key_file):
-                xero = record.xero_auth()
-                # Export Taxes
-                tax_rates = xero.taxrates.all()
-                self.env['account.tax'].export_tax(tax_rates, xero, company=record.company_id.id, disable_export=record.export_disable)
-                # Export Accounts
-                account_list = xero.accounts.all()
-                self.env['account.account'].export_account(account_list, xero, company=record.company_id.id, disable_export=record.export_disable)
-                # Export Bank Accounts
-                bank_account_list = xero.accounts.filter(Type='BANK')
-                self.env['res.partner.bank'].export_bank_account(bank_account_list, xero, company=record.company_id.id, disable_export=record.export_disable)
-                # Export Contact Groups
-                group_list = xero.contactgroups.all()
-                self.env['res.partner.category'].export_contact_group(group_list, xero)
-                # Export Contacts
-                record.export_contact_overwrite()if record.contact_overwrite else record.export_contact()
-                # Export Products
-                record.export_product()
-                # Export invoices
-                record.export_invoice()
-                record.export_payment()
-                # Export credit Notes
-                if record.import_export_creditnotes == 'export':
-                    record.export_credit_notes()
-                    record.export_credit_notes_payment()
-                # Export Inventory Adjustments
-                self.env['stock.move.line'].create_inventory_adjustments(xero, company=record.company_id.id)
-                #Export Attachment
-                record.export_attachments()
-                # self.env['ir.attachment'].export_attachments(xero, company=record.company_id.id)
+        return self._run_accounts_sync('_automatic_export_account')
+
+    def _get_import_since(self, last_create_date, last_update_date):
+        """Watermark to import from with the current import option, None for a full import."""
+        if last_create_date and self.import_option == 'create':
+            return last_create_date
+        elif last_update_date and self.import_option == 'update':
+            return last_update_date
+        elif self.import_option == 'both' and last_create_date and last_update_date:
+            return min(last_create_date, last_update_date)
+        return None
 
     def import_currency(self):
         self.ensure_one()
@@ -333,23 +716,9 @@ class XeroAccount(models.Model):
 
         group_list = xero.contactgroups.all()
         self.env['res.partner.category'].import_contact_group(group_list, xero)
-        page = 0
-        while True:
-            page += 1
-            contact_list = []
-            if self.last_create_contact_import_date and self.import_option == 'create':
-                contact_list = xero.contacts.filter(since=self.last_create_contact_import_date, page=page)
-            elif self.last_update_contact_import_date and self.import_option == 'update':
-                contact_list = xero.contacts.filter(since=self.last_update_contact_import_date, page=page)
-            elif self.import_option == 'both' and self.last_create_contact_import_date and self.last_update_contact_import_date:
-                min_date = min(self.last_create_contact_import_date, self.last_update_contact_import_date)
-                contact_list = xero.contacts.filter(since=min_date, page=page)
-            else:
-                contact_list = xero.contacts.filter(page=page)
-            if contact_list:
-                    self.env['res.partner'].import_contact(contact_list, xero, company=self.company_id.id, import_option=self.import_option)
-            else:
-                break
+        since = self._get_import_since(self.last_create_contact_import_date, self.last_update_contact_import_date)
+        for contact_list in xero.contacts.iter_pages(since=since):
+            self.env['res.partner'].import_contact(contact_list, xero, company=self.company_id.id, import_option=self.import_option)
 
         if self.import_option == 'create':
             self.last_create_contact_import_date = fields.Datetime.now()
@@ -359,29 +728,36 @@ class XeroAccount(models.Model):
             self.last_create_contact_import_date = fields.Datetime.now()
             self.last_update_contact_import_date = fields.Datetime.now()
 
+    def _import_contacts_by_id(self, xero, contact_ids):
+        """Fetch only the Xero contacts ``contact_ids``, by chunks, and create them as partners."""
+        self.ensure_one()
+        partner_pool = self.env['res.partner']
+        contact_ids = sorted(set(filter(None, contact_ids)))
+        for index in range(0, len(contact_ids), XERO_IDS_CHUNK):
+            contact_list = xero.contacts.filter(IDs=contact_ids[index:index + XERO_IDS_CHUNK], includeArchived='true')
+            if self.contact_overwrite:
+                partner_pool.import_contact_overwrite(contact_list, xero, company=self.company_id.id, import_option='create')
+            else:
+                partner_pool.import_contact(contact_list, xero, company=self.company_id.id, import_option='create')
+
+    def _get_invoice_statuses(self, xero, invoice_ids):
+        """Status of the Xero invoices ``invoice_ids`` by InvoiceID, fetched by chunks without their lines."""
+        invoice_ids = sorted(set(filter(None, invoice_ids)))
+        statuses = {}
+        for index in range(0, len(invoice_ids), XERO_IDS_CHUNK):
+            for invoice in xero.invoices.filter(IDs=invoice_ids[index:index + XERO_IDS_CHUNK], summaryOnly='true'):
+                statuses[invoice.get('InvoiceID')] = invoice.get('Status')
+        return statuses
+
     def import_contact_overwrite(self):
         self.ensure_one()
         xero = self.xero_auth()
 
         group_list = xero.contactgroups.all()
         self.env['res.partner.category'].import_contact_group(group_list, xero)
-        page = 0
-        while True:
-            page += 1
-            contact_list = []
-            if self.last_create_contact_import_date and self.import_option == 'create':
-                contact_list = xero.contacts.filter(since=self.last_create_contact_import_date, page=page)
-            elif self.last_update_contact_import_date and self.import_option == 'update':
-                contact_list = xero.contacts.filter(since=self.last_update_contact_import_date, page=page)
-            elif self.import_option == 'both' and self.last_create_contact_import_date and self.last_update_contact_import_date:
-                min_date = min(self.last_create_contact_import_date, self.last_update_contact_import_date)
-                contact_list = xero.contacts.filter(since=min_date, page=page)
-            else:
-                contact_list = xero.contacts.filter(page=page)
-            if contact_list:
-                    self.env['res.partner'].import_contact_overwrite(contact_list, xero, company=self.company_id.id, import_option=self.import_option)
-            else:
-                break
+        since = self._get_import_since(self.last_create_contact_import_date, self.last_update_contact_import_date)
+        for contact_list in xero.contacts.iter_pages(since=since):
+            self.env['res.partner'].import_contact_overwrite(contact_list, xero, company=self.company_id.id, import_option=self.import_option)
 
         if self.import_option == 'create':
             self.last_create_contact_import_date = fields.Datetime.now()
@@ -414,28 +790,27 @@ class XeroAccount(models.Model):
             self.last_create_product_import_date = fields.Datetime.now()
             self.last_update_product_import_date = fields.Datetime.now()
 
+    def _get_payment_accounts(self, xero, payment_ids):
+        """
+            Accounts of the Xero payments ``payment_ids`` by PaymentID, fetched
+            by chunks. The Payments endpoint takes no IDs parameter, each chunk
+            is one where filter on its PaymentIDs.
+        """
+        payment_ids = sorted(set(filter(None, payment_ids)))
+        payment_accounts = {}
+        for index in range(0, len(payment_ids), XERO_IDS_CHUNK):
+            where = ' OR '.join('PaymentID==Guid("%s")' % payment_id for payment_id in payment_ids[index:index + XERO_IDS_CHUNK])
+            for payment in xero.payments.filter(raw=where):
+                payment_accounts[payment.get('PaymentID')] = payment.get('Account')
+        return payment_accounts
+
     def import_invoice(self):
         self.ensure_one()
         xero = self.xero_auth()
 
-        page = 0
-        while True:
-            page += 1
-            invoice_list = []
-            if self.last_create_invoice_import_date and self.import_option == 'create':
-                invoice_list = xero.invoices.filter(since=self.last_create_invoice_import_date, page=page)
-            elif self.last_update_invoice_import_date and self.import_option == 'update':
-                invoice_list = xero.invoices.filter(since=self.last_update_invoice_import_date, page=page)
-            elif self.import_option == 'both' and self.last_create_invoice_import_date and self.last_update_invoice_import_date:
-                min_date = min(self.last_create_invoice_import_date, self.last_update_invoice_import_date)
-                invoice_list = xero.invoices.filter(since=min_date, page=page)
-            else:
-                invoice_list = xero.invoices.filter(page=page)
-
-            if invoice_list:
-                self.env['account.move'].import_invoice(self.id, invoice_list , xero, company=self.company_id.id, without_product=self.inv_without_product, import_option=self.import_option, customer_inv_journal_id=self.customer_inv_journal_id, vendor_bill_journal_id=self.vendor_bill_journal_id)
-            else:
-                break
+        since = self._get_import_since(self.last_create_invoice_import_date, self.last_update_invoice_import_date)
+        for invoice_list in xero.invoices.iter_pages(since=since):
+            self.env['account.move'].import_invoice(self.id, invoice_list , xero, company=self.company_id.id, without_product=self.inv_without_product, import_option=self.import_option, customer_inv_journal_id=self.customer_inv_journal_id, vendor_bill_journal_id=self.vendor_bill_journal_id)
 
         if self.import_option == 'create':
             self.last_create_invoice_import_date = fields.Datetime.now()
@@ -449,24 +824,9 @@ class XeroAccount(models.Model):
         self.ensure_one()
         xero = self.xero_auth()
 
-        page = 0
-        while True:
-            page += 1
-            credit_notes_list = []
-            if self.last_create_creditnote_import_date and self.import_option == 'create':
-                credit_notes_list = xero.creditnotes.filter(since=self.last_create_creditnote_import_date, page=page)
-            elif self.last_update_creditnote_import_date and self.import_option == 'update':
-                credit_notes_list = xero.creditnotes.filter(since=self.last_update_creditnote_import_date, page=page)
-            elif self.import_option == 'both' and self.last_create_creditnote_import_date and self.last_update_creditnote_import_date:
-                min_date = min(self.last_create_creditnote_import_date, self.last_update_creditnote_import_date)
-                credit_notes_list = xero.creditnotes.filter(since=min_date, page=page)
-            else:
-                credit_notes_list = xero.creditnotes.filter(page=page)
-
-            if credit_notes_list:
-                self.env['account.move'].import_credit_notes(self.id, credit_notes_list , xero, company=self.company_id.id, without_product=self.inv_without_product, import_option=self.import_option, customer_inv_journal_id=self.customer_inv_journal_id, vendor_bill_journal_id=self.vendor_bill_journal_id)
-            else:
-                break
+        since = self._get_import_since(self.last_create_creditnote_import_date, self.last_update_creditnote_import_date)
+        for credit_notes_list in xero.creditnotes.iter_pages(since=since):
+            self.env['account.move'].import_credit_notes(self.id, credit_notes_list , xero, company=self.company_id.id, without_product=self.inv_without_product, import_option=self.import_option, customer_inv_journal_id=self.customer_inv_journal_id, vendor_bill_journal_id=self.vendor_bill_journal_id)
 
         if self.import_option == 'create':
             self.last_create_creditnote_import_date = fields.Datetime.now()
@@ -480,15 +840,8 @@ class XeroAccount(models.Model):
         self.ensure_one()
         xero = self.xero_auth()
 
-        page = 0
-        while True:
-            page += 1
-            journal_list = []
-            journal_list = xero.manualjournals.filter(page=page)
-            if journal_list:
-                self.env['account.move'].import_manual_journal(journal_list, xero, company=self.company_id.id, import_option=self.import_option)
-            else:
-                break
+        for journal_list in xero.manualjournals.iter_pages():
+            self.env['account.move'].import_manual_journal(journal_list, xero, company=self.company_id.id, import_option=self.import_option)
 
     def export_tax(self):
         self.ensure_one()
@@ -518,9 +871,12 @@ class XeroAccount(models.Model):
         group_list = xero.contactgroups.all()
         self.env['res.partner.category'].export_contact_group(group_list, xero)
         contact_list = xero.contacts.all()
-        self.env['res.partner'].export_contact(contact_list, xero, self.last_contact_export_date, company=self.company_id.id)
+        snapshot = self.env['xero.sync.queue'].current_snapshot()
+        self.env['res.partner'].with_context(xero_queue_snapshot=self._get_queue_snapshot('last_contact_export_date')).export_contact(contact_list, xero, self.last_contact_export_date, company=self.company_id.id)
         if not self._context.get('contact_ids'):
             self.last_contact_export_date = fields.Datetime.now()
+            self._set_queue_snapshot('last_contact_export_date', snapshot)
+            self.env['xero.sync.queue'].prune('res.partner', ['last_contact_export_date'])
 
     def export_contact_overwrite(self):
         self.ensure_one()
@@ -529,27 +885,35 @@ class XeroAccount(models.Model):
         group_list = xero.contactgroups.all()
         self.env['res.partner.category'].export_contact_group(group_list, xero)
         contact_list = xero.contacts.all()
-        self.env['res.partner'].export_contact_overwrite(contact_list, xero, self.last_contact_export_date, company=self.company_id.id)
+        snapshot = self.env['xero.sync.queue'].current_snapshot()
+        self.env['res.partner'].with_context(xero_queue_snapshot=self._get_queue_snapshot('last_contact_export_date')).export_contact_overwrite(contact_list, xero, self.last_contact_export_date, company=self.company_id.id)
         if not self._context.get('contact_ids'):
             self.last_contact_export_date = fields.Datetime.now()
+            self._set_queue_snapshot('last_contact_export_date', snapshot)
+            self.env['xero.sync.queue'].prune('res.partner', ['last_contact_export_date'])
 
     def export_product(self):
         self.ensure_one()
         xero = self.xero_auth()
 
         product_list = xero.items.all()
-        self.env['product.product'].export_product(product_list, xero, self.last_product_export_date, company=self.company_id.id)
+        snapshot = self.env['xero.sync.queue'].current_snapshot()
+        self.env['product.product'].with_context(xero_queue_snapshot=self._get_queue_snapshot('last_product_export_date')).export_product(product_list, xero, self.last_product_export_date, company=self.company_id.id)
         if not self._context.get('product_ids'):
             self.last_product_export_date = fields.Datetime.now()
+            self._set_queue_snapshot('last_product_export_date', snapshot)
+            self.env['xero.sync.queue'].prune('product.product', ['last_product_export_date'])
 
     def export_invoice(self):
         self.ensure_one()
         xero = self.xero_auth()
 
-        invoice_list = xero.invoices.all()
-        self.env['account.move'].export_invoice(invoice_list , xero, self.last_invoice_export_date, company=self.company_id.id, disable_export=self.export_disable)
+        snapshot = self.env['xero.sync.queue'].current_snapshot()
+        self.env['account.move'].with_context(xero_queue_snapshot=self._get_queue_snapshot('last_invoice_export_date')).export_invoice(xero, self.last_invoice_export_date, company=self.company_id.id, disable_export=self.export_disable)
         if not self._context.get('invoice_ids'):
             self.last_invoice_export_date = fields.Datetime.now()
+            self._set_queue_snapshot('last_invoice_export_date', snapshot)
+            self.env['xero.sync.queue'].prune('account.move', ['last_invoice_export_date', 'last_creditnote_export_date'])
 
     def export_payment(self):
         self.ensure_one()
@@ -562,9 +926,12 @@ class XeroAccount(models.Model):
         xero = self.xero_auth()
 
         credit_notes_list = xero.creditnotes.all()
-        self.env['account.move'].export_credit_notes(credit_notes_list , xero, self.last_creditnote_export_date, company=self.company_id.id, disable_export=self.export_disable)
+        snapshot = self.env['xero.sync.queue'].current_snapshot()
+        self.env['account.move'].with_context(xero_queue_snapshot=self._get_queue_snapshot('last_creditnote_export_date')).export_credit_notes(credit_notes_list , xero, self.last_creditnote_export_date, company=self.company_id.id, disable_export=self.export_disable)
         if not self._context.get('invoice_ids'):
             self.last_creditnote_export_date = fields.Datetime.now()
+            self._set_queue_snapshot('last_creditnote_export_date', snapshot)
+            self.env['xero.sync.queue'].prune('account.move', ['last_invoice_export_date', 'last_creditnote_export_date'])
 
     def export_credit_notes_payment(self):
         self.ensure_one()
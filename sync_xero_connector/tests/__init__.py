@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+from . import test_xero_decoding
+from . import test_xero_encoding
+from . import test_xero_cache
+from . import test_xero_batch
+from . import test_contact_payload
+from . import test_contact_transform
+from . import test_benchmarks
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+import datetime
+import json
+
+
+def xero_invoice(index, line_count=5):
+    """An invoice as the Xero API returns it in JSON, with ``line_count`` lines."""
+    return {
+        u'Type': u'ACCREC',
+        u'InvoiceID': u'0032e9b6-%04d-4f3c-9d7e-5f0a1b2c3d4e' % index,
+        u'InvoiceNumber': u'INV-%04d' % index,
+        u'Reference': u'Order %s, delivered 2020-06-01' % index,
+        u'Status': u'AUTHORISED',
+        u'LineAmountTypes': u'Exclusive',
+        u'CurrencyCode': u'NZD',
+        u'CurrencyRate': 1.0,
+        u'Date': u'/Date(1590969600000+0000)/',
+        u'DateString': u'2020-06-01T00:00:00',
+        u'DueDate': u'/Date(1593561600000+0000)/',
+        u'DueDateString': u'2020-07-01T00:00:00',
+        u'UpdatedDateUTC': u'/Date(1591012345000+0000)/',
+        u'SubTotal': 500.0,
+        u'TotalTax': 75.0,
+        u'Total': 575.0,
+        u'AmountDue': 575.0,
+        u'AmountPaid': 0.0,
+        u'HasAttachments': False,
+        u'Contact': {
+            u'ContactID': u'5b96e86b-%04d-4a2e-8b0b-7c3d2e1f0a9b' % index,
+            u'Name': u'Customer %s Limited' % index,
+            u'EmailAddress': u'accounts%s@example.com' % index,
+            u'Addresses': [
+                {u'AddressType': u'POBOX', u'AddressLine1': u'PO Box %s' % index, u'City': u'Wellington',
+                 u'Region': u'Wellington', u'PostalCode': u'6011', u'Country': u'New Zealand'},
+                {u'AddressType': u'STREET', u'AddressLine1': u'%s Lambton Quay' % index, u'City': u'Wellington',
+                 u'Region': u'', u'PostalCode': u'6011', u'Country': u'New Zealand'},
+            ],
+            u'Phones': [{u'PhoneType': u'DEFAULT', u'PhoneNumber': u'4 555 %04d' % index}],
+        },
+        u'LineItems': [
+            {u'LineItemID': u'9f1c2a3b-%04d-%04d-8c7d-6e5f4a3b2c1d' % (index, line),
+             u'ItemCode': u'ITEM-%s' % line,
+             u'Description': u'Consulting services, line %s of invoice %s' % (line, index),
+             u'Quantity': 2.0,
+             u'UnitAmount': 50.0,
+             u'TaxType': u'OUTPUT2',
+             u'TaxAmount': 15.0,
+             u'LineAmount': 100.0,
+             u'AccountCode': u'200',
+             u'Tracking': [{u'Name': u'Region', u'Option': u'North',
+                            u'TrackingCategoryID': u'e2f2f732-e92a-4f3a-9c4d-%012d' % line}]}
+            for line in range(line_count)
+        ],
+        u'Payments': [],
+    }
+
+
+def invoice_page_json(count=100, line_count=5):
+    """A page of ``count`` invoices as the body of a Xero API response."""
+    return json.dumps({
+        u'Id': u'8fa5b1c2-d3e4-4f50-a6b7-c8d9e0f1a2b3',
+        u'Status': u'OK',
+        u'ProviderName': u'Odoo',
+        u'DateTimeUTC': u'/Date(1591012345000)/',
+        u'Invoices': [xero_invoice(index, line_count) for index in range(count)],
+    })
+
+
+class XeroTestCredentials(object):
+    """Credentials of a client that never reaches Xero."""
+
+    base_url = u'https://api.xero.com'
+    tenant_id = None
+    oauth = None
+    user_agent = u'sync_xero_connector tests'
+
+
+def outgoing_invoice(index, line_count=5):
+    """An invoice as the export builds it, before it is serialized."""
+    return {
+        u'Type': u'ACCREC',
+        u'Contact': {u'ContactID': u'5b96e86b-%04d-4a2e-8b0b-7c3d2e1f0a9b' % index},
+        u'Date': datetime.date(2020, 6, 1),
+        u'DueDate': datetime.date(2020, 7, 1),
+        u'Status': u'AUTHORISED',
+        u'LineAmountTypes': u'Exclusive',
+        u'CurrencyCode': u'NZD',
+        u'Reference': u'SO%04d' % index,
+        u'SentToContact': False,
+        u'UpdatedDateUTC': datetime.datetime(2020, 6, 1, 10, 11, 12),
+        u'LineItems': [
+            {u'Description': u'Consulting services, line %s' % line,
+             u'Quantity': 2.0,
+             u'UnitAmount': 50.0,
+             u'AccountCode': u'200',
+             u'TaxType': u'OUTPUT2',
+             u'ItemCode': None,
+             u'DiscountRate': False}
+            for line in range(line_count)
+        ],
+    }
+
+
+class FakeResponse(object):
+
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.text = json.dumps(body) if body is not None else u''
+        self.content = self.text.encode('utf-8')
+        self.headers = dict({u'content-type': u'application/json; charset=utf-8'}, **(headers or {}))
+
+
+class FakeSession(object):
+    """Answers the requests of a Xero client with canned responses, in order,
+    and keeps the requests it was sent."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def request(self, method, uri, **kwargs):
+        self.requests.append(dict(kwargs, method=method, uri=uri, headers=dict(kwargs.get('headers') or {})))
+        return self.responses.pop(0)
+
+
+class NoRateLimit(object):
+
+    def acquire(self, key):
+        pass
+
+    def release(self, key):
+        pass
+
+    def update(self, key, headers):
+        pass
+
+
+def xero_response(name, records):
+    """A 200 response of the Xero API listing ``records`` of endpoint ``name``."""
+    return FakeResponse(body={u'Status': u'OK', name: records})
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+import json
+import logging
+import timeit
+from six.moves.urllib.parse import urlencode
+
+from odoo.tests.common import BaseCase, tagged
+from odoo.addons.sync_xero_connector.lib.xero.basemanager import BaseManager
+from odoo.addons.sync_xero_connector.lib.xero.manager import Manager
+from odoo.addons.sync_xero_connector.lib.xero.utils import date_fields_object_hook, json_load_object_hook, json_loads
+
+from .common import XeroTestCredentials, invoice_page_json, outgoing_invoice
+
+_logger = logging.getLogger(__name__)
+
+
+def best_of(func, number=10, repeat=5):
+    """Best time in seconds of one call of ``func``."""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+@tagged('-standard', 'xero_benchmark')
+class TestXeroBenchmarks(BaseCase):
+    """Timings of the Xero client hot paths, run with --test-tags xero_benchmark."""
+
+    def test_decode_invoice_page(self):
+        text = invoice_page_json(count=100)
+        hook = date_fields_object_hook(BaseManager.DECODED_DATE_FIELDS)
+        regex_hook = best_of(lambda: json.loads(text, object_hook=json_load_object_hook))
+        field_hook = best_of(lambda: json_loads(text, hook, use_fast_json=False))
+        fast_json = best_of(lambda: json_loads(text, hook))
+        _logger.info("Decoding a 100 invoice page (%d bytes): regex hook %.2fms, date fields hook %.2fms, "
+                     "with the fast JSON backend %.2fms", len(text), regex_hook * 1000, field_hook * 1000, fast_json * 1000)
+        self.assertLess(field_hook, regex_hook)
+
+    def test_serialize_invoice_batch(self):
+        manager = Manager(u'Invoices', XeroTestCredentials(), cache=False)
+        batch = [outgoing_invoice(index) for index in range(50)]
+        xml_time = best_of(lambda: manager._prepare_data_for_save(batch))
+        json_time = best_of(lambda: manager._prepare_data_for_json(batch))
+        # The XML body is sent form encoded, the JSON body as is
+        xml_size = len(urlencode({u'xml': manager._prepare_data_for_save(batch)}))
+        json_size = len(manager._prepare_data_for_json(batch))
+        _logger.info("Serializing a 50 invoice batch: XML %.2fms for %d bytes, JSON %.2fms for %d bytes",
+                     xml_time * 1000, xml_size, json_time * 1000, json_size)
+        self.assertLess(json_time, xml_time)
+        self.assertLess(json_size, xml_size)
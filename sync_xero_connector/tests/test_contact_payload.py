@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+from odoo.tests.common import TransactionCase
+
+
+class TestContactPayload(TransactionCase):
+
+    def setUp(self):
+        super(TestContactPayload, self).setUp()
+        self.country = self.env.ref('base.nz')
+        self.state = self.env['res.country.state'].search([('country_id', '=', self.country.id)], limit=1) or \
+            self.env['res.country.state'].create({'name': 'Wellington', 'code': 'WGN', 'country_id': self.country.id})
+
+    def _create_partners(self, count):
+        partners = self.env['res.partner'].create([{
+            'name': 'Xero Customer %s' % index,
+            'email': 'customer%s@example.com' % index,
+            'phone': '4 555 %04d' % index,
+            'mobile': '21 555 %04d' % index,
+            'street': '%s Lambton Quay' % index,
+            'city': 'Wellington',
+            'zip': '6011',
+            'state_id': self.state.id,
+            'country_id': self.country.id,
+        } for index in range(count)])
+        children = []
+        for partner in partners:
+            children.append({'name': 'Accounts of %s' % partner.name, 'type': 'invoice', 'parent_id': partner.id,
+                             'street': 'PO Box %s' % partner.id, 'city': 'Wellington', 'zip': '6140',
+                             'state_id': self.state.id, 'country_id': self.country.id})
+            children.append({'name': 'Contact of %s' % partner.name, 'type': 'contact', 'parent_id': partner.id,
+                             'first_name': 'Jane', 'last_name': 'Doe', 'email': 'jane.%s@example.com' % partner.id})
+        self.env['res.partner'].create(children)
+        self.env['res.partner.bank'].create([{'partner_id': partner.id, 'acc_number': '01-0123-%07d-00' % partner.id}
+                                             for partner in partners])
+        return partners
+
+    def _prepare(self, partners):
+        """The payloads of ``partners`` and the number of queries it took, from an empty cache."""
+        partners.flush()
+        partners.invalidate_cache()
+        queries = self.cr.sql_log_count
+        contact_vals = partners._prepare_xero_contacts()
+        return contact_vals, self.cr.sql_log_count - queries
+
+    def test_query_count(self):
+        few_vals, few_queries = self._prepare(self._create_partners(2))
+        many_vals, many_queries = self._prepare(self._create_partners(30))
+        self.assertEqual(len(few_vals), 2)
+        self.assertEqual(len(many_vals), 30)
+        # One query per table read, whatever the number of partners
+        self.assertEqual(many_queries, few_queries)
+
+    def test_payload(self):
+        partner = self._create_partners(1)
+        vals = partner._prepare_xero_contacts()[partner.id]
+        street, po_box = vals[u'Addresses']
+        self.assertEqual(street[u'AddressType'], u'STREET')
+        self.assertEqual(street[u'AddressLine1'], u'0 Lambton Quay')
+        self.assertEqual(street[u'Country'], self.country.name)
+        self.assertEqual(street[u'Region'], self.state.name)
+        self.assertEqual(po_box[u'AddressType'], u'POBOX')
+        self.assertEqual(po_box[u'AddressLine1'], u'PO Box %s' % partner.id)
+        self.assertEqual(vals[u'Phones'], [{u'PhoneNumber': u'4 555 0000', u'PhoneType': u'DEFAULT'},
+                                           {u'PhoneNumber': u'21 555 0000', u'PhoneType': u'MOBILE'}])
+        self.assertEqual(vals[u'ContactPersons'], [{u'FirstName': u'Jane', u'LastName': u'Doe',
+                                                    u'EmailAddress': u'jane.%s@example.com' % partner.id,
+                                                    u'IncludeInEmails': u'true'}])
+        self.assertEqual(vals[u'BankAccountDetails'], u'01-0123-%07d-00' % partner.id)
+        self.assertEqual(vals[u'ContactStatus'], u'ACTIVE')
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+from odoo.tests.common import BaseCase
+
+from odoo.addons.sync_xero_connector.models.contact_transform import normalize_email, transform_contact, transform_contacts
+
+
+def xero_contact(**values):
+    contact = {
+        'ContactID': 'c0a8b6e2-0000-4000-8000-000000000001',
+        'ContactStatus': 'ACTIVE',
+        'Name': 'Ridgeway University',
+        'FirstName': 'Ann',
+        'LastName': 'Lee',
+        'EmailAddress': 'ann@ridgeway.example.com',
+        'SkypeUserName': 'ridgeway',
+        'TaxNumber': '12-345-678',
+        'BankAccountDetails': '01-0123-0123456-00',
+        'DefaultCurrency': 'NZD',
+        'Website': 'http://ridgeway.example.com',
+        'Addresses': [
+            {'AddressType': 'STREET', 'AddressLine1': '24 Rose Street', 'AddressLine2': 'Level 2',
+             'AddressLine3': 'Suite 4', 'City': 'Wellington', 'Region': 'Wellington', 'PostalCode': '6011',
+             'Country': 'New Zealand', 'AttentionTo': 'Accounts'},
+            {'AddressType': 'POBOX', 'AddressLine1': 'PO Box 8112', 'City': 'Wellington', 'Region': 'Wellington',
+             'PostalCode': '6140', 'Country': 'New Zealand', 'AttentionTo': 'Payables'},
+        ],
+        'Phones': [
+            {'PhoneType': 'DEFAULT', 'PhoneNumber': '4 555 0100'},
+            {'PhoneType': 'MOBILE', 'PhoneNumber': '21 555 0100'},
+            {'PhoneType': 'DDI', 'PhoneNumber': '4 555 0199'},
+            {'PhoneType': 'FAX'},
+        ],
+        'ContactPersons': [
+            {'FirstName': 'John', 'LastName': 'Smith', 'EmailAddress': 'john@ridgeway.example.com'},
+            {'FirstName': 'Mary', 'LastName': 'Jones', 'EmailAddress': 'mary@ridgeway.example.com'},
+        ],
+        'ContactGroups': [{'ContactGroupID': 'g1', 'Name': 'Schools'}, {'ContactGroupID': 'g2', 'Name': 'Preferred'}],
+    }
+    contact.update(values)
+    return contact
+
+
+class TestContactTransform(BaseCase):
+
+    def test_partner(self):
+        contact = transform_contact(xero_contact())
+        self.assertEqual(contact['contact_id'], 'c0a8b6e2-0000-4000-8000-000000000001')
+        self.assertEqual(contact['partner'], {
+            'name': 'Ridgeway University',
+            'phone': '4 555 0100',
+            'mobile': '21 555 0100',
+            'direct_dial': '4 555 0199',
+            'first_name': 'Ann',
+            'last_name': 'Lee',
+            'active': True,
+            'skype_name': 'ridgeway',
+            'email': 'ann@ridgeway.example.com',
+            'attention_to': 'Accounts',
+            'city': 'Wellington',
+            'street': '24 Rose Street Level 2',
+            'street2': 'Suite 4',
+            'zip': '6011',
+            'website': 'http://ridgeway.example.com',
+            'tax_number': '12-345-678'})
+        self.assertEqual((contact['country'], contact['region']), ('New Zealand', 'Wellington'))
+        self.assertEqual(contact['currency'], 'NZD')
+        self.assertEqual(contact['group_ids'], ['g1', 'g2'])
+        self.assertEqual(contact['bank_account'], '01-0123-0123456-00')
+        self.assertFalse(transform_contact(xero_contact(ContactStatus='ARCHIVED'))['partner']['active'])
+
+    def test_address_lines(self):
+        """Xero's four address lines are joined two by two, as ``line1 + ' ' + line2`` when there's a second line."""
+        contact = transform_contact(xero_contact(Addresses=[
+            {'AddressType': 'STREET', 'AddressLine1': '24 Rose Street', 'AddressLine4': 'Te Aro'},
+        ]))
+        self.assertEqual(contact['partner']['street'], '24 Rose Street')
+        self.assertEqual(contact['partner']['street2'], ' Te Aro')
+        contact = transform_contact(xero_contact(Addresses=[{'AddressType': 'STREET'}]))
+        self.assertEqual((contact['partner']['street'], contact['partner']['street2']), ('', ''))
+        self.assertIs(contact['country'], None)
+
+    def test_invoice_address(self):
+        self.assertEqual(transform_contact(xero_contact())['invoice_address'], {
+            'name': 'Ridgeway University',
+            'city': 'Wellington',
+            'country': 'New Zealand',
+            'region': 'Wellington',
+            'attention_to': 'Payables',
+            'street': 'PO Box 8112',
+            'street2': '',
+            'zip': '6140'})
+
+    def test_no_invoice_address(self):
+        """A PO box with no line, country or region, as Xero sends it by default, isn't an invoice address."""
+        street, po_box = xero_contact()['Addresses']
+        empty_po_box = {'AddressType': 'POBOX', 'City': 'Wellington', 'PostalCode': '6140', 'AttentionTo': 'Payables'}
+        self.assertFalse(transform_contact(xero_contact(Addresses=[street, empty_po_box]))['invoice_address'])
+        self.assertFalse(transform_contact(xero_contact(Addresses=[street]))['invoice_address'])
+
+    def test_phones(self):
+        contact = transform_contact(xero_contact(Phones=[{'PhoneType': 'MOBILE', 'PhoneNumber': '21 555 0100'}]))
+        self.assertEqual(contact['partner']['phone'], '')
+        self.assertEqual(contact['partner']['mobile'], '21 555 0100')
+        self.assertFalse(contact['partner']['direct_dial'])
+        contact = transform_contact(xero_contact(Phones=None))
+        self.assertEqual((contact['partner']['phone'], contact['partner']['mobile']), ('', ''))
+
+    def test_contact_persons(self):
+        self.assertEqual(transform_contact(xero_contact())['contact_persons'], [
+            {'name': 'John Smith', 'first_name': 'John', 'last_name': 'Smith', 'email': 'john@ridgeway.example.com'},
+            {'name': 'Mary Jones', 'first_name': 'Mary', 'last_name': 'Jones', 'email': 'mary@ridgeway.example.com'},
+        ])
+        person, = transform_contact(xero_contact(ContactPersons=[{'FirstName': 'Kim'}]))['contact_persons']
+        self.assertEqual(person, {'name': 'Kim ', 'first_name': 'Kim', 'last_name': False, 'email': False})
+        self.assertEqual(transform_contact(xero_contact(ContactPersons=None))['contact_persons'], [])
+
+    def test_no_addresses(self):
+        """Contacts without addresses aren't imported."""
+        with_addresses = xero_contact()
+        without_addresses = [xero_contact(ContactID='c2', Addresses=[]), xero_contact(ContactID='c3')]
+        del without_addresses[1]['Addresses']
+        transformed = transform_contacts([without_addresses[0], with_addresses, without_addresses[1]])
+        self.assertEqual(len(transformed), 1)
+        contact_details, contact = transformed[0]
+        self.assertIs(contact_details, with_addresses)
+        self.assertEqual(contact, transform_contact(with_addresses))
+        # A contact without addresses still transforms, with empty address values
+        contact = transform_contact(without_addresses[1])
+        self.assertFalse(contact['invoice_address'])
+        self.assertFalse(contact['partner']['city'])
+        self.assertEqual(contact['partner']['street'], '')
+
+    def test_normalize_email(self):
+        self.assertEqual(normalize_email('  Ann@Ridgeway.Example.COM \n'), 'ann@ridgeway.example.com')
+        self.assertEqual(normalize_email(None), '')
+        self.assertEqual(normalize_email(False), '')
+        self.assertEqual(normalize_email(''), '')
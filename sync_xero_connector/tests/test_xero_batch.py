@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+from xml.etree.ElementTree import fromstring
+
+from odoo.tests.common import BaseCase, TransactionCase
+from odoo.addons.sync_xero_connector.lib.xero.manager import BatchResult, Manager, validation_errors
+
+from .common import FakeSession, NoRateLimit, XeroTestCredentials, xero_response
+
+
+def sent_names(request):
+    """Names of the contacts of a request of the client."""
+    return [name.text for name in fromstring(request[u'data'][u'xml']).iter(u'Name')]
+
+
+def accepted(contact, index):
+    return dict(contact, ContactID=u'00000000-0000-4000-8000-%012d' % index)
+
+
+def rejected(contact, *messages):
+    return dict(contact, HasValidationErrors=True, StatusAttributeString=u'ERROR',
+                ValidationErrors=[{u'Message': message} for message in messages])
+
+
+class TestXeroBatch(BaseCase):
+
+    def setUp(self):
+        super(TestXeroBatch, self).setUp()
+        self.contacts = [{u'Name': u'Contact %s' % index} for index in range(4)]
+        self.session = FakeSession()
+
+    def _manager(self):
+        credentials = XeroTestCredentials()
+        credentials.tenant_id = u'tenant'
+        return Manager(u'Contacts', credentials, session=self.session, rate_limiter=NoRateLimit())
+
+    def test_validation_errors(self):
+        self.assertEqual(validation_errors(accepted(self.contacts[0], 0)), [])
+        self.assertEqual(validation_errors(rejected(self.contacts[0], u'Name is required', u'Email is invalid')),
+                         [u'Name is required', u'Email is invalid'])
+        self.assertEqual(validation_errors({u'Name': u'Contact 0', u'HasErrors': True}), [u'Rejected by Xero'])
+        self.assertEqual(validation_errors(None), [u'Xero returned no result for this element'])
+        self.assertTrue(BatchResult({}, {}, []).ok)
+        self.assertFalse(BatchResult({}, {}, [u'Rejected by Xero']).ok)
+
+    def test_pairing(self):
+        """Each element gets what Xero returned at its position, the rejected ones don't fail the others."""
+        self.session.responses.append(xero_response(u'Contacts', [
+            accepted(self.contacts[0], 0),
+            rejected(self.contacts[1], u'The contact name Contact 1 is already assigned to another contact.'),
+            accepted(self.contacts[2], 2),
+        ]))
+        results = self._manager().write_batch(self.contacts[:3])
+        self.assertEqual(self.session.requests[0][u'params'][u'summarizeErrors'], u'false')
+        self.assertEqual([result.data for result in results], self.contacts[:3])
+        self.assertEqual([result.ok for result in results], [True, False, True])
+        self.assertEqual(results[0].result[u'ContactID'], u'00000000-0000-4000-8000-000000000000')
+        self.assertEqual(results[1].errors, [u'The contact name Contact 1 is already assigned to another contact.'])
+        self.assertEqual(results[2].result[u'ContactID'], u'00000000-0000-4000-8000-000000000002')
+
+    def test_batches(self):
+        """Elements are sent by batches, an element Xero returned nothing for is rejected."""
+        self.session.responses.extend([
+            xero_response(u'Contacts', [accepted(self.contacts[0], 0), accepted(self.contacts[1], 1)]),
+            xero_response(u'Contacts', [accepted(self.contacts[2], 2)]),
+        ])
+        results = self._manager().write_batch(self.contacts, batch_size=2)
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual([result.ok for result in results], [True, True, True, False])
+        self.assertIsNone(results[3].result)
+        self.assertEqual(results[3].errors, [u'Xero returned no result for this element'])
+
+    def test_fix(self):
+        """Rejected elements are fixed and sent again, alone."""
+        self.session.responses.extend([
+            xero_response(u'Contacts', [accepted(self.contacts[0], 0),
+                                        rejected(self.contacts[1], u'Name already used'),
+                                        rejected(self.contacts[2], u'Email is invalid'),
+                                        accepted(self.contacts[3], 3)]),
+            xero_response(u'Contacts', [accepted({u'Name': u'Contact 1 (1)'}, 1)]),
+        ])
+        fixed = []
+
+        def fix(element, errors):
+            fixed.append((element, errors))
+            if errors == [u'Name already used']:
+                return dict(element, Name=element[u'Name'] + u' (1)')
+
+        results = self._manager().write_batch(self.contacts, fix=fix)
+        self.assertEqual(fixed, [(self.contacts[1], [u'Name already used']),
+                                 (self.contacts[2], [u'Email is invalid'])])
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(sent_names(self.session.requests[1]), [u'Contact 1 (1)'])
+        self.assertEqual([result.ok for result in results], [True, True, False, True])
+        self.assertEqual(results[1].data, {u'Name': u'Contact 1 (1)'})
+        self.assertEqual(results[1].result[u'ContactID'], u'00000000-0000-4000-8000-000000000001')
+        self.assertEqual(results[2].errors, [u'Email is invalid'])
+
+    def test_max_attempts(self):
+        """An element is written ``max_attempts`` times at most, then left rejected."""
+        self.session.responses.extend([
+            xero_response(u'Contacts', [rejected(self.contacts[0], u'Name already used')]),
+            xero_response(u'Contacts', [rejected(self.contacts[0], u'Name already used')]),
+            xero_response(u'Contacts', [rejected(self.contacts[0], u'Name already used')]),
+        ])
+        calls = []
+
+        def fix(element, errors):
+            calls.append(element)
+            return element
+
+        results = self._manager().write_batch(self.contacts[:1], fix=fix, max_attempts=3)
+        self.assertEqual(len(self.session.requests), 3)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(results[0].errors, [u'Name already used'])
+        self.assertFalse(self.session.responses)
+
+        self.session.responses.append(xero_response(u'Contacts', [rejected(self.contacts[0], u'Name already used')]))
+        results = self._manager().write_batch(self.contacts[:1], fix=fix, max_attempts=1)
+        self.assertEqual(len(self.session.requests), 4)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(results[0].ok)
+
+
+class TestLogRejected(TransactionCase):
+
+    def test_log_rejected(self):
+        partners = self.env['res.partner'].create([{'name': 'Accepted'}, {'name': 'Rejected'}])
+        results = [BatchResult({u'Name': u'Accepted'}, {u'ContactID': u'1'}, []),
+                   BatchResult({u'Name': u'Rejected'}, {}, [u'Name already used', u'Email is invalid'])]
+        self.env['mismatch.log'].log_rejected('res.partner', results, partners)
+        log = self.env['mismatch.log'].search([('source_model', '=', 'res.partner'), ('source_id', 'in', partners.ids)])
+        self.assertEqual(len(log), 1)
+        self.assertEqual(log.name, partners[1].display_name)
+        self.assertEqual(log.source_id, partners[1].id)
+        self.assertEqual(log.description, u'Name already used\nEmail is invalid')
+        self.assertTrue(log.exported_date)
+
+    def test_log_rejected_without_records(self):
+        """Without the records sent, the element names the log."""
+        results = [BatchResult({u'Code': u'WIDGET'}, None, [u'Xero returned no result for this element'])]
+        self.env['mismatch.log'].log_rejected('product.product', results)
+        log = self.env['mismatch.log'].search([('source_model', '=', 'product.product'), ('name', '=', 'WIDGET')])
+        self.assertEqual(len(log), 1)
+        self.assertFalse(log.source_id)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+from unittest.mock import patch
+
+from odoo.tests.common import BaseCase
+from odoo.addons.sync_xero_connector.lib.xero.api import Xero
+from odoo.addons.sync_xero_connector.lib.xero.cache import ResponseCache
+
+from .common import FakeResponse, FakeSession, NoRateLimit, XeroTestCredentials, xero_response
+
+CACHE_TIME = 'odoo.addons.sync_xero_connector.lib.xero.cache.time.time'
+
+
+class TestResponseCache(BaseCase):
+
+    def setUp(self):
+        super(TestResponseCache, self).setUp()
+        self.cache = ResponseCache(ttl=300, max_age=3600)
+        self.key = self.cache.key(u'tenant', u'TaxRates', u'/TaxRates', {})
+        self.rates = [{u'TaxType': u'OUTPUT2', u'Name': u'GST on Income'},
+                      {u'TaxType': u'INPUT2', u'Name': u'GST on Expenses'}]
+
+    def _store(self, data, now, fetched_at=u'fetched'):
+        with patch(CACHE_TIME, return_value=now):
+            return self.cache.store(self.key, data, fetched_at)
+
+    def _lookup(self, now, key=None):
+        with patch(CACHE_TIME, return_value=now):
+            return self.cache.lookup(key or self.key)
+
+    def test_only_settings_endpoints(self):
+        self.assertIsNone(self.cache.key(u'tenant', u'Invoices', u'/Invoices', {}))
+        self.assertIsNone(self.cache.key(None, u'TaxRates', u'/TaxRates', {}))
+
+    def test_ttl(self):
+        self._store(self.rates, 1000)
+        self.assertEqual(self._lookup(1299), (self.rates, u'fetched'))
+        # Stale, to revalidate with If-Modified-Since
+        self.assertEqual(self._lookup(1300), (None, u'fetched'))
+
+    def test_copies(self):
+        self._store(self.rates, 1000)
+        data, fetched_at = self._lookup(1001)
+        data[0][u'Name'] = u'Changed by the caller'
+        self.assertEqual(self._lookup(1002)[0], self.rates)
+
+    def test_merge(self):
+        self._store(self.rates, 1000, u'first')
+        changed = [{u'TaxType': u'INPUT2', u'Name': u'GST on Purchases'},
+                   {u'TaxType': u'ZERORATED', u'Name': u'Zero Rated'}]
+        merged = self._store(changed, 1400, u'second')
+        self.assertEqual(sorted(rate[u'Name'] for rate in merged),
+                         [u'GST on Income', u'GST on Purchases', u'Zero Rated'])
+        self.assertEqual(self._lookup(1401), (merged, u'second'))
+
+    def test_not_modified(self):
+        self._store(self.rates, 1000, u'first')
+        with patch(CACHE_TIME, return_value=1400):
+            self.assertEqual(self.cache.not_modified(self.key, u'second'), self.rates)
+        self.assertEqual(self._lookup(1500), (self.rates, u'second'))
+
+    def test_max_age(self):
+        self._store(self.rates, 1000)
+        # Revalidated and merged, still fetched in full max_age after the first load
+        self._store([], 3000, u'second')
+        self.assertEqual(self._lookup(3299)[0], self.rates)
+        self.assertEqual(self._lookup(3300), (None, u'second'))
+        self.assertEqual(self._lookup(4600), (None, None))
+        self.assertNotIn(self.key, self.cache._entries)
+
+    def test_filtered_not_merged(self):
+        key = self.cache.key(u'tenant', u'Accounts', u'/Accounts', {u'where': u'Type=="BANK"'})
+        accounts = [{u'AccountID': u'1', u'Type': u'BANK'}]
+        with patch(CACHE_TIME, return_value=1000):
+            self.cache.store(key, accounts, u'first')
+        with patch(CACHE_TIME, return_value=1400):
+            self.assertEqual(self.cache.lookup(key), (None, None))
+            self.assertEqual(self.cache.store(key, [{u'AccountID': u'2', u'Type': u'BANK'}], u'second'),
+                             [{u'AccountID': u'2', u'Type': u'BANK'}])
+
+    def test_invalidate(self):
+        self._store(self.rates, 1000)
+        other = self.cache.key(u'other tenant', u'TaxRates', u'/TaxRates', {})
+        with patch(CACHE_TIME, return_value=1000):
+            self.cache.store(other, self.rates, u'fetched')
+        self.cache.invalidate(u'tenant', u'TaxRates')
+        self.assertEqual(self._lookup(1001), (None, None))
+        self.assertEqual(self._lookup(1001, other)[0], self.rates)
+
+
+class TestClientCache(BaseCase):
+
+    def _client(self, session, cache=True):
+        credentials = XeroTestCredentials()
+        credentials.tenant_id = u'tenant'
+        return Xero(credentials, session=session, rate_limiter=NoRateLimit(), cache=cache)
+
+    def test_opt_in(self):
+        rates = [{u'TaxType': u'OUTPUT2', u'Name': u'GST on Income'}]
+        session = FakeSession(xero_response(u'TaxRates', rates), xero_response(u'TaxRates', rates))
+        xero = self._client(session, cache=False)
+        xero.taxrates.all()
+        xero.taxrates.all()
+        self.assertEqual(len(session.requests), 2)
+        # Each client has its own cache
+        self.assertIsNot(self._client(FakeSession()).cache, self._client(FakeSession()).cache)
+
+    def test_cached_until_write(self):
+        rates = [{u'TaxType': u'OUTPUT2', u'Name': u'GST on Income'}]
+        new_rate = {u'TaxType': u'TAX001', u'Name': u'Export'}
+        session = FakeSession(xero_response(u'TaxRates', rates),
+                              xero_response(u'TaxRates', [new_rate]),
+                              xero_response(u'TaxRates', rates + [new_rate]))
+        xero = self._client(session)
+        self.assertEqual(xero.taxrates.all(), rates)
+        self.assertEqual(xero.taxrates.all(), rates)
+        self.assertEqual(len(session.requests), 1)
+        xero.taxrates.put(new_rate)
+        self.assertEqual(xero.taxrates.all(), rates + [new_rate])
+        self.assertEqual(len(session.requests), 3)
+        self.assertNotIn(u'If-Modified-Since', session.requests[2][u'headers'])
+
+    def test_not_modified_after_eviction(self):
+        rates = [{u'TaxType': u'OUTPUT2', u'Name': u'GST on Income'}]
+        session = FakeSession(xero_response(u'TaxRates', rates),
+                              FakeResponse(304),
+                              xero_response(u'TaxRates', rates))
+        xero = self._client(session)
+        xero.taxrates.all()
+        cache = xero.cache
+        key = list(cache._entries)[0]
+        cache._entries[key].checked_at -= cache.ttl
+        # A write of another client drops the entry while it is revalidated
+        real_not_modified = cache.not_modified
+
+        def not_modified(key, fetched_at):
+            cache._entries.clear()
+            return real_not_modified(key, fetched_at)
+
+        with patch.object(cache, 'not_modified', not_modified):
+            self.assertEqual(xero.taxrates.all(), rates)
+        self.assertIn(u'If-Modified-Since', session.requests[1][u'headers'])
+        self.assertNotIn(u'If-Modified-Since', session.requests[2][u'headers'])
+        self.assertEqual(len(session.requests), 3)
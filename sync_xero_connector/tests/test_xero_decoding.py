@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+import datetime
+import json
+
+from odoo.tests.common import BaseCase
+from odoo.addons.sync_xero_connector.lib.xero.basemanager import BaseManager
+from odoo.addons.sync_xero_connector.lib.xero.utils import (
+    _apply_object_hook,
+    date_fields_object_hook,
+    json_load_object_hook,
+    json_loads,
+)
+
+from .common import invoice_page_json
+
+
+class TestXeroDecoding(BaseCase):
+
+    def setUp(self):
+        super(TestXeroDecoding, self).setUp()
+        self.hook = date_fields_object_hook(BaseManager.DECODED_DATE_FIELDS)
+
+    def _loads(self, text):
+        return json_loads(text, self.hook, use_fast_json=False)
+
+    def test_decodes_every_date_field(self):
+        document = dict((key, u'/Date(1426849200000+1300)/') for key in BaseManager.DECODED_DATE_FIELDS)
+        decoded = self._loads(json.dumps(document))
+        self.assertEqual(set(decoded), set(BaseManager.DECODED_DATE_FIELDS))
+        for key, value in decoded.items():
+            self.assertIsInstance(value, datetime.datetime, key)
+            self.assertEqual(value, datetime.datetime(2015, 3, 21, 0, 0), key)
+
+    def test_leaves_other_strings_alone(self):
+        document = {u'Reference': u'/Date(1426849200000+1300)/',
+                    u'Name': u'2020-06-01T10:11:12',
+                    u'Description': u'2020-06-01T00:00:00',
+                    u'Date': u'2020-06-01T00:00:00'}
+        decoded = self._loads(json.dumps(document))
+        self.assertEqual(decoded[u'Reference'], u'/Date(1426849200000+1300)/')
+        self.assertEqual(decoded[u'Name'], u'2020-06-01T10:11:12')
+        self.assertEqual(decoded[u'Description'], u'2020-06-01T00:00:00')
+        self.assertEqual(decoded[u'Date'], datetime.date(2020, 6, 1))
+
+    def test_dates_and_datetimes(self):
+        decoded = self._loads(json.dumps({u'DateString': u'2020-06-01T00:00:00',
+                                          u'UpdatedDateUTC': u'2020-06-01T10:11:12',
+                                          u'DueDate': None,
+                                          u'StartDate': u'not a date'}))
+        self.assertEqual(decoded[u'DateString'], datetime.date(2020, 6, 1))
+        self.assertEqual(decoded[u'UpdatedDateUTC'], datetime.datetime(2020, 6, 1, 10, 11, 12))
+        self.assertIsNone(decoded[u'DueDate'])
+        self.assertEqual(decoded[u'StartDate'], u'not a date')
+
+    def test_nested_objects(self):
+        text = invoice_page_json(count=3, line_count=2)
+        decoded = self._loads(text)
+        invoice = decoded[u'Invoices'][0]
+        self.assertEqual(invoice[u'Date'], datetime.datetime(2020, 6, 1))
+        self.assertEqual(invoice[u'DateString'], datetime.date(2020, 6, 1))
+        self.assertIsInstance(invoice[u'UpdatedDateUTC'], datetime.datetime)
+        self.assertEqual(invoice[u'Contact'][u'Addresses'][0][u'City'], u'Wellington')
+        # The walk used with the fast JSON backends gives the same result
+        self.assertEqual(_apply_object_hook(json.loads(text), self.hook), decoded)
+
+    def test_same_result_as_regex_hook(self):
+        # Xero only sends dates in date fields, there both hooks agree
+        text = invoice_page_json(count=10)
+        self.assertEqual(self._loads(text), json.loads(text, object_hook=json_load_object_hook))
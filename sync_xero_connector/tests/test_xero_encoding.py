@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+# Part of Odoo. See COPYRIGHT & LICENSE files for full copyright and licensing details.
+
+import json
+from xml.etree.ElementTree import fromstring
+
+from odoo.tests.common import BaseCase
+from odoo.addons.sync_xero_connector.lib.xero.manager import Manager
+from odoo.addons.sync_xero_connector.lib.xero.utils import isplural
+
+from .common import XeroTestCredentials, outgoing_invoice
+
+
+def xml_to_dict(element):
+    """The dict an XML request body element was built from, values as text."""
+    result = {}
+    for child in element:
+        if isplural(child.tag):
+            result[child.tag] = [xml_to_dict(item) for item in child]
+        elif len(child):
+            result[child.tag] = xml_to_dict(child)
+        else:
+            result[child.tag] = child.text
+    return result
+
+
+def as_text(value):
+    """A JSON body value as the XML body writes it."""
+    if isinstance(value, bool):
+        return u'true' if value else u'false'
+    if isinstance(value, dict):
+        return dict((key, as_text(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [as_text(item) for item in value]
+    return u'%s' % value
+
+
+class TestXeroEncoding(BaseCase):
+
+    def setUp(self):
+        super(TestXeroEncoding, self).setUp()
+        self.manager = Manager(u'Invoices', XeroTestCredentials(), cache=False)
+        self.batch = [outgoing_invoice(index) for index in range(3)]
+
+    def _bodies(self):
+        json_body = json.loads(self.manager._prepare_data_for_json(self.batch))[u'Invoices']
+        xml_body = [xml_to_dict(invoice) for invoice in fromstring(self.manager._prepare_data_for_save(self.batch))]
+        return json_body, xml_body
+
+    def test_json_body(self):
+        invoice = json.loads(self.manager._prepare_data_for_json(self.batch))[u'Invoices'][0]
+        self.assertEqual(invoice[u'Date'], u'2020-06-01T00:00:00')
+        self.assertEqual(invoice[u'DueDate'], u'2020-07-01T00:00:00')
+        self.assertIs(invoice[u'SentToContact'], False)
+        self.assertEqual(invoice[u'LineItems'][0][u'Quantity'], 2.0)
+        # Unset values are left out, never sent as text
+        self.assertNotIn(u'ItemCode', invoice[u'LineItems'][0])
+        self.assertNotIn(u'DiscountRate', invoice[u'LineItems'][0])
+        self.assertNotIn(u'UpdatedDateUTC', invoice)
+
+    def test_single_record(self):
+        body = json.loads(self.manager._prepare_data_for_json(self.batch[0]))
+        self.assertEqual(len(body[u'Invoices']), 1)
+        self.assertEqual(body[u'Invoices'][0][u'Reference'], u'SO0000')
+
+    def test_json_and_xml_bodies_match(self):
+        json_body, xml_body = self._bodies()
+        self.assertEqual(len(json_body), len(xml_body))
+        for json_invoice, xml_invoice in zip(json_body, xml_body):
+            self.assertNotIn(u'UpdatedDateUTC', xml_invoice)
+            # The XML body writes unset values as "None"/"False", the JSON
+            # body leaves them out: everything else is the same
+            for line in xml_invoice[u'LineItems']:
+                self.assertEqual(line.pop(u'ItemCode'), u'None')
+                self.assertEqual(line.pop(u'DiscountRate'), u'False')
+            self.assertEqual(as_text(json_invoice), xml_invoice)